@@ -4,25 +4,23 @@ FastAPI backend compatible with React and Node.js frontends.
 """
 
 import os
-import base64
-import io
+import asyncio
 from typing import Optional
 
-import numpy as np
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from PIL import Image
-
-from config import CORS_ORIGINS, MODEL_PATH
-from model import (
-    load_mnist_data,
-    build_cnn_model,
-    build_simple_model,
-    train_model,
-)
-from predictor import get_predictor, PredictionResult
+from checkpoints import valid_run_id
+from config import CORS_ORIGINS, MODEL_PATH, PREDICT_BATCH_MAX_ITEMS, PREWARM_ON_STARTUP
+from evaluation import get_evaluation_cache
+from executor import QueueFull, QueueTimeout, get_executor
+from model_registry import get_registry
+from predictor import get_predictor, prewarm, PredictionResult
+from preprocessing import ImageTooLarge, from_raw_pixels, rasterize_strokes, raw_pixels_length
+from sample_store import get_sample_store
+from training_jobs import TooManyJobs, TrainingJobs, refresh_served_model, sse_format
 
 # --- App ---
 
@@ -41,12 +39,26 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def _prewarm_model():
+    """Load and warm up the model in the background; /health/ready reports when it's ready."""
+    if PREWARM_ON_STARTUP:
+        prewarm()
+
+
 # --- Schemas ---
 
 class PredictBase64Request(BaseModel):
     image: str
 
 
+class PredictStrokesRequest(BaseModel):
+    width: int
+    height: int
+    strokes: list[list[float]]  # each stroke: flat [x0, y0, x1, y1, ...] in canvas pixels
+    line_width: Optional[float] = None  # default: the canvas brush, max(14, width / 18)
+
+
 class PredictResponse(BaseModel):
     digit: int
     confidence: float
@@ -54,21 +66,56 @@ class PredictResponse(BaseModel):
     label: str
 
 
+class PredictBatchRequest(BaseModel):
+    images: list[str]
+
+
+class PredictBatchItem(BaseModel):
+    index: int
+    digit: Optional[int] = None
+    confidence: Optional[float] = None
+    probabilities: Optional[list[float]] = None
+    label: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PredictBatchResponse(BaseModel):
+    count: int
+    errors: int
+    results: list[PredictBatchItem]
+
+
 class TrainRequest(BaseModel):
     model_type: str = "advanced"
     epochs: int = 15
     batch_size: int = 128
+    learning_rate: Optional[float] = None  # default 1e-3
+    dropout: Optional[float] = None  # default 0.5
+    run_id: Optional[str] = None  # resume this run from its latest checkpoint
 
 
-class TrainResponse(BaseModel):
-    message: str
-    test_accuracy: float
-    test_loss: float
+class TrainJobResponse(BaseModel):
+    job_id: str
+    status: str
+    params: dict
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: dict = {}
+    result: Optional[dict] = None
+    error: Optional[str] = None
 
 
 class ModelStatusResponse(BaseModel):
     loaded: bool
+    ready: bool = False
     path: str
+    precision: str = "float32"
+    version: Optional[str] = None
+
+
+class RollbackRequest(BaseModel):
+    version: Optional[str] = None
 
 
 class ApiConfigResponse(BaseModel):
@@ -79,6 +126,25 @@ class ApiConfigResponse(BaseModel):
 
 # --- Endpoints ---
 
+def _require_model(predictor):
+    """503 unless a model is loaded; never loads on the event loop (a cold model loads in the background)."""
+    if predictor.load_in_background():
+        return
+    if predictor.warmup_state == "warming":
+        raise HTTPException(503, "Model is loading, retry shortly", headers={"Retry-After": "1"})
+    raise HTTPException(503, "Model not loaded. Train via POST /train")
+
+
+async def _offload(fn, *args, **kwargs):
+    """Run blocking work on the bounded inference executor, mapping backpressure to 429/503."""
+    try:
+        return await get_executor().run(fn, *args, **kwargs)
+    except QueueFull:
+        raise HTTPException(429, "Too many requests in flight, retry shortly", headers={"Retry-After": "1"})
+    except QueueTimeout:
+        raise HTTPException(503, "Inference workers are busy, retry shortly", headers={"Retry-After": "1"})
+
+
 def _pred_to_response(r: PredictionResult) -> PredictResponse:
     return PredictResponse(
         digit=r.digit,
@@ -96,9 +162,13 @@ def root():
         "status": "running",
         "version": "2.0.0",
         "endpoints": {
-            "predict": "POST /predict | POST /predict/base64",
-            "train": "POST /train",
+            "predict": "POST /predict | POST /predict/base64 | POST /predict/pixels | POST /predict/strokes"
+                       " | POST /predict/batch",
+            "predict_stats": "GET /predict/stats",
+            "train": "POST /train | GET /train/jobs/{job_id}[/events] | POST /train/jobs/{job_id}/cancel",
             "status": "GET /model/status",
+            "versions": "GET /model/versions | POST /model/rollback",
+            "health": "GET /health | GET /health/live | GET /health/ready",
             "config": "GET /config",
             "samples": "GET /samples",
             "evaluate": "GET /evaluate",
@@ -115,6 +185,10 @@ def api_config():
         endpoints={
             "predict": "/predict",
             "predictBase64": "/predict/base64",
+            "predictPixels": "/predict/pixels",
+            "predictStrokes": "/predict/strokes",
+            "predictBatch": "/predict/batch",
+            "predictStats": "/predict/stats",
             "train": "/train",
             "status": "/model/status",
             "samples": "/samples",
@@ -125,35 +199,84 @@ def api_config():
 
 
 @app.get("/health")
-def health():
-    """Health check for load balancers and React checks."""
+async def health():
+    """Health check for load balancers and React checks. Never loads the model inline."""
     predictor = get_predictor()
     return {
         "status": "ok",
-        "model_loaded": predictor.load(),
+        "model_loaded": predictor.load_in_background(),
+        "ready": predictor.is_ready(),
     }
 
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 until then."""
+    predictor = get_predictor()
+    predictor.load_in_background()
+    state = predictor.status()
+    if not state["ready"]:
+        response.status_code = 503
+    return {"status": "ready" if state["ready"] else predictor.warmup_state, **state,
+            "executor": get_executor().stats()}
+
+
 @app.get("/model/status", response_model=ModelStatusResponse)
-def model_status():
+async def model_status():
     predictor = get_predictor()
-    loaded = predictor.load()
-    return ModelStatusResponse(loaded=loaded, path=MODEL_PATH)
+    predictor.load_in_background()
+    state = predictor.status()
+    return ModelStatusResponse(
+        loaded=state["loaded"], ready=state["ready"], path=state["path"],
+        precision=state["precision"], version=state["version"],
+    )
+
+
+@app.get("/model/versions")
+def model_versions():
+    """Published model versions, oldest first, and the one currently active."""
+    registry = get_registry()
+    return {
+        "current": registry.current_id(),
+        "serving": get_predictor().status()["version"],
+        "versions": [v.as_dict() for v in registry.versions()],
+    }
+
+
+@app.post("/model/rollback")
+def model_rollback(body: RollbackRequest):
+    """Activate `version`, or the version published before the current one. Workers hot-swap."""
+    registry = get_registry()
+    try:
+        version = registry.rollback(body.version)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    registry.mirror(version, MODEL_PATH)
+    get_predictor().refresh_from_registry(registry)
+    return {"current": version.id}
 
 
 @app.post("/predict", response_model=PredictResponse)
 async def predict_from_file(file: UploadFile = File(...)):
     """Predict from uploaded image (PNG, JPEG)."""
     predictor = get_predictor()
-    if not predictor.load():
-        raise HTTPException(503, "Model not loaded. Train via POST /train")
+    _require_model(predictor)
 
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(400, "File must be an image (PNG, JPEG)")
 
     contents = await file.read()
     try:
-        result = predictor.predict(contents)
+        # Off the event loop so concurrent requests can share a micro-batch
+        result = await _offload(predictor.predict, contents)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(400, f"Invalid image: {str(e)}")
 
@@ -164,91 +287,216 @@ async def predict_from_file(file: UploadFile = File(...)):
 async def predict_from_base64(body: PredictBase64Request):
     """Predict from base64 image (e.g. canvas.toDataURL('image/png'))."""
     predictor = get_predictor()
-    if not predictor.load():
-        raise HTTPException(503, "Model not loaded. Train via POST /train")
+    _require_model(predictor)
 
     try:
-        result = predictor.predict(body.image)
+        result = await _offload(predictor.predict, body.image)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(400, f"Invalid base64 image: {str(e)}")
 
     return _pred_to_response(result)
 
 
-@app.post("/train", response_model=TrainResponse)
-async def train(body: TrainRequest):
-    """Train a new model."""
+@app.post("/predict/pixels", response_model=PredictResponse)
+async def predict_from_pixels(request: Request):
+    """
+    Predict from raw 8-bit grayscale pixels (application/octet-stream, row-major,
+    one byte per pixel) sized by X-Image-Width / X-Image-Height headers.
+    No base64 or PNG round-trip. Oversized images get 413 before the body is read.
+    """
     predictor = get_predictor()
+    _require_model(predictor)
 
-    (x_train, y_train), (x_test, y_test) = load_mnist_data()
+    try:
+        width = int(request.headers["x-image-width"])
+        height = int(request.headers["x-image-height"])
+        expected = raw_pixels_length(width, height, request.headers.get("content-length"))
+    except ImageTooLarge as e:
+        raise HTTPException(413, str(e))
+    except (KeyError, ValueError) as e:
+        raise HTTPException(400, f"Invalid pixel buffer: {str(e)}")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > expected:  # chunked upload without (or lying about) Content-Length
+            raise HTTPException(413, f"Body exceeds {expected} bytes for {width}x{height} pixels")
+    try:
+        pixels = from_raw_pixels(body, width, height)
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid pixel buffer: {str(e)}")
 
-    if body.model_type.lower() == "simple":
-        model = build_simple_model()
-    else:
-        model = build_cnn_model()
+    try:
+        result = await _offload(predictor.predict, pixels)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(400, f"Invalid pixel buffer: {str(e)}")
 
-    history, test_loss, test_acc = train_model(
-        model, x_train, y_train, x_test, y_test,
-        epochs=body.epochs,
-        batch_size=body.batch_size,
-    )
+    return _pred_to_response(result)
+
+
+@app.post("/predict/strokes", response_model=PredictResponse)
+async def predict_from_strokes(body: PredictStrokesRequest):
+    """Predict from a stroke/point list; strokes are rasterized server-side like the canvas draws them."""
+    predictor = get_predictor()
+    _require_model(predictor)
+
+    def run():
+        return predictor.predict(rasterize_strokes(body.strokes, body.width, body.height, body.line_width))
+
+    try:
+        result = await _offload(run)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(400, f"Invalid strokes: {str(e)}")
+
+    return _pred_to_response(result)
 
-    model.save(MODEL_PATH)
-    predictor.set_model(model)
 
-    return TrainResponse(
-        message="Training complete",
-        test_accuracy=float(test_acc),
-        test_loss=float(test_loss),
+@app.post("/predict/batch", response_model=PredictBatchResponse)
+async def predict_batch(body: PredictBatchRequest):
+    """Predict many base64 images in one request; bad items don't fail the batch."""
+    predictor = get_predictor()
+    _require_model(predictor)
+    if not body.images:
+        raise HTTPException(400, "images must be a non-empty list")
+    if len(body.images) > PREDICT_BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"At most {PREDICT_BATCH_MAX_ITEMS} images per request")
+
+    results = await _offload(predictor.predict_batch, body.images, return_exceptions=True)
+    items = []
+    for i, r in enumerate(results):
+        if isinstance(r, Exception):
+            items.append(PredictBatchItem(index=i, error=f"Invalid image: {str(r)}"))
+        else:
+            items.append(PredictBatchItem(index=i, **_pred_to_response(r).model_dump()))
+
+    return PredictBatchResponse(
+        count=len(items),
+        errors=sum(1 for it in items if it.error is not None),
+        results=items,
     )
 
 
-@app.get("/samples")
-async def get_samples(count: int = 10, digit: Optional[int] = None):
-    """Get MNIST samples as base64 for gallery."""
-    (x_train, y_train), _ = load_mnist_data()
-    y_labels = np.argmax(y_train, axis=1)
+@app.get("/predict/stats")
+def predict_stats():
+    """Micro-batching statistics (batch sizes, queue wait), result-cache and executor counters."""
+    predictor = get_predictor()
+    return {
+        **predictor.batching_stats(),
+        "result_cache": predictor.result_cache_stats(),
+        "executor": get_executor().stats(),
+    }
 
-    if digit is not None:
-        indices = np.where(y_labels == digit)[0]
-    else:
-        indices = np.arange(len(x_train))
 
-    indices = np.random.choice(indices, min(count, len(indices)), replace=False)
-    samples = []
+training_jobs = TrainingJobs(on_finish=refresh_served_model, model_path=MODEL_PATH)
 
-    for idx in indices:
-        img = (x_train[idx].squeeze() * 255).astype(np.uint8)
-        pil = Image.fromarray(img, mode="L")
-        buf = io.BytesIO()
-        pil.save(buf, format="PNG")
-        samples.append({
-            "image_base64": base64.b64encode(buf.getvalue()).decode(),
-            "label": int(y_labels[idx]),
-        })
 
-    return {"samples": samples}
+@app.post("/train", response_model=TrainJobResponse, status_code=202)
+async def train(body: TrainRequest):
+    """Queue a training job; follow GET /train/jobs/{job_id}/events or poll the job."""
+    if body.run_id is not None and not valid_run_id(body.run_id):
+        raise HTTPException(400, "Invalid run_id")
+    try:
+        return training_jobs.submit(body.model_dump(exclude_none=True)).as_dict()
+    except TooManyJobs as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": "60"})
 
 
-@app.get("/evaluate")
-async def evaluate():
-    """Model evaluation metrics."""
-    from sklearn.metrics import confusion_matrix, classification_report
+@app.get("/train/jobs")
+async def train_jobs():
+    return {**training_jobs.stats(), "jobs": [job.as_dict() for job in training_jobs.list()]}
 
-    predictor = get_predictor()
-    if not predictor.load():
-        raise HTTPException(503, "Model not loaded")
 
-    _, (x_test, y_test) = load_mnist_data()
-    model = predictor._model
-    y_pred = np.argmax(model.predict(x_test, verbose=0), axis=1)
-    y_true = np.argmax(y_test, axis=1)
+@app.get("/train/progress")
+async def train_progress():
+    """Progress of the most recent job, in the shape of the PHP bridge's training_progress.json."""
+    job = training_jobs.latest()
+    return job.progress if job is not None and job.progress else {"status": "idle"}
 
-    return {
-        "accuracy": float(np.mean(y_pred == y_true)),
-        "confusion_matrix": confusion_matrix(y_true, y_pred).tolist(),
-        "classification_report": classification_report(y_true, y_pred, output_dict=True),
-    }
+
+def _get_job(job_id: str):
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown training job")
+    return job
+
+
+@app.get("/train/jobs/{job_id}", response_model=TrainJobResponse)
+async def train_job(job_id: str):
+    return _get_job(job_id).as_dict()
+
+
+@app.post("/train/jobs/{job_id}/cancel", response_model=TrainJobResponse)
+async def cancel_train_job(job_id: str):
+    _get_job(job_id)
+    return training_jobs.cancel(job_id).as_dict()
+
+
+@app.get("/train/jobs/{job_id}/events")
+async def train_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events: status, per-batch and per-epoch metrics, then one of
+    done/error/cancelled. Reconnecting with Last-Event-ID resumes after that event.
+    """
+    job = _get_job(job_id)
+    last = int(request.headers.get("last-event-id") or 0)
+
+    async def stream():
+        seq = last
+        while True:
+            for event in job.events_after(seq):
+                seq = event["seq"]
+                yield sse_format(event)
+            if job.finished and not job.events_after(seq):
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/samples")
+def get_samples(response: Response, count: int = 10, digit: Optional[int] = None,
+                seed: Optional[int] = None, page: int = 0):
+    """
+    Get MNIST samples as base64 for gallery.
+    Pass `seed` (and `page`) for a stable, cacheable listing.
+    """
+    if digit is not None and not 0 <= digit <= 9:
+        raise HTTPException(400, "digit must be 0-9")
+    if count < 1 or page < 0:
+        raise HTTPException(400, "count must be >= 1 and page >= 0")
+
+    result = get_sample_store().sample(count=count, digit=digit, seed=seed, page=page)
+    if seed is not None:
+        response.headers["Cache-Control"] = "public, max-age=86400"
+    return result
+
+
+@app.get("/evaluate")
+def evaluate(response: Response, wait: bool = False):
+    """
+    Model evaluation metrics, cached per model version.
+    A new model is evaluated in the background; until then this returns
+    202 with status "pending". Pass wait=true to block until ready.
+    """
+    predictor = get_predictor()
+    _require_model(predictor)
+
+    cache = get_evaluation_cache()
+    state, metrics = cache.evaluate(predictor) if wait else cache.get_or_schedule(predictor)
+    if state == "error":
+        raise HTTPException(500, f"Evaluation failed: {metrics['error']}")
+    if state == "pending":
+        response.status_code = 202
+    return {"status": state, **metrics}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+"""
+Dynamic micro-batching for MNIST inference.
+Gathers concurrent single-image requests for a few milliseconds and runs
+them through the model as one forward pass.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+_STOP = object()
+
+
+class BatchStats:
+    """Running batch-size and queue-wait statistics (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_size = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.size_histogram: Dict[int, int] = {}
+
+    def record(self, size: int, waits_ms: List[float]):
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.total_wait_ms += sum(waits_ms)
+            self.max_wait_ms = max(self.max_wait_ms, max(waits_ms))
+            self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "mean_queue_wait_ms": self.total_wait_ms / self.requests if self.requests else 0.0,
+                "max_queue_wait_ms": self.max_wait_ms,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self.size_histogram.items())},
+            }
+
+
+class MicroBatcher:
+    """
+    Collects inputs from concurrent callers and runs them as one batch.
+
+    A batch is dispatched as soon as it holds `max_batch_size` items or the
+    oldest queued item has waited `max_wait_ms`, whichever comes first.
+    `forward` receives an (N, ...) array and must return (N, ...) outputs.
+    """
+
+    def __init__(self, forward: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self._forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.stats = BatchStats()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, x: np.ndarray) -> Future:
+        """Queue a single input (no batch dim). Resolves to its output row."""
+        fut: Future = Future()
+        # Under the lock so nothing can be queued behind _STOP
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((x, fut, time.perf_counter()))
+        return fut
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: float = 5.0):
+        """Stop accepting work, drain what is queued, and stop the worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = item[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    nxt = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._run_batch(batch)
+        self._fail_leftovers()
+
+    def _fail_leftovers(self):
+        """Resolve anything still queued after _STOP so no caller waits forever."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("MicroBatcher is closed"))
+
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future, float]]):
+        started = time.perf_counter()
+        live = [b for b in batch if b[1].set_running_or_notify_cancel()]
+        if not live:
+            return
+        self.stats.record(len(live), [(started - t) * 1000.0 for _, _, t in live])
+        try:
+            outputs = self._forward(np.stack([x for x, _, _ in live]))
+        except Exception as e:
+            for _, fut, _ in live:
+                fut.set_exception(e)
+            return
+        for i, (_, fut, _) in enumerate(live):
+            fut.set_result(outputs[i])
@@ -0,0 +1,56 @@
+"""Shared helpers for the benchmark scripts."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: load through DigitPredictor, predict once
+COLD_START = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import numpy as np
+from predictor import DigitPredictor
+p = DigitPredictor(model_path={path!r})
+p.load()
+p.predict(np.zeros((28, 28), dtype=np.float32))
+seconds = time.perf_counter() - t0
+try:
+    # VmHWM resets on exec; ru_maxrss would include the parent's peak on Linux
+    with open("/proc/self/status") as f:
+        peak_kb = next(int(l.split()[1]) for l in f if l.startswith("VmHWM:"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "seconds": seconds,
+    "peak_rss_mb": peak_kb / 1024,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+    "served": p.model_path,
+    "precision": p.precision,
+}}))
+"""
+
+
+def time_ms(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds, after one warm-up call."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples)) * 1000
+
+
+def cold_start(path: str, env: dict = None) -> dict:
+    """Startup time and peak RSS of a fresh process serving `path`."""
+    out = subprocess.run(
+        [sys.executable, "-c", COLD_START.format(root=ROOT, path=path)],
+        capture_output=True, text=True, check=True, env={**os.environ, **(env or {})},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Compare training epoch time: NumPy arrays + validation_split with augmentation
+inside the model, against the tf.data pipeline with augmentation outside it.
+Execute: python benchmarks/bench_input_pipeline.py [--model advanced] [--samples 20000] [--epochs 3]
+Needs the MNIST cache (downloaded on first use).
+"""
+import argparse
+import sys
+import time
+
+from _common import ROOT
+
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", choices=["advanced", "simple"], default="advanced")
+    parser.add_argument("--samples", type=int, default=20000, help="training images used")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=128)
+    args = parser.parse_args()
+
+    import numpy as np
+    from tensorflow import keras
+    from model import build_cnn_model, build_simple_model, load_mnist_data, train_model
+
+    (x_train, y_train), (x_test, y_test) = load_mnist_data()
+    x_train, y_train = x_train[:args.samples], y_train[:args.samples]
+
+    class EpochTimer(keras.callbacks.Callback):
+        def on_train_begin(self, logs=None):
+            self.times = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.t0 = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.times.append(time.perf_counter() - self.t0)
+
+    rows = []
+    for pipeline in ("numpy", "tfdata"):
+        keras.utils.set_random_seed(0)
+        if args.model == "simple":
+            model = build_simple_model()
+        else:
+            model = build_cnn_model(augment=pipeline == "numpy")
+        timer = EpochTimer()
+        _, test_loss, test_acc = train_model(
+            model, x_train, y_train, x_test, y_test,
+            epochs=args.epochs, batch_size=args.batch_size,
+            use_augmentation=args.model != "simple", callbacks=[timer], pipeline=pipeline,
+        )
+        # The first epoch includes tracing and the pipeline cache fill
+        steady = timer.times[1:] or timer.times
+        rows.append((pipeline, timer.times[0], float(np.mean(steady)), test_acc))
+
+    print(f"{'pipeline':>8} {'epoch 1 s':>10} {'epoch s':>8} {'img/s':>8} {'test acc':>9}")
+    for name, first, steady, acc in rows:
+        print(f"{name:>8} {first:>10.2f} {steady:>8.2f} {args.samples * 0.9 / steady:>8.0f} {acc:>9.4f}")
+    print(f"speedup: {rows[0][2] / rows[1][2]:.2f}x per steady-state epoch")
+
+
+if __name__ == "__main__":
+    main()
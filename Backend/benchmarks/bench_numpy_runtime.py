@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Compare the Keras model with its NumPy-runtime export: agreement, per-batch
+latency, and cold-start time / peak memory of a fresh serving process.
+Execute: python benchmarks/bench_numpy_runtime.py [--model mnist_cnn_model.keras]
+Without --model, an untrained build_cnn_model() (or --arch simple) is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from _common import ROOT, cold_start, time_ms
+
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", help="trained .keras model (default: fresh build)")
+    parser.add_argument("--arch", choices=["advanced", "simple"], default="advanced")
+    parser.add_argument("--batch-sizes", default="1,32,256")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from tensorflow import keras
+    from inference_graph import export_npz
+    from model import build_cnn_model, build_simple_model
+    from numpy_runtime import NumpyModel
+
+    tmp = tempfile.mkdtemp(prefix="npz-bench-")
+    if args.model:
+        keras_path = args.model
+        model = keras.models.load_model(keras_path)
+    else:
+        model = build_cnn_model() if args.arch == "advanced" else build_simple_model()
+        keras_path = os.path.join(tmp, "model.keras")
+        model.save(keras_path)
+    npz_path = export_npz(model, os.path.join(tmp, "model.npz"))
+    runtime = NumpyModel.load(npz_path)
+
+    rng = np.random.default_rng(0)
+    x = rng.random((max(int(b) for b in args.batch_sizes.split(",")), 28, 28, 1), dtype=np.float32)
+    diff = np.abs(model.predict(x, verbose=0) - runtime.predict(x)).max()
+    print(f"Model: {keras_path}")
+    print(f"Files: keras {os.path.getsize(keras_path) / 1e6:.2f} MB, npz {os.path.getsize(npz_path) / 1e6:.2f} MB")
+    print(f"Max |keras - numpy| over {len(x)} inputs: {diff:.2e}\n")
+
+    print(f"{'batch':>6} {'keras ms':>10} {'numpy ms':>10}")
+    for b in (int(b) for b in args.batch_sizes.split(",")):
+        xb = x[:b]
+        k = time_ms(lambda: model.predict(xb, verbose=0), args.repeat)
+        n = time_ms(lambda: runtime.predict(xb), args.repeat)
+        print(f"{b:>6} {k:>10.2f} {n:>10.2f}")
+
+    print(f"\n{'runtime':>8} {'cold start s':>13} {'peak RSS MB':>12} {'TF loaded':>10}")
+    for name, path in (("keras", keras_path), ("numpy", npz_path)):
+        r = cold_start(path)
+        print(f"{name:>8} {r['seconds']:>13.2f} {r['peak_rss_mb']:>12.0f} {str(r['tensorflow_imported']):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Preprocessing cost on synthetic canvas drawings: time and NumPy allocation per
+image for preprocess() against the earlier float32 pipeline, by input type,
+and per-image preprocess() against preprocess_batch().
+Execute: python benchmarks/bench_preprocessing.py [--count 256] [--size 280] [--repeat 10]
+"""
+import argparse
+import base64
+import io
+import sys
+import tracemalloc
+
+from _common import ROOT, time_ms
+
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def canvases(count: int, size: int, seed: int = 0):
+    """Dark strokes on a white canvas, the shape the frontend sends."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(count):
+        img = Image.new("L", (size, size), 255)
+        draw = ImageDraw.Draw(img)
+        lo, hi = size // 5, size - size // 5
+        points = [(int(rng.integers(lo, hi)), int(rng.integers(lo, hi))) for _ in range(4)]
+        draw.line(points, fill=0, width=max(2, size // 15))
+        out.append(np.array(img))
+    return out
+
+
+def baseline_preprocess(image):
+    """The earlier pipeline: decode, float32 grayscale, full-size inverted and normalized copies."""
+    if isinstance(image, str):
+        image = base64.b64decode(image.split(",", 1)[-1])
+    if isinstance(image, bytes):
+        image = np.array(Image.open(io.BytesIO(image)).convert("L"))
+    arr = np.array(image).astype(np.float32)
+    arr_255 = (arr * 255.0).astype(np.uint8) if arr.max() <= 1.0 else arr.astype(np.uint8)
+    border = np.concatenate([arr_255[0, :], arr_255[-1, :], arr_255[:, 0], arr_255[:, -1]])
+    if float(np.median(border)) / 255.0 > 0.5:
+        arr_255 = 255 - arr_255
+    arr_norm = arr_255.astype(np.float32) / 255.0
+    mask = arr_norm > 0.2
+    if not mask.any():
+        return np.zeros((28, 28), dtype=np.float32)
+    rmin, rmax = np.where(mask.any(axis=1))[0][[0, -1]]
+    cmin, cmax = np.where(mask.any(axis=0))[0][[0, -1]]
+    cropped = arr_norm[rmin:rmax + 1, cmin:cmax + 1]
+    size = max(cropped.shape)
+    padded = np.zeros((size, size), dtype=np.float32)
+    y_off, x_off = (size - cropped.shape[0]) // 2, (size - cropped.shape[1]) // 2
+    padded[y_off:y_off + cropped.shape[0], x_off:x_off + cropped.shape[1]] = cropped
+    pil = Image.fromarray((padded * 255.0).astype(np.uint8)).resize((28, 28), Image.Resampling.LANCZOS)
+    return np.array(pil).astype(np.float32) / 255.0
+
+
+def allocated_kb(fn, images) -> float:
+    """Peak NumPy/Python allocation (tracemalloc) of fn over one image, in KiB, averaged."""
+    peaks = []
+    for image in images:
+        tracemalloc.start()
+        fn(image)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return float(np.mean(peaks)) / 1024
+
+
+def encodings(images):
+    """The same drawings as uint8 arrays, PNG bytes and PNG data URLs."""
+    pngs = []
+    for image in images:
+        buf = io.BytesIO()
+        Image.fromarray(image).save(buf, format="PNG")
+        pngs.append(buf.getvalue())
+    urls = ["data:image/png;base64," + base64.b64encode(png).decode() for png in pngs]
+    return {"uint8 array": images, "PNG bytes": pngs, "data URL": urls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=256)
+    parser.add_argument("--size", type=int, default=280)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    from preprocessing import preprocess, preprocess_batch
+
+    images = canvases(args.count, args.size)
+    print(f"{args.count} canvases of {args.size}x{args.size}")
+    print(f"{'input':>12} {'pipeline':>9} {'us/image':>9} {'peak KiB':>9}")
+    for name, inputs in encodings(images).items():
+        sample = inputs[:32]
+        for label, fn in (("before", baseline_preprocess), ("now", preprocess)):
+            fn(inputs[0])  # fill thread-local scratch buffers
+            ms = time_ms(lambda: [fn(image) for image in inputs], args.repeat)
+            print(f"{name:>12} {label:>9} {ms * 1000 / args.count:>9.0f} {allocated_kb(fn, sample):>9.0f}")
+    print()
+
+    per_image = time_ms(lambda: [preprocess(image) for image in images], args.repeat)
+    batched = time_ms(lambda: preprocess_batch(images), args.repeat)
+    diff = np.abs(np.stack([preprocess(image) for image in images]) - preprocess_batch(images)).max()
+
+    print(f"{'path':>10} {'total ms':>9} {'us/image':>9}")
+    for name, ms in (("per-image", per_image), ("batch", batched)):
+        print(f"{name:>10} {ms:>9.1f} {ms * 1000 / args.count:>9.0f}")
+    print(f"speedup: {per_image / batched:.2f}x, max abs diff {diff * 255:.0f}/255")
+
+
+if __name__ == "__main__":
+    main()
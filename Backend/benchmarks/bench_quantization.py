@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Quantize the served model and compare it with float32: test-set accuracy,
+per-batch latency, artifact size, and cold-start time / peak memory.
+Execute: python benchmarks/bench_quantization.py [--model mnist_cnn_model.keras]
+Needs a trained model and the MNIST cache (calibration and test set).
+"""
+import argparse
+import sys
+
+from _common import ROOT, cold_start
+
+sys.path.insert(0, ROOT)
+
+
+def main():
+    from config import MODEL_PATH, QUANT_CALIBRATION_SIZE
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--precisions", default="float16,int8")
+    parser.add_argument("--calibration-size", type=int, default=QUANT_CALIBRATION_SIZE)
+    args = parser.parse_args()
+
+    from quantization import compare, export_quantized
+
+    rows = []
+    base = None
+    for precision in args.precisions.split(","):
+        meta = export_quantized(args.model, precision, args.calibration_size)
+        report = compare(args.model, meta["path"])
+        if base is None:
+            base = {**report["float32"], **cold_start(args.model, {"MODEL_PRECISION": "float32"})}
+            rows.append(("float32", base))
+        rows.append((precision, {**report["quantized"], **cold_start(args.model, {"MODEL_PRECISION": precision})}))
+
+    print(f"{'precision':>9} {'accuracy':>9} {'delta':>8} {'b1 ms':>7} {'b32 ms':>7} "
+          f"{'size MB':>8} {'start s':>8} {'RSS MB':>7}")
+    for name, r in rows:
+        print(f"{name:>9} {r['accuracy']:>9.4f} {r['accuracy'] - base['accuracy']:>+8.4f} "
+              f"{r['latency_ms_batch1']:>7.2f} {r['latency_ms_batch32']:>7.2f} "
+              f"{r['size_bytes'] / 1e6:>8.2f} {r['seconds']:>8.2f} {r['peak_rss_mb']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
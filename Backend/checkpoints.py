@@ -0,0 +1,157 @@
+"""
+Resumable training runs.
+
+Each run has a directory under TRAINING_RUNS_DIR with its parameters
+(run.json) and tf.train checkpoints of the model weights and optimizer
+state, written every TRAINING_CHECKPOINT_EVERY epochs. A JSON sidecar next
+to each checkpoint holds the epoch, the learning rate and the
+ReduceLROnPlateau/EarlyStopping counters (EarlyStopping's best weights go
+in an .npz). Resuming restores all of it, so a killed or cancelled run
+continues from its last completed checkpoint. Only the newest
+TRAINING_CHECKPOINT_KEEP checkpoints are kept.
+"""
+
+import glob
+import json
+import os
+import re
+import uuid
+from typing import Optional, Sequence
+
+import numpy as np
+
+from config import TRAINING_CHECKPOINT_EVERY, TRAINING_CHECKPOINT_KEEP, TRAINING_RUNS_DIR
+
+RUN_PARAMS_FILE = "run.json"
+_RUN_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Counters ReduceLROnPlateau / EarlyStopping reset in on_train_begin
+_CALLBACK_STATE = ("wait", "cooldown_counter", "best", "best_epoch", "stopped_epoch")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def valid_run_id(run_id: str) -> bool:
+    return bool(_RUN_ID.match(run_id or ""))
+
+
+def run_dir(run_id: str, root: str = TRAINING_RUNS_DIR) -> str:
+    if not valid_run_id(run_id):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return os.path.join(root, run_id)
+
+
+def load_run_params(directory: str) -> Optional[dict]:
+    """Parameters a run was started with, or None for a new run."""
+    try:
+        with open(os.path.join(directory, RUN_PARAMS_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_run_params(directory: str, params: dict):
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, RUN_PARAMS_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(params, f)
+    os.replace(tmp, os.path.join(directory, RUN_PARAMS_FILE))
+
+
+def _plain(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+def checkpoint_callback(directory: str, model, tracked: Sequence = (),
+                        keep: int = TRAINING_CHECKPOINT_KEEP, every: int = TRAINING_CHECKPOINT_EVERY):
+    """
+    Keras callback that checkpoints `model` (compiled) and the state of the
+    `tracked` callbacks into `directory`. Call restore() before fit and pass
+    its return value as initial_epoch. It must come after the tracked
+    callbacks in the callback list, since their on_train_begin resets them.
+    """
+    import tensorflow as tf
+    from tensorflow import keras
+
+    class Checkpoints(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.directory = directory
+            self._net = model
+            self._tracked = list(tracked)
+            self._every = max(1, every)
+            self._checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+            self._manager = tf.train.CheckpointManager(self._checkpoint, directory, max_to_keep=max(1, keep))
+            self._pending = None
+
+        def _latest(self):
+            """Newest checkpoint whose sidecar was written (a crash may leave one without)."""
+            for path in reversed(self._manager.checkpoints):
+                if os.path.exists(path + ".json"):
+                    return path
+            return None
+
+        def restore(self) -> int:
+            """Load the latest checkpoint; returns the epoch to resume from (0 if there is none)."""
+            path = self._latest()
+            if path is None:
+                return 0
+            optimizer = self._net.optimizer
+            # Create the slot variables now so they are restored, not left at zero
+            if not getattr(optimizer, "built", False):
+                optimizer.build(self._net.trainable_variables)
+            self._checkpoint.restore(path).assert_existing_objects_matched()
+            with open(path + ".json") as f:
+                state = json.load(f)
+            optimizer.learning_rate = state["learning_rate"]
+            self._pending = (path, state)
+            return state["epoch"]
+
+        def on_train_begin(self, logs=None):
+            if self._pending is None:
+                return
+            path, state = self._pending
+            self._pending = None
+            for i, (callback, saved) in enumerate(zip(self._tracked, state["callbacks"])):
+                for name, value in saved.items():
+                    setattr(callback, name, value)
+                weights = f"{path}.cb{i}.npz"
+                if os.path.exists(weights):
+                    with np.load(weights) as data:
+                        callback.best_weights = [data[f"arr_{j}"] for j in range(len(data.files))]
+
+        def on_epoch_end(self, epoch, logs=None):
+            if (epoch + 1) % self._every == 0:
+                self.save(epoch + 1)
+
+        def save(self, epoch: int) -> str:
+            path = self._manager.save(checkpoint_number=epoch)
+            state = {
+                "epoch": epoch,
+                "learning_rate": float(np.array(self._net.optimizer.learning_rate)),
+                "callbacks": [
+                    {name: _plain(getattr(cb, name)) for name in _CALLBACK_STATE if hasattr(cb, name)}
+                    for cb in self._tracked
+                ],
+            }
+            for i, cb in enumerate(self._tracked):
+                if getattr(cb, "best_weights", None) is not None:
+                    np.savez(f"{path}.cb{i}.npz", *cb.best_weights)
+            # The sidecar goes last: its presence marks the checkpoint complete
+            tmp = path + ".json.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, path + ".json")
+            self._prune_sidecars()
+            return path
+
+        def _prune_sidecars(self):
+            """Drop sidecars of checkpoints the manager has already deleted."""
+            live = {os.path.basename(p) for p in self._manager.checkpoints}
+            for name in glob.glob(os.path.join(self.directory, "ckpt-*.*")):
+                base = os.path.basename(name)
+                if base.split(".")[0] not in live and (base.endswith(".json") or base.endswith(".npz")):
+                    os.remove(name)
+
+    return Checkpoints()
@@ -25,4 +25,93 @@ if _extra:
 # Model
 MODEL_PATH = os.getenv("MODEL_PATH", "mnist_cnn_model.keras")
 MODEL_INPUT_SHAPE = (28, 28, 1)
+# float32 (default) | float16 | int8: serve the quantized artifact built by quantization.py
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "float32").lower()
+QUANT_CALIBRATION_SIZE = int(os.getenv("QUANT_CALIBRATION_SIZE", "500"))
 NUM_CLASSES = 10
+
+# Versioned model registry: each trained model is published under its content hash and
+# a CURRENT pointer; workers poll the pointer and hot-swap (0 disables watching)
+MODEL_REGISTRY_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "models"),
+)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "2"))
+
+# Startup prewarm: load the model and trace its compiled predict function before traffic
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_BATCH_SIZES = [int(x) for x in os.getenv("WARMUP_BATCH_SIZES", "1,8,32").split(",") if x.strip()]
+# Batches up to this size run through the compiled function instead of model.predict
+COMPILED_PREDICT_MAX_BATCH = int(os.getenv("COMPILED_PREDICT_MAX_BATCH", "256"))
+
+# Dataset: MNIST converted once to uint8 .npy files and memory-mapped afterwards
+MNIST_CACHE_DIR = os.getenv(
+    "MNIST_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mnist"),
+)
+
+# Evaluation: metrics cached per model fingerprint, test set scored in chunks
+EVAL_CACHE_DIR = os.getenv(
+    "EVAL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "evaluations"),
+)
+EVAL_CHUNK_SIZE = int(os.getenv("EVAL_CHUNK_SIZE", "1024"))
+
+# Inference micro-batching (opt-in): coalesce concurrent requests into one forward pass
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "false").lower() in ("1", "true", "yes")
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+BATCH_RESULT_TIMEOUT = float(os.getenv("BATCH_RESULT_TIMEOUT", "30"))
+
+# FastAPI inference executor: blocking work runs on a bounded pool off the event loop.
+# Requests beyond workers + queue size get 429; waiting longer than the timeout gets 503.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_QUEUE_TIMEOUT = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "10"))
+
+# Training input: "numpy" (arrays + validation_split) or "tfdata" (input_pipeline.py:
+# parallel augmentation outside the model, cache, shuffle, prefetch)
+TRAINING_PIPELINE = os.getenv("TRAINING_PIPELINE", "numpy").lower()
+TRAINING_SHUFFLE_BUFFER = int(os.getenv("TRAINING_SHUFFLE_BUFFER", "0"))  # 0 = whole training split
+
+# Training jobs: each runs in its own process; progress is streamed per batch/epoch
+TRAINING_MAX_CONCURRENT = int(os.getenv("TRAINING_MAX_CONCURRENT", "1"))
+TRAINING_MAX_QUEUED = int(os.getenv("TRAINING_MAX_QUEUED", "8"))
+TRAINING_PROGRESS_EVERY = int(os.getenv("TRAINING_PROGRESS_EVERY", "50"))  # batches between updates
+TRAINING_CANCEL_GRACE = float(os.getenv("TRAINING_CANCEL_GRACE", "10"))  # seconds before terminate
+
+# Training checkpoints: each run gets a directory here; a run resumes from its latest checkpoint
+TRAINING_RUNS_DIR = os.getenv(
+    "TRAINING_RUNS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "runs"),
+)
+TRAINING_CHECKPOINT_EVERY = int(os.getenv("TRAINING_CHECKPOINT_EVERY", "1"))  # epochs between checkpoints
+TRAINING_CHECKPOINT_KEEP = int(os.getenv("TRAINING_CHECKPOINT_KEEP", "3"))  # newest checkpoints kept per run
+
+# Preprocessing: inputs larger than this on a side are reduced by PIL (JPEG draft
+# decode, box reduce) before the LANCZOS resize instead of resampled in full
+PREPROCESS_REDUCE_ABOVE = int(os.getenv("PREPROCESS_REDUCE_ABOVE", "512"))
+# preprocess_batch works through this many inputs at a time (bounds its float64 intermediates)
+PREPROCESS_BATCH_CHUNK = int(os.getenv("PREPROCESS_BATCH_CHUNK", "32"))
+
+# Bulk prediction (POST /predict/batch)
+PREDICT_BATCH_CHUNK = int(os.getenv("PREDICT_BATCH_CHUNK", "256"))
+PREDICT_BATCH_MAX_ITEMS = int(os.getenv("PREDICT_BATCH_MAX_ITEMS", "1000"))
+
+# Raw pixel / stroke prediction: largest width * height accepted
+PREDICT_RAW_MAX_PIXELS = int(os.getenv("PREDICT_RAW_MAX_PIXELS", str(2048 * 2048)))
+
+# PHP bridge daemon (php_bridge/bridge_server.py)
+BRIDGE_SOCKET = os.getenv("BRIDGE_SOCKET", "/tmp/digit_bridge.sock")
+BRIDGE_WORKERS = int(os.getenv("BRIDGE_WORKERS", "4"))
+BRIDGE_MAX_LINE_BYTES = int(os.getenv("BRIDGE_MAX_LINE_BYTES", str(16 * 1024 * 1024)))
+# Client shim read timeouts (seconds); past them it returns an error (it only runs
+# commands in-process when the server is not running)
+BRIDGE_CLIENT_TIMEOUT = float(os.getenv("BRIDGE_CLIENT_TIMEOUT", "30"))
+BRIDGE_EVALUATE_TIMEOUT = float(os.getenv("BRIDGE_EVALUATE_TIMEOUT", "600"))
+BRIDGE_TRAIN_TIMEOUT = float(os.getenv("BRIDGE_TRAIN_TIMEOUT", "3600"))
+
+# Prediction result cache: repeat submissions (by payload or normalized pixels) skip inference
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
@@ -0,0 +1,133 @@
+"""
+Persistent MNIST dataset cache.
+Converts MNIST once into compact uint8 .npy files (images + integer labels),
+memory-maps them on later loads, and builds float views only on demand.
+"""
+
+import json
+import os
+import threading
+from typing import Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from config import MNIST_CACHE_DIR, NUM_CLASSES
+
+SPLITS = ("train", "test")
+_FORMAT_VERSION = 1
+
+
+def _keras_loader():
+    from tensorflow.keras.datasets import mnist
+    return mnist.load_data()
+
+
+class MnistDataset:
+    """
+    On-disk MNIST cache.
+
+    Layout in `cache_dir`: x_{split}.npy (N, 28, 28) uint8, y_{split}.npy (N,)
+    uint8 and meta.json, which is written last and marks the cache complete.
+    """
+
+    def __init__(self, cache_dir: str = MNIST_CACHE_DIR,
+                 loader: Optional[Callable] = None):
+        self.cache_dir = cache_dir
+        self._loader = loader or _keras_loader
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def is_built(self) -> bool:
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f).get("version") == _FORMAT_VERSION
+        except (OSError, ValueError):
+            return False
+
+    def build(self):
+        """Convert raw MNIST to the on-disk format (atomic per file)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        (x_train, y_train), (x_test, y_test) = self._loader()
+        arrays = {
+            "x_train": x_train, "y_train": y_train,
+            "x_test": x_test, "y_test": y_test,
+        }
+        for name, arr in arrays.items():
+            tmp = self._path(f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(arr, dtype=np.uint8))
+            os.replace(tmp, self._path(f"{name}.npy"))
+        meta = {
+            "version": _FORMAT_VERSION,
+            "shapes": {name: list(arr.shape) for name, arr in arrays.items()},
+        }
+        tmp = self._path(f"meta.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def _load(self):
+        with self._lock:
+            if self._arrays:
+                return
+            if not self.is_built():
+                self.build()
+            for split in SPLITS:
+                for kind in ("x", "y"):
+                    name = f"{kind}_{split}"
+                    self._arrays[name] = np.load(self._path(f"{name}.npy"), mmap_mode="r")
+
+    def images(self, split: str = "train") -> np.ndarray:
+        """Read-only (N, 28, 28) uint8 memory-mapped images."""
+        self._load()
+        return self._arrays[f"x_{split}"]
+
+    def labels(self, split: str = "train") -> np.ndarray:
+        """Read-only (N,) uint8 integer labels."""
+        self._load()
+        return self._arrays[f"y_{split}"]
+
+    def float_images(self, split: str = "train", start: int = 0,
+                     stop: Optional[int] = None) -> np.ndarray:
+        """(n, 28, 28, 1) float32 in [0, 1] for images[start:stop] (new array)."""
+        raw = self.images(split)[start:stop]
+        out = raw.astype(np.float32)
+        out *= 1.0 / 255.0
+        return out[..., np.newaxis]
+
+    def one_hot_labels(self, split: str = "train", start: int = 0,
+                       stop: Optional[int] = None) -> np.ndarray:
+        """(n, 10) float32 one-hot labels for labels[start:stop]."""
+        return np.eye(NUM_CLASSES, dtype=np.float32)[self.labels(split)[start:stop]]
+
+    def iter_batches(self, split: str = "test",
+                     batch_size: int = 1024) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (float images, integer labels) chunks without materialising the split."""
+        n = len(self.labels(split))
+        for start in range(0, n, batch_size):
+            stop = min(start + batch_size, n)
+            yield self.float_images(split, start, stop), np.asarray(self.labels(split)[start:stop])
+
+    def load_float(self):
+        """Legacy format: ((x_train, y_train), (x_test, y_test)) float32 + one-hot."""
+        return (
+            (self.float_images("train"), self.one_hot_labels("train")),
+            (self.float_images("test"), self.one_hot_labels("test")),
+        )
+
+
+# Singleton so long-running servers decode MNIST at most once per process
+_dataset: Optional[MnistDataset] = None
+_dataset_lock = threading.Lock()
+
+
+def get_dataset() -> MnistDataset:
+    """Get or create the global dataset cache."""
+    global _dataset
+    if _dataset is None:
+        with _dataset_lock:
+            if _dataset is None:
+                _dataset = MnistDataset()
+    return _dataset
@@ -2,7 +2,7 @@
 Django admin for digit_api models.
 """
 from django.contrib import admin
-from .models import Prediction, TrainingRun, PredictionProbability
+from .models import Prediction, PredictionRollup, TrainingRun, PredictionProbability
 
 
 class PredictionProbabilityInline(admin.TabularInline):
@@ -14,10 +14,22 @@ class PredictionProbabilityInline(admin.TabularInline):
 class PredictionAdmin(admin.ModelAdmin):
     list_display = ['id', 'digit', 'confidence', 'source', 'created_at']
     list_filter = ['source', 'digit']
+    readonly_fields = ['probability_summary']
     inlines = [PredictionProbabilityInline]
 
+    @admin.display(description='Probabilities')
+    def probability_summary(self, obj):
+        return ', '.join(f'{i}: {p:.3f}' for i, p in enumerate(obj.probability_list()))
+
 
 @admin.register(TrainingRun)
 class TrainingRunAdmin(admin.ModelAdmin):
-    list_display = ['id', 'model_type', 'epochs', 'batch_size', 'test_accuracy', 'test_loss', 'created_at']
-    list_filter = ['model_type']
+    list_display = ['id', 'model_type', 'epochs', 'batch_size', 'learning_rate', 'dropout', 'test_accuracy',
+                    'test_loss', 'duration_seconds', 'throughput', 'status', 'sweep_id', 'created_at']
+    list_filter = ['model_type', 'status', 'sweep_id']
+
+
+@admin.register(PredictionRollup)
+class PredictionRollupAdmin(admin.ModelAdmin):
+    list_display = ['bucket', 'source', 'digit', 'confidence_bin', 'count']
+    list_filter = ['source', 'digit']
@@ -0,0 +1,26 @@
+"""
+Recompute hourly prediction rollups from digit_predictions.
+Run periodically (e.g. cron) when PREDICTION_ROLLUPS_INCREMENTAL is off,
+or once to backfill after enabling rollups.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from digit_api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild PredictionRollup rows for the last N hours (or all history).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None,
+                            help='Only rebuild this many trailing hours (default: everything)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['hours'] is not None:
+            since = timezone.now() - timedelta(hours=options['hours'])
+        written = rebuild_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows'))
@@ -0,0 +1,98 @@
+"""
+Hyperparameter sweep over the model.py architectures (see sweep.py).
+Every trial is stored as a TrainingRun tagged with the sweep id, including
+pruned and early-stopped ones, with its wall-clock time and throughput.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from digit_api.models import TrainingRun
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',') if v.strip()]
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Grid or random search over model type, learning rate, batch size and dropout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=['grid', 'random'], default='grid')
+        parser.add_argument('--trials', type=int, default=8, help='Random search: number of trials')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--model', default='simple,advanced')
+        parser.add_argument('--lr', default='1e-3,3e-4')
+        parser.add_argument('--batch-size', default='64,128')
+        parser.add_argument('--dropout', default='0.3,0.5')
+        parser.add_argument('--epochs', type=int, default=5)
+        parser.add_argument('--samples', type=int, default=None, help='Train on the first N images only')
+        parser.add_argument('--workers', type=int, default=2, help='Trials running at once')
+        parser.add_argument('--intra-threads', type=int, default=None,
+                            help='TensorFlow intra-op threads per trial (default: cores / workers)')
+        parser.add_argument('--inter-threads', type=int, default=1)
+        parser.add_argument('--prune-after', type=int, default=1,
+                            help='First epoch at which below-median trials are pruned')
+
+    def handle(self, *args, **options):
+        from sweep import grid, random_search, run_sweep
+
+        space = {
+            'model_type': [m.strip().lower() for m in options['model'].split(',') if m.strip()],
+            'learning_rate': _floats(options['lr']),
+            'batch_size': _ints(options['batch_size']),
+            'dropout': _floats(options['dropout']),
+        }
+        if not set(space['model_type']) <= {'simple', 'advanced'}:
+            raise CommandError('--model must be simple and/or advanced')
+        if any(not 0 <= d < 1 for d in space['dropout']):
+            raise CommandError('--dropout values must be in [0, 1)')
+        if options['strategy'] == 'grid':
+            trials = grid(space)
+        else:
+            trials = random_search(space, options['trials'], options['seed'])
+        self.stdout.write(f"Running {len(trials)} trials on {options['workers']} workers")
+
+        def record(r):
+            self.stdout.write(
+                f"{r['status']:>13} {r['model_type']:>8} lr={r['learning_rate']:g} bs={r['batch_size']} "
+                f"dropout={r['dropout']:g} acc={r.get('test_accuracy', float('nan')):.4f} "
+                f"{r.get('duration_seconds', 0):.0f}s {r.get('throughput', 0):.0f} img/s"
+            )
+            if r['status'] == 'failed':
+                self.stderr.write(r.get('error', ''))
+                return
+            TrainingRun.objects.create(
+                model_type=r['model_type'],
+                epochs=r['epochs'],
+                epochs_completed=r['epochs_completed'],
+                batch_size=r['batch_size'],
+                learning_rate=r['learning_rate'],
+                dropout=r['dropout'],
+                test_accuracy=r['test_accuracy'],
+                test_loss=r['test_loss'],
+                duration_seconds=r['duration_seconds'],
+                throughput=r['throughput'],
+                status=r['status'],
+                sweep_id=r['sweep_id'],
+            )
+
+        results = run_sweep(
+            trials,
+            epochs=options['epochs'],
+            workers=options['workers'],
+            samples=options['samples'],
+            intra_threads=options['intra_threads'],
+            inter_threads=options['inter_threads'],
+            prune_after=options['prune_after'],
+            on_result=record,
+        )
+        best = next((r for r in results if r['status'] != 'failed'), None)
+        if best is None:
+            raise CommandError('All trials failed')
+        self.stdout.write(self.style.SUCCESS(
+            f"Best: {best['model_type']} lr={best['learning_rate']:g} bs={best['batch_size']} "
+            f"dropout={best['dropout']:g} test_accuracy={best['test_accuracy']:.4f} (sweep {best['sweep_id']})"
+        ))
@@ -0,0 +1,43 @@
+import numpy as np
+from django.db import migrations, models
+
+
+def pack_existing_probabilities(apps, schema_editor):
+    """Copy PredictionProbability rows into Prediction.packed_probabilities (float32)."""
+    Prediction = apps.get_model('digit_api', 'Prediction')
+    PredictionProbability = apps.get_model('digit_api', 'PredictionProbability')
+
+    batch_size = 1000
+    last_id = 0
+    while True:
+        ids = list(
+            Prediction.objects.filter(id__gt=last_id, packed_probabilities__isnull=True)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        probs = {}
+        for pred_id, digit_class, probability in (
+            PredictionProbability.objects.filter(prediction_id__in=ids)
+            .values_list('prediction_id', 'digit_class', 'probability')
+        ):
+            probs.setdefault(pred_id, np.zeros(10, dtype='<f4'))[digit_class] = probability
+        updates = [Prediction(id=pred_id, packed_probabilities=arr.tobytes()) for pred_id, arr in probs.items()]
+        Prediction.objects.bulk_update(updates, ['packed_probabilities'])
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digit_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='packed_probabilities',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(pack_existing_probabilities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digit_api', '0002_prediction_packed_probabilities'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['-created_at', '-id'], name='pred_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['digit', '-created_at', '-id'], name='pred_digit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['source', '-created_at', '-id'], name='pred_source_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['confidence', '-created_at'], name='pred_conf_created_idx'),
+        ),
+    ]
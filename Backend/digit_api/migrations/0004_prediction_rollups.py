@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digit_api', '0003_prediction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('source', models.CharField(max_length=16)),
+                ('digit', models.PositiveSmallIntegerField()),
+                ('confidence_bin', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+            ],
+            options={
+                'db_table': 'digit_prediction_rollups',
+                'ordering': ['bucket'],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'source', 'digit', 'confidence_bin'), name='prediction_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digit_api', '0004_prediction_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingrun',
+            name='learning_rate',
+            field=models.FloatField(default=0.001),
+        ),
+        migrations.AddField(
+            model_name='trainingrun',
+            name='dropout',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingrun',
+            name='epochs_completed',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingrun',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingrun',
+            name='throughput',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingrun',
+            name='status',
+            field=models.CharField(choices=[('completed', 'Completed'), ('early_stopped', 'Early stopped'), ('pruned', 'Pruned')], default='completed', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='trainingrun',
+            name='sweep_id',
+            field=models.CharField(blank=True, db_index=True, max_length=32, null=True),
+        ),
+    ]
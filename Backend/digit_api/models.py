@@ -3,8 +3,24 @@ Database models for MNIST Digit Recognition.
 Stores predictions, training runs, and audit data in MySQL.
 """
 
+import numpy as np
 from django.db import models
 
+# Packed probability encodings, told apart by blob length (10 classes)
+PROBABILITY_DTYPES = {'float16': '<f2', 'float32': '<f4'}
+
+
+def pack_probabilities(probabilities, dtype='float32'):
+    """Encode a class distribution as little-endian float16/float32 bytes."""
+    return np.asarray(probabilities, dtype=PROBABILITY_DTYPES[dtype]).tobytes()
+
+
+def unpack_probabilities(blob, num_classes=10):
+    """Decode pack_probabilities() output back to a list of floats."""
+    blob = bytes(blob)
+    dtype = '<f2' if len(blob) == 2 * num_classes else '<f4'
+    return np.frombuffer(blob, dtype=dtype).astype(float).tolist()
+
 
 class TrainingRun(models.Model):
     """Records each model training session."""
@@ -16,6 +32,18 @@ class TrainingRun(models.Model):
     batch_size = models.PositiveIntegerField()
     test_accuracy = models.FloatField()
     test_loss = models.FloatField()
+    learning_rate = models.FloatField(default=1e-3)
+    dropout = models.FloatField(null=True, blank=True)
+    # Epochs actually run; fewer than `epochs` when stopped early or pruned
+    epochs_completed = models.PositiveIntegerField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)  # wall-clock time of the run
+    throughput = models.FloatField(null=True, blank=True)  # training images per second
+    status = models.CharField(max_length=16, default='completed', choices=[
+        ('completed', 'Completed'),
+        ('early_stopped', 'Early stopped'),
+        ('pruned', 'Pruned'),
+    ])
+    sweep_id = models.CharField(max_length=32, null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -35,15 +63,31 @@ class Prediction(models.Model):
         ('canvas', 'Canvas/Base64'),
     ])
     image_data = models.TextField(blank=True, null=True)  # Optional base64 thumbnail (compressed)
+    # Inline class distribution (see pack_probabilities); replaces PredictionProbability rows
+    packed_probabilities = models.BinaryField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'digit_predictions'
         ordering = ['-created_at']
+        # Keyset pagination seeks on (created_at, id); filters lead where selective
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='pred_created_id_idx'),
+            models.Index(fields=['digit', '-created_at', '-id'], name='pred_digit_created_idx'),
+            models.Index(fields=['source', '-created_at', '-id'], name='pred_source_created_idx'),
+            models.Index(fields=['confidence', '-created_at'], name='pred_conf_created_idx'),
+        ]
 
     def __str__(self):
         return f"Digit {self.digit} ({self.confidence:.2%})"
 
+    def probability_list(self):
+        """Per-class probabilities from the inline blob, else from PredictionProbability rows."""
+        if self.packed_probabilities:
+            return unpack_probabilities(self.packed_probabilities)
+        rows = sorted(self.probabilities.all(), key=lambda r: r.digit_class)
+        return [r.probability for r in rows]
+
 
 class PredictionProbability(models.Model):
     """Stores per-class probabilities for each prediction (optional detail)."""
@@ -54,3 +98,29 @@ class PredictionProbability(models.Model):
     class Meta:
         db_table = 'digit_prediction_probabilities'
         unique_together = ['prediction', 'digit_class']
+
+
+class PredictionRollup(models.Model):
+    """
+    Hourly pre-aggregated prediction counts for dashboards.
+    One row per (hour, source, digit, confidence bin); see digit_api.rollups.
+    """
+    bucket = models.DateTimeField()  # Start of the hour (UTC)
+    source = models.CharField(max_length=16)
+    digit = models.PositiveSmallIntegerField()
+    confidence_bin = models.PositiveSmallIntegerField()  # 0..9 -> [0.0, 0.1) ... [0.9, 1.0]
+    count = models.PositiveIntegerField(default=0)
+    confidence_sum = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = 'digit_prediction_rollups'
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket', 'source', 'digit', 'confidence_bin'],
+                name='prediction_rollup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.source} digit {self.digit} bin {self.confidence_bin}: {self.count}"
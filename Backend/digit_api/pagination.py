@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination and filtering for prediction history.
+Pages are ordered by (created_at, id) descending and seek past the last row
+seen, so page cost doesn't grow with depth. Totals are cached estimates.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+COUNT_CACHE_TTL = 60
+
+
+def encode_cursor(obj):
+    """Opaque cursor pointing just past `obj` in (-created_at, -id) order."""
+    raw = json.dumps([obj.created_at.isoformat(), obj.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        ts = parse_datetime(created_at)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if ts is None or not isinstance(pk, int):
+        raise ValueError('Invalid cursor')
+    return ts, pk
+
+
+def _parse_time(value, name):
+    ts = parse_datetime(value)
+    if ts is None:
+        raise ValueError(f'{name} must be an ISO 8601 datetime')
+    return ts
+
+
+def filter_predictions(queryset, params):
+    """
+    Apply history filters from query params; raises ValueError on bad input.
+
+    Supported: digit, source, min_confidence, max_confidence, since, until.
+    """
+    if params.get('digit') not in (None, ''):
+        queryset = queryset.filter(digit=int(params['digit']))
+    if params.get('source'):
+        queryset = queryset.filter(source=params['source'])
+    if params.get('min_confidence') not in (None, ''):
+        queryset = queryset.filter(confidence__gte=float(params['min_confidence']))
+    if params.get('max_confidence') not in (None, ''):
+        queryset = queryset.filter(confidence__lte=float(params['max_confidence']))
+    if params.get('since'):
+        queryset = queryset.filter(created_at__gte=_parse_time(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(created_at__lt=_parse_time(params['until'], 'until'))
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, limit=50):
+    """Return (rows, next_cursor) for one page after `cursor`."""
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        ts, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=ts) | Q(created_at=ts, id__lt=pk))
+    rows = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _table_row_estimate(model):
+    """MySQL's statistics-based row estimate (no table scan), else None."""
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT TABLE_ROWS FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def approximate_count(queryset, filtered):
+    """
+    Row count for the history listing without a COUNT(*) per request.
+
+    Unfiltered listings use the engine's estimate where available; otherwise
+    counts are computed once and cached for COUNT_CACHE_TTL seconds per filter.
+    """
+    if not filtered:
+        estimate = _table_row_estimate(queryset.model)
+        if estimate is not None:
+            return estimate
+    key = 'prediction_count:' + hashlib.sha1(str(queryset.query).encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_TTL)
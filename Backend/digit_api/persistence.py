@@ -0,0 +1,210 @@
+"""
+Prediction persistence for digit_api.
+Writes predictions (with their probabilities packed inline or as bulk-inserted
+rows), optionally through a write-behind queue that batches across requests.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# (PredictionResult, source) pairs
+Record = Tuple[object, str]
+
+_STOP = object()
+
+
+def save_predictions(records: Sequence[Record], need_ids: bool = True) -> list:
+    """
+    Persist predictions; returns Prediction objects.
+
+    PREDICTION_PROBABILITY_STORAGE picks the layout: 'float16'/'float32' pack
+    the distribution inline on Prediction, 'rows' writes PredictionProbability
+    rows in one bulk insert. Pass need_ids=False when primary keys aren't used,
+    which allows a single bulk insert even on backends that can't return them.
+    """
+    from .models import Prediction, PredictionProbability, pack_probabilities
+
+    if not records:
+        return []
+    storage = getattr(settings, 'PREDICTION_PROBABILITY_STORAGE', 'rows')
+    packed = storage != 'rows'
+    with transaction.atomic():
+        objs = [
+            Prediction(
+                digit=r.digit,
+                confidence=r.confidence,
+                source=source,
+                packed_probabilities=pack_probabilities(r.probabilities, storage) if packed else None,
+            )
+            for r, source in records
+        ]
+        if connection.features.can_return_rows_from_bulk_insert or (packed and not need_ids):
+            objs = Prediction.objects.bulk_create(objs)
+        else:
+            # e.g. MySQL: bulk_create can't hand back primary keys
+            for obj in objs:
+                obj.save(force_insert=True)
+        if not packed:
+            PredictionProbability.objects.bulk_create([
+                PredictionProbability(prediction=obj, digit_class=i, probability=p)
+                for obj, (r, _) in zip(objs, records)
+                for i, p in enumerate(r.probabilities)
+            ])
+        if getattr(settings, 'PREDICTION_ROLLUPS_INCREMENTAL', True):
+            from .rollups import record_predictions
+            record_predictions(objs)
+    return objs
+
+
+def _write_batch(records: List[Record]):
+    """save_predictions() for long-lived threads: never reuse a stale connection."""
+    close_old_connections()
+    try:
+        save_predictions(records, need_ids=False)
+    finally:
+        close_old_connections()
+
+
+class PredictionWriter:
+    """
+    Background writer that batches prediction records.
+
+    Records are flushed when `flush_size` are queued or the oldest has waited
+    `flush_interval` seconds. submit() returns False when the queue is full so
+    the caller can fall back to a synchronous write.
+    """
+
+    def __init__(self, flush_size: int = 200, flush_interval: float = 1.0,
+                 max_pending: int = 10000,
+                 flush_fn: Callable[[List[Record]], object] = _write_batch):
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._flush_fn = flush_fn
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._lock = threading.Lock()
+        self.flushed = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, result, source: str) -> bool:
+        # Under the lock so nothing can be queued behind _STOP (and then never written)
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._queue.put_nowait((result, source))
+            except queue.Full:
+                return False
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            'enabled': True,
+            'pending': self.pending(),
+            'flushed': self.flushed,
+            'failed': self.failed,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+        # Write what was queued behind a _STOP that arrived mid-batch
+        rest = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        if rest:
+            self._flush(rest)
+
+    def _flush(self, batch: List[Record]):
+        try:
+            self._flush_fn(batch)
+            self.flushed += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception('Failed to persist %d predictions', len(batch))
+
+
+_writer: Optional[PredictionWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> Optional[PredictionWriter]:
+    """The shared write-behind writer, or None when PREDICTION_WRITE_BEHIND is off."""
+    global _writer
+    if not getattr(settings, 'PREDICTION_WRITE_BEHIND', False):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = PredictionWriter(
+                    flush_size=settings.PREDICTION_FLUSH_SIZE,
+                    flush_interval=settings.PREDICTION_FLUSH_INTERVAL,
+                    max_pending=settings.PREDICTION_QUEUE_MAX,
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def store_predictions(records: Sequence[Record]) -> List[Optional[int]]:
+    """
+    Persist records via the write-behind queue when enabled, else synchronously.
+    Returns the new ids; None for records that were queued.
+    """
+    writer = get_writer()
+    ids: List[Optional[int]] = []
+    direct: List[Record] = []
+    for record in records:
+        if writer is not None and writer.submit(*record):
+            ids.append(None)
+        else:
+            ids.append(len(direct))
+            direct.append(record)
+    if direct:
+        objs = save_predictions(direct)
+        ids = [objs[i].id if i is not None else None for i in ids]
+    return ids
@@ -0,0 +1,144 @@
+"""
+Hourly prediction rollups for analytics.
+PredictionRollup rows are kept up to date as predictions are written (or
+rebuilt by `manage.py rebuild_prediction_rollups`), and stats are served from
+them, so dashboard cost depends on the time window, not the table size.
+"""
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, IntegerField, Sum, Value
+from django.db.models.functions import Cast, Floor, Least, TruncHour
+from django.utils import timezone
+
+from .models import Prediction, PredictionRollup
+
+CONFIDENCE_BINS = 10
+
+
+def confidence_bin(confidence):
+    return min(max(int(confidence * CONFIDENCE_BINS), 0), CONFIDENCE_BINS - 1)
+
+
+def hour_bucket(ts):
+    """Start of the UTC hour containing `ts`."""
+    return ts.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record_predictions(predictions):
+    """
+    Fold saved Prediction objects into the rollup table.
+    Counts are aggregated in memory first, so a batch costs one upsert per key.
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for p in predictions:
+        key = (hour_bucket(p.created_at), p.source, p.digit, confidence_bin(p.confidence))
+        totals[key][0] += 1
+        totals[key][1] += p.confidence
+
+    # Fixed key order so concurrent batches take row locks in the same order (no deadlock)
+    for (bucket, source, digit, cbin), (count, conf_sum) in sorted(totals.items()):
+        lookup = dict(bucket=bucket, source=source, digit=digit, confidence_bin=cbin)
+        increment = dict(count=F('count') + count, confidence_sum=F('confidence_sum') + conf_sum)
+        if PredictionRollup.objects.filter(**lookup).update(**increment):
+            continue
+        try:
+            with transaction.atomic():
+                PredictionRollup.objects.create(**lookup, count=count, confidence_sum=conf_sum)
+        except IntegrityError:
+            # Another writer created the row first
+            PredictionRollup.objects.filter(**lookup).update(**increment)
+
+
+def rebuild_rollups(since=None, until=None):
+    """
+    Recompute rollups for [since, until) from digit_predictions; returns rows
+    written. Both ends are widened to whole hours, so no bucket is rebuilt
+    from only part of its predictions.
+    """
+    predictions = Prediction.objects.all()
+    rollups = PredictionRollup.objects.all()
+    if since is not None:
+        since = hour_bucket(since)
+        predictions = predictions.filter(created_at__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+    if until is not None:
+        if hour_bucket(until) != until:
+            until = hour_bucket(until) + timedelta(hours=1)
+        predictions = predictions.filter(created_at__lt=until)
+        rollups = rollups.filter(bucket__lt=until)
+
+    rows = (
+        predictions.order_by()
+        .annotate(
+            hour=TruncHour('created_at', tzinfo=dt_timezone.utc),
+            cbin=Least(
+                Cast(Floor(F('confidence') * CONFIDENCE_BINS), IntegerField()),
+                Value(CONFIDENCE_BINS - 1),
+            ),
+        )
+        .values('hour', 'source', 'digit', 'cbin')
+        .annotate(n=Count('id'), conf_sum=Sum('confidence', output_field=FloatField()))
+    )
+    objs = [
+        PredictionRollup(
+            bucket=r['hour'], source=r['source'], digit=r['digit'],
+            confidence_bin=r['cbin'], count=r['n'], confidence_sum=r['conf_sum'] or 0.0,
+        )
+        for r in rows
+    ]
+    with transaction.atomic():
+        rollups.delete()
+        PredictionRollup.objects.bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def prediction_stats(hours=24, source=None, now=None):
+    """Volume, digit distribution and confidence histogram over the last `hours`, per hour and source."""
+    until = hour_bucket(now or timezone.now()) + timedelta(hours=1)
+    since = until - timedelta(hours=hours)
+    rows = PredictionRollup.objects.filter(bucket__gte=since, bucket__lt=until)
+    if source:
+        rows = rows.filter(source=source)
+
+    total = 0
+    conf_total = 0.0
+    digits = [0] * 10
+    histogram = [0] * CONFIDENCE_BINS
+    by_source = defaultdict(int)
+    hourly = defaultdict(lambda: {'count': 0, 'by_source': defaultdict(int), 'confidence_histogram': [0] * CONFIDENCE_BINS})
+    for bucket, src, digit, cbin, count, conf_sum in rows.values_list(
+        'bucket', 'source', 'digit', 'confidence_bin', 'count', 'confidence_sum',
+    ):
+        total += count
+        conf_total += conf_sum
+        digits[digit] += count
+        histogram[cbin] += count
+        by_source[src] += count
+        hour = hourly[bucket]
+        hour['count'] += count
+        hour['by_source'][src] += count
+        hour['confidence_histogram'][cbin] += count
+
+    return {
+        'since': since.isoformat(),
+        'until': until.isoformat(),
+        'total': total,
+        'mean_confidence': conf_total / total if total else None,
+        'by_source': dict(by_source),
+        'digit_distribution': {str(d): n for d, n in enumerate(digits)},
+        'confidence_histogram': [
+            {'bin_start': i / CONFIDENCE_BINS, 'bin_end': (i + 1) / CONFIDENCE_BINS, 'count': n}
+            for i, n in enumerate(histogram)
+        ],
+        'hourly': [
+            {
+                'bucket': bucket.isoformat(),
+                'count': h['count'],
+                'by_source': dict(h['by_source']),
+                'confidence_histogram': h['confidence_histogram'],
+            }
+            for bucket, h in sorted(hourly.items())
+        ],
+    }
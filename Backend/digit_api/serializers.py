@@ -12,14 +12,24 @@ class PredictionProbabilitySerializer(serializers.ModelSerializer):
 
 
 class PredictionSerializer(serializers.ModelSerializer):
-    probabilities = PredictionProbabilitySerializer(many=True, read_only=True)
+    # Same shape for packed and row storage: [{digit_class, probability}, ...]
+    probabilities = serializers.SerializerMethodField()
 
     class Meta:
         model = Prediction
         fields = ['id', 'digit', 'confidence', 'source', 'created_at', 'probabilities']
 
+    def get_probabilities(self, obj):
+        return [
+            {'digit_class': i, 'probability': p}
+            for i, p in enumerate(obj.probability_list())
+        ]
+
 
 class TrainingRunSerializer(serializers.ModelSerializer):
     class Meta:
         model = TrainingRun
-        fields = ['id', 'model_type', 'epochs', 'batch_size', 'test_accuracy', 'test_loss', 'created_at']
+        fields = ['id', 'model_type', 'epochs', 'epochs_completed', 'batch_size', 'learning_rate', 'dropout',
+                  'test_accuracy', 'test_loss', 'duration_seconds', 'throughput', 'status', 'sweep_id',
+                  'created_at']
+
@@ -4,13 +4,27 @@ from . import views
 urlpatterns = [
     path('', views.api_root),
     path('health', views.health),
+    path('health/live', views.liveness),
+    path('health/ready', views.readiness),
     path('config', views.model_status),
     path('model/status', views.model_status),
+    path('model/versions', views.model_versions),
+    path('model/rollback', views.model_rollback),
     path('predict', views.predict_file),
     path('predict/base64', views.predict_base64),
+    path('predict/pixels', views.predict_pixels),
+    path('predict/strokes', views.predict_strokes),
+    path('predict/batch', views.predict_batch),
+    path('predict/stats', views.predict_stats),
     path('train', views.train),
+    path('train/progress', views.train_progress),
+    path('train/jobs', views.training_jobs),
+    path('train/jobs/<str:job_id>', views.training_job),
+    path('train/jobs/<str:job_id>/cancel', views.cancel_training_job),
+    path('train/jobs/<str:job_id>/events', views.training_job_events),
     path('samples', views.samples),
     path('evaluate', views.evaluate),
     path('predictions', views.prediction_list),
+    path('predictions/stats', views.prediction_stats),
     path('training-runs', views.training_run_list),
 ]
\ No newline at end of file
@@ -1,17 +1,25 @@
 """
 API views for MNIST Digit Recognition.
 """
-import base64
-import io
+import asyncio
+
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser, JSONParser
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from .models import Prediction, TrainingRun, PredictionProbability
+from .models import Prediction, TrainingRun
+from .persistence import get_writer, store_predictions
+
+# Training job SSE: comment line this often when idle; ASGI streams poll the job this often
+SSE_KEEPALIVE_SECONDS = 15
+SSE_POLL_SECONDS = 0.25
 
 
 def _get_predictor():
@@ -20,6 +28,16 @@ def _get_predictor():
     return get_predictor(model_path=settings.MODEL_PATH)
 
 
+def _result_payload(result, pred_id):
+    return {
+        'digit': result.digit,
+        'confidence': result.confidence,
+        'probabilities': result.probabilities,
+        'label': result.label,
+        'id': pred_id,
+    }
+
+
 @api_view(['GET'])
 def api_root(request):
     """API info and health."""
@@ -28,12 +46,17 @@ def api_root(request):
         'status': 'running',
         'version': '3.0.0',
         'endpoints': {
-            'predict': 'POST /api/predict | POST /api/predict/base64',
-            'train': 'POST /api/train',
+            'predict': 'POST /api/predict | POST /api/predict/base64 | POST /api/predict/pixels'
+                       ' | POST /api/predict/strokes | POST /api/predict/batch',
+            'predict_stats': 'GET /api/predict/stats',
+            'train': 'POST /api/train | GET /api/train/jobs/<id>[/events] | POST /api/train/jobs/<id>/cancel',
             'status': 'GET /api/model/status',
+            'versions': 'GET /api/model/versions | POST /api/model/rollback',
+            'health': 'GET /api/health | GET /api/health/live | GET /api/health/ready',
             'samples': 'GET /api/samples',
             'evaluate': 'GET /api/evaluate',
             'predictions': 'GET /api/predictions',
+            'prediction_stats': 'GET /api/predictions/stats',
             'training_runs': 'GET /api/training-runs',
         },
     })
@@ -41,18 +64,75 @@ def api_root(request):
 
 @api_view(['GET'])
 def health(request):
-    """Health check."""
+    """Health check. Answers from memory; a cold model is loaded in the background."""
+    predictor = _get_predictor()
+    writer = get_writer()
+    return Response({
+        'status': 'ok',
+        'model_loaded': predictor.load_in_background(),
+        'ready': predictor.is_ready(),
+        'write_behind': writer.stats() if writer is not None else {'enabled': False},
+    })
+
+
+@api_view(['GET'])
+def liveness(request):
+    """Liveness probe: the process is up and serving requests."""
+    return Response({'status': 'ok'})
+
+
+@api_view(['GET'])
+def readiness(request):
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 until then."""
     predictor = _get_predictor()
-    loaded = predictor.load()
-    return Response({'status': 'ok', 'model_loaded': loaded})
+    predictor.load_in_background()
+    state = predictor.status()
+    writer = get_writer()
+    return Response(
+        {
+            'status': 'ready' if state['ready'] else predictor.warmup_state,
+            **state,
+            'write_behind': writer.stats() if writer is not None else {'enabled': False},
+        },
+        status=status.HTTP_200_OK if state['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
 
 @api_view(['GET'])
 def model_status(request):
-    """Model loaded status."""
+    """Model loaded status, from memory."""
     predictor = _get_predictor()
-    loaded = predictor.load()
-    return Response({'loaded': loaded, 'path': settings.MODEL_PATH})
+    predictor.load_in_background()
+    state = predictor.status()
+    return Response({k: state[k] for k in ('loaded', 'ready', 'path', 'precision', 'version')})
+
+
+@api_view(['GET'])
+def model_versions(request):
+    """Published model versions, oldest first, and the one currently active."""
+    from model_registry import get_registry
+
+    registry = get_registry()
+    return Response({
+        'current': registry.current_id(),
+        'serving': _get_predictor().status()['version'],
+        'versions': [v.as_dict() for v in registry.versions()],
+    })
+
+
+@api_view(['POST'])
+def model_rollback(request: Request):
+    """Activate `version`, or the version published before the current one. Workers hot-swap."""
+    from model_registry import get_registry
+
+    registry = get_registry()
+    try:
+        version = registry.rollback(request.data.get('version'))
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    registry.mirror(version, settings.MODEL_PATH)
+    _get_predictor().refresh_from_registry(registry)
+    return Response({'current': version.id})
 
 
 @api_view(['POST'])
@@ -75,26 +155,8 @@ def predict_file(request: Request):
     except Exception as e:
         return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Store in DB
-    pred_obj = Prediction.objects.create(
-        digit=result.digit,
-        confidence=result.confidence,
-        source='file',
-    )
-    for i, p in enumerate(result.probabilities):
-        PredictionProbability.objects.create(
-            prediction=pred_obj,
-            digit_class=i,
-            probability=p,
-        )
-
-    return Response({
-        'digit': result.digit,
-        'confidence': result.confidence,
-        'probabilities': result.probabilities,
-        'label': result.label,
-        'id': pred_obj.id,
-    })
+    pred_id = store_predictions([(result, 'file')])[0]
+    return Response(_result_payload(result, pred_id))
 
 
 @api_view(['POST'])
@@ -113,140 +175,366 @@ def predict_base64(request: Request):
     except Exception as e:
         return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Store in DB
-    pred_obj = Prediction.objects.create(
-        digit=result.digit,
-        confidence=result.confidence,
-        source='canvas',
-    )
-    for i, p in enumerate(result.probabilities):
-        PredictionProbability.objects.create(
-            prediction=pred_obj,
-            digit_class=i,
-            probability=p,
+    pred_id = store_predictions([(result, 'canvas')])[0]
+    return Response(_result_payload(result, pred_id))
+
+
+@api_view(['POST'])
+def predict_pixels(request: Request):
+    """
+    Predict from raw 8-bit grayscale pixels (application/octet-stream, one byte
+    per pixel) sized by X-Image-Width / X-Image-Height headers. Stores result in DB.
+    Oversized images get 413 before the body is read.
+    """
+    from preprocessing import ImageTooLarge, from_raw_pixels, raw_pixels_length
+
+    try:
+        width = int(request.headers['X-Image-Width'])
+        height = int(request.headers['X-Image-Height'])
+        raw_pixels_length(width, height, request.META.get('CONTENT_LENGTH') or None)
+        pixels = from_raw_pixels(request.body, width, height)
+    except ImageTooLarge as e:
+        return Response({'detail': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except (KeyError, ValueError) as e:
+        return Response({'detail': f'Invalid pixel buffer: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    predictor = _get_predictor()
+    if not predictor.load():
+        return Response({'detail': 'Model not loaded. Train via POST /api/train'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    try:
+        result = predictor.predict(pixels)
+    except Exception as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    pred_id = store_predictions([(result, 'canvas')])[0]
+    return Response(_result_payload(result, pred_id))
+
+
+@api_view(['POST'])
+def predict_strokes(request: Request):
+    """
+    Predict from {"width", "height", "strokes": [[x0, y0, x1, y1, ...], ...], "line_width"?},
+    rasterized server-side like the canvas draws them. Stores result in DB.
+    """
+    from preprocessing import rasterize_strokes
+
+    strokes = request.data.get('strokes')
+    if not isinstance(strokes, list):
+        return Response({'detail': 'strokes must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+    predictor = _get_predictor()
+    if not predictor.load():
+        return Response({'detail': 'Model not loaded. Train via POST /api/train'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    try:
+        line_width = request.data.get('line_width')
+        canvas = rasterize_strokes(
+            strokes, int(request.data.get('width', 0)), int(request.data.get('height', 0)),
+            float(line_width) if line_width is not None else None,
+        )
+        result = predictor.predict(canvas)
+    except Exception as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    pred_id = store_predictions([(result, 'canvas')])[0]
+    return Response(_result_payload(result, pred_id))
+
+
+@api_view(['POST'])
+def predict_batch(request: Request):
+    """Predict many base64 images in one request. Stores successful results in DB."""
+    images = request.data.get('images')
+    if not isinstance(images, list) or not images:
+        return Response({'detail': 'images must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(images) > settings.PREDICT_BATCH_MAX_ITEMS:
+        return Response(
+            {'detail': f'At most {settings.PREDICT_BATCH_MAX_ITEMS} images per request'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
         )
 
+    predictor = _get_predictor()
+    if not predictor.load():
+        return Response({'detail': 'Model not loaded. Train via POST /api/train'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    results = predictor.predict_batch(images, return_exceptions=True)
+    ok = [i for i, r in enumerate(results) if not isinstance(r, Exception)]
+    ids = dict(zip(ok, store_predictions([(results[i], 'canvas') for i in ok])))
+    items = [
+        {'index': i, 'error': str(r)} if isinstance(r, Exception)
+        else {'index': i, **_result_payload(r, ids[i])}
+        for i, r in enumerate(results)
+    ]
+
     return Response({
-        'digit': result.digit,
-        'confidence': result.confidence,
-        'probabilities': result.probabilities,
-        'label': result.label,
-        'id': pred_obj.id,
+        'count': len(items),
+        'errors': sum(1 for it in items if 'error' in it),
+        'results': items,
     })
 
 
+@api_view(['GET'])
+def predict_stats(request):
+    """Micro-batching statistics (batch sizes, queue wait) and result-cache counters."""
+    predictor = _get_predictor()
+    return Response({**predictor.batching_stats(), 'result_cache': predictor.result_cache_stats()})
+
+
+_training_jobs = None
+
+
+def _record_training_run(job):
+    """Job finish hook: serve the new model in this worker and store the run in the DB."""
+    from training_jobs import refresh_served_model
+
+    refresh_served_model(job)
+    if job.status == 'done':
+        # Runs on a training worker thread: never reuse a stale connection, like the prediction writer
+        close_old_connections()
+        try:
+            # Same fields the sweep command stores; the result reflects a resumed run's own settings
+            run = {**job.params, **job.result}
+            TrainingRun.objects.create(
+                model_type=str(run['model_type']).lower(),
+                epochs=run['epochs'],
+                epochs_completed=run.get('epochs_completed'),
+                batch_size=run['batch_size'],
+                learning_rate=run.get('learning_rate', 1e-3),
+                dropout=run.get('dropout'),
+                test_accuracy=run['test_accuracy'],
+                test_loss=run['test_loss'],
+                duration_seconds=run.get('duration_seconds'),
+                throughput=run.get('throughput'),
+                status=run.get('status', 'completed'),
+            )
+        finally:
+            close_old_connections()
+
+
+def _get_training_jobs():
+    global _training_jobs
+    if _training_jobs is None:
+        from training_jobs import TrainingJobs
+        _training_jobs = TrainingJobs(on_finish=_record_training_run, model_path=settings.MODEL_PATH)
+    return _training_jobs
+
+
 @api_view(['POST'])
 def train(request: Request):
-    """Train a new model. Saves run to DB."""
-    model_type = request.data.get('model_type', 'advanced')
-    epochs = int(request.data.get('epochs', 15))
-    batch_size = int(request.data.get('batch_size', 128))
+    """Queue a training job (run saved to DB when it finishes). Returns 202 with the job."""
+    from training_jobs import TooManyJobs
+
+    params = {
+        'model_type': request.data.get('model_type', 'advanced'),
+        'epochs': int(request.data.get('epochs', 15)),
+        'batch_size': int(request.data.get('batch_size', 128)),
+    }
+    try:
+        for name in ('learning_rate', 'dropout'):
+            if request.data.get(name) is not None:
+                params[name] = float(request.data[name])
+    except (TypeError, ValueError):
+        return Response({'detail': 'learning_rate and dropout must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    run_id = request.data.get('run_id')
+    if run_id:
+        from checkpoints import valid_run_id
+
+        if not valid_run_id(run_id):
+            return Response({'detail': 'Invalid run_id'}, status=status.HTTP_400_BAD_REQUEST)
+        params['run_id'] = run_id
+    try:
+        job = _get_training_jobs().submit(params)
+    except TooManyJobs as e:
+        return Response({'detail': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS,
+                        headers={'Retry-After': '60'})
+    return Response(job.as_dict(), status=status.HTTP_202_ACCEPTED)
 
-    from model import load_mnist_data, build_cnn_model, build_simple_model, train_model
 
-    predictor = _get_predictor()
-    (x_train, y_train), (x_test, y_test) = load_mnist_data()
+@api_view(['GET'])
+def training_jobs(request):
+    jobs = _get_training_jobs()
+    return Response({**jobs.stats(), 'jobs': [job.as_dict() for job in jobs.list()]})
 
-    if model_type.lower() == 'simple':
-        model = build_simple_model()
-    else:
-        model = build_cnn_model()
 
-    history, test_loss, test_acc = train_model(
-        model, x_train, y_train, x_test, y_test,
-        epochs=epochs,
-        batch_size=batch_size,
-    )
+@api_view(['GET'])
+def train_progress(request):
+    """Progress of the most recent job, in the shape of the PHP bridge's training_progress.json."""
+    job = _get_training_jobs().latest()
+    return Response(job.progress if job is not None and job.progress else {'status': 'idle'})
 
-    model.save(settings.MODEL_PATH)
-    predictor.set_model(model)
 
-    # Store in DB
-    TrainingRun.objects.create(
-        model_type=model_type.lower(),
-        epochs=epochs,
-        batch_size=batch_size,
-        test_accuracy=float(test_acc),
-        test_loss=float(test_loss),
-    )
+@api_view(['GET'])
+def training_job(request, job_id):
+    job = _get_training_jobs().get(job_id)
+    if job is None:
+        return Response({'detail': 'Unknown training job'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job.as_dict())
 
-    return Response({
-        'message': 'Training complete',
-        'test_accuracy': float(test_acc),
-        'test_loss': float(test_loss),
-    })
+
+@api_view(['POST'])
+def cancel_training_job(request, job_id):
+    job = _get_training_jobs().cancel(job_id)
+    if job is None:
+        return Response({'detail': 'Unknown training job'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job.as_dict())
+
+
+def training_job_events(request, job_id):
+    """
+    Server-Sent Events: status, per-batch and per-epoch metrics, then one of
+    done/error/cancelled. Reconnecting with Last-Event-ID resumes after that event.
+
+    Under ASGI the stream is an async generator that polls the job without
+    holding a thread (a sync iterator would be buffered until the job ends).
+    Under WSGI each open stream holds a worker thread for the whole run.
+    """
+    from training_jobs import sse_format
+
+    job = _get_training_jobs().get(job_id)
+    if job is None:
+        return JsonResponse({'detail': 'Unknown training job'}, status=404)
+    last = int(request.headers.get('Last-Event-ID') or 0)
+
+    def stream():
+        seq = last
+        while True:
+            events = job.events_after(seq, timeout=SSE_KEEPALIVE_SECONDS)
+            for event in events:
+                seq = event['seq']
+                yield sse_format(event)
+            if job.finished and not job.events_after(seq):
+                return
+            if not events:
+                yield ': keep-alive\n\n'
+
+    async def astream():
+        seq, idle = last, 0.0
+        while True:
+            events = job.events_after(seq)
+            for event in events:
+                seq = event['seq']
+                yield sse_format(event)
+            if job.finished and not job.events_after(seq):
+                return
+            if events:
+                idle = 0.0
+                continue
+            if idle >= SSE_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ': keep-alive\n\n'
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+
+    body = astream() if isinstance(request, ASGIRequest) else stream()
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['GET'])
 def samples(request):
-    """Get MNIST samples as base64 for gallery."""
-    import numpy as np
-    from PIL import Image
-    from model import load_mnist_data
-
-    count = int(request.query_params.get('count', 10))
-    digit = request.query_params.get('digit')
-    if digit is not None:
-        digit = int(digit)
-
-    (x_train, y_train), _ = load_mnist_data()
-    y_labels = np.argmax(y_train, axis=1)
-
-    if digit is not None:
-        indices = np.where(y_labels == digit)[0]
-    else:
-        indices = np.arange(len(x_train))
-
-    indices = np.random.choice(indices, min(count, len(indices)), replace=False)
-    samples_list = []
-    for idx in indices:
-        img = (x_train[idx].squeeze() * 255).astype('uint8')
-        pil = Image.fromarray(img, mode='L')
-        buf = io.BytesIO()
-        pil.save(buf, format='PNG')
-        samples_list.append({
-            'image_base64': base64.b64encode(buf.getvalue()).decode(),
-            'label': int(y_labels[idx]),
-        })
-
-    return Response({'samples': samples_list})
+    """
+    Get MNIST samples as base64 for gallery.
+    Pass `seed` (and `page`) for a stable, cacheable listing.
+    """
+    from sample_store import get_sample_store
+
+    try:
+        count = int(request.query_params.get('count', 10))
+        page = int(request.query_params.get('page', 0))
+        digit = request.query_params.get('digit')
+        digit = int(digit) if digit is not None else None
+        seed = request.query_params.get('seed')
+        seed = int(seed) if seed is not None else None
+    except ValueError:
+        return Response({'detail': 'count, page, digit and seed must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if digit is not None and not 0 <= digit <= 9:
+        return Response({'detail': 'digit must be 0-9'}, status=status.HTTP_400_BAD_REQUEST)
+    if count < 1 or page < 0:
+        return Response({'detail': 'count must be >= 1 and page >= 0'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = get_sample_store().sample(count=count, digit=digit, seed=seed, page=page)
+    response = Response(result)
+    if seed is not None:
+        response['Cache-Control'] = 'public, max-age=86400'
+    return response
 
 
 @api_view(['GET'])
 def evaluate(request):
-    """Model evaluation metrics."""
-    from sklearn.metrics import confusion_matrix, classification_report
+    """
+    Model evaluation metrics, cached per model version.
+    Returns 202 with status "pending" while a new model is evaluated in the
+    background. Pass ?wait=true to block until ready.
+    """
+    from evaluation import get_evaluation_cache
 
     predictor = _get_predictor()
     if not predictor.load():
         return Response({'detail': 'Model not loaded'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-    from model import load_mnist_data
-    _, (x_test, y_test) = load_mnist_data()
-    model = predictor._model
-    y_pred = model.predict(x_test, verbose=0).argmax(axis=1)
-    y_true = y_test.argmax(axis=1)
-
-    return Response({
-        'accuracy': float((y_pred == y_true).mean()),
-        'confusion_matrix': confusion_matrix(y_true, y_pred).tolist(),
-        'classification_report': classification_report(y_true, y_pred, output_dict=True),
-    })
+    cache = get_evaluation_cache()
+    wait = request.query_params.get('wait', '').lower() in ('1', 'true', 'yes')
+    state, metrics = cache.evaluate(predictor) if wait else cache.get_or_schedule(predictor)
+    if state == 'error':
+        return Response({'detail': f"Evaluation failed: {metrics['error']}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    code = status.HTTP_202_ACCEPTED if state == 'pending' else status.HTTP_200_OK
+    return Response({'status': state, **metrics}, status=code)
 
 
 @api_view(['GET'])
 def prediction_list(request):
-    """List stored predictions from DB (paginated)."""
+    """
+    List stored predictions from DB, newest first, with cursor pagination.
+
+    Query params: limit (<= 500), cursor (from next_cursor), digit, source,
+    min_confidence, max_confidence, since, until (ISO 8601).
+    """
+    from .pagination import approximate_count, filter_predictions, keyset_page
     from .serializers import PredictionSerializer
 
-    predictions = Prediction.objects.all()[:100]
-    serializer = PredictionSerializer(predictions, many=True)
+    params = request.query_params
+    try:
+        limit = min(max(int(params.get('limit', 50)), 1), 500)
+        queryset = filter_predictions(Prediction.objects.all(), params)
+        rows, next_cursor = keyset_page(
+            queryset.defer('image_data'),
+            cursor=params.get('cursor'),
+            limit=limit,
+        )
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    # Only rows stored as PredictionProbability rows ('rows' mode, or written
+    # before packing) need the prefetch; fully packed pages skip the query
+    prefetch_related_objects([r for r in rows if not r.packed_probabilities], 'probabilities')
+
+    filtered = any(params.get(k) not in (None, '') for k in (
+        'digit', 'source', 'min_confidence', 'max_confidence', 'since', 'until',
+    ))
+    serializer = PredictionSerializer(rows, many=True)
     return Response({
-        'count': Prediction.objects.count(),
+        'count': approximate_count(queryset, filtered),
+        'count_is_estimate': True,
+        'next_cursor': next_cursor,
         'results': serializer.data,
     })
 
 
+@api_view(['GET'])
+def prediction_stats(request):
+    """Prediction volume, digit distribution and confidence histograms from hourly rollups."""
+    from .rollups import prediction_stats as rollup_stats
+
+    try:
+        hours = int(request.query_params.get('hours', 24))
+    except ValueError:
+        return Response({'detail': 'hours must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= hours <= 24 * 90:
+        return Response({'detail': 'hours must be between 1 and 2160'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(rollup_stats(hours=hours, source=request.query_params.get('source') or None))
+
+
 @api_view(['GET'])
 def training_run_list(request):
     """List stored training runs from DB."""
@@ -169,4 +169,33 @@ if _extra:
 MODEL_PATH = os.environ.get(
     'MODEL_PATH',
     str(BASE_DIR / 'mnist_cnn_model.keras')
-)
\ No newline at end of file
+)
+
+
+# ========================
+# Bulk prediction
+# ========================
+PREDICT_BATCH_MAX_ITEMS = int(os.environ.get('PREDICT_BATCH_MAX_ITEMS', '1000'))
+
+# Bulk requests carry hundreds of base64 images; Django's 2.5 MB default is too small
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('DATA_UPLOAD_MAX_MEMORY_SIZE', str(16 * 1024 * 1024)))
+
+
+# ========================
+# Prediction persistence
+# ========================
+# Probability storage: 'float32' / 'float16' pack the 10-class distribution into
+# Prediction.packed_probabilities; 'rows' keeps one PredictionProbability row per class
+PREDICTION_PROBABILITY_STORAGE = os.environ.get('PREDICTION_PROBABILITY_STORAGE', 'float32')
+if PREDICTION_PROBABILITY_STORAGE not in ('rows', 'float16', 'float32'):
+    raise ValueError("PREDICTION_PROBABILITY_STORAGE must be 'rows', 'float16' or 'float32'")
+
+# Hourly analytics rollups: update on every write, or set False and run
+# `manage.py rebuild_prediction_rollups` periodically instead
+PREDICTION_ROLLUPS_INCREMENTAL = os.environ.get('PREDICTION_ROLLUPS_INCREMENTAL', 'True') == 'True'
+
+# Write-behind: queue prediction rows and flush them in batches off the request path
+PREDICTION_WRITE_BEHIND = os.environ.get('PREDICTION_WRITE_BEHIND', 'False') == 'True'
+PREDICTION_FLUSH_SIZE = int(os.environ.get('PREDICTION_FLUSH_SIZE', '200'))
+PREDICTION_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_FLUSH_INTERVAL', '1.0'))
+PREDICTION_QUEUE_MAX = int(os.environ.get('PREDICTION_QUEUE_MAX', '10000'))
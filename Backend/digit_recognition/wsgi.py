@@ -8,3 +8,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'digit_recognition.settings')
 
 application = get_wsgi_application()
+
+# Load and warm up the model before the first request; /api/health/ready reports when ready
+from django.conf import settings  # noqa: E402
+from config import PREWARM_ON_STARTUP  # noqa: E402
+
+if PREWARM_ON_STARTUP:
+    from predictor import prewarm
+    prewarm(settings.MODEL_PATH)
@@ -0,0 +1,196 @@
+"""
+Model evaluation on the MNIST test set with result caching.
+Metrics are computed in chunks through a streaming confusion matrix and
+cached per served model version (registry id, else SHA-256 of the model
+file, plus the precision if quantized), in memory and on disk.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import EVAL_CACHE_DIR, EVAL_CHUNK_SIZE, NUM_CLASSES
+from predictor import DigitPredictor
+
+
+class ConfusionAccumulator:
+    """Streaming confusion matrix: rows are true labels, columns predictions."""
+
+    def __init__(self, num_classes: int = NUM_CLASSES):
+        self.num_classes = num_classes
+        self.matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray):
+        k = self.num_classes
+        idx = np.asarray(y_true, dtype=np.int64) * k + np.asarray(y_pred, dtype=np.int64)
+        self.matrix += np.bincount(idx, minlength=k * k).reshape(k, k)
+
+    def accuracy(self) -> float:
+        total = self.matrix.sum()
+        return float(np.trace(self.matrix) / total) if total else 0.0
+
+    def report(self) -> dict:
+        """Per-class metrics in the same shape as sklearn's classification_report(output_dict=True)."""
+        cm = self.matrix
+        tp = np.diag(cm).astype(np.float64)
+        support = cm.sum(axis=1)
+        predicted = cm.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, tp / predicted, 0.0)
+            recall = np.where(support > 0, tp / support, 0.0)
+            denom = precision + recall
+            f1 = np.where(denom > 0, 2 * precision * recall / denom, 0.0)
+
+        present = np.flatnonzero((support > 0) | (predicted > 0))
+        report = {
+            str(c): {
+                "precision": float(precision[c]),
+                "recall": float(recall[c]),
+                "f1-score": float(f1[c]),
+                "support": int(support[c]),
+            }
+            for c in present
+        }
+        total = int(support.sum())
+        report["accuracy"] = self.accuracy()
+        weights = support[present] / total if total else np.zeros(len(present))
+        for name, w in (("macro avg", None), ("weighted avg", weights)):
+            report[name] = {
+                "precision": float(np.average(precision[present], weights=w)) if len(present) else 0.0,
+                "recall": float(np.average(recall[present], weights=w)) if len(present) else 0.0,
+                "f1-score": float(np.average(f1[present], weights=w)) if len(present) else 0.0,
+                "support": total,
+            }
+        return report
+
+
+def evaluate_model(model, dataset=None, chunk_size: int = EVAL_CHUNK_SIZE) -> dict:
+    """Evaluate `model` on the test split chunk by chunk; returns the /evaluate payload."""
+    if dataset is None:
+        from dataset import get_dataset
+        dataset = get_dataset()
+
+    acc = ConfusionAccumulator()
+    for x, y_true in dataset.iter_batches("test", batch_size=chunk_size):
+        acc.update(y_true, np.argmax(model.predict(x, verbose=0), axis=1))
+
+    report = acc.report()
+    weighted = report["weighted avg"]
+    return {
+        "accuracy": acc.accuracy(),
+        "confusion_matrix": acc.matrix.tolist(),
+        "classification_report": report,
+        "precision": weighted["precision"],
+        "recall": weighted["recall"],
+        "f1_score": weighted["f1-score"],
+    }
+
+
+class EvaluationCache:
+    """Evaluation results keyed by model fingerprint; repeat lookups are free."""
+
+    def __init__(self, cache_dir: str = EVAL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory: Dict[str, dict] = {}
+        self._pending: Dict[str, threading.Thread] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}.json")
+
+    def get(self, fingerprint: str) -> Optional[dict]:
+        with self._lock:
+            if fingerprint in self._memory:
+                return self._memory[fingerprint]
+        try:
+            with open(self._path(fingerprint)) as f:
+                metrics = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._memory[fingerprint] = metrics
+        return metrics
+
+    def put(self, fingerprint: str, metrics: dict):
+        with self._lock:
+            self._memory[fingerprint] = metrics
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = self._path(fingerprint) + f".{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(metrics, f)
+            os.replace(tmp, self._path(fingerprint))
+        except OSError:
+            pass  # In-memory copy still serves this process
+
+    @staticmethod
+    def _snapshot(predictor: DigitPredictor):
+        """(model, cache key) for the model being served, taken in one read so a hot-swap can't mix them."""
+        model, version, precision = predictor.serving()
+        if version is None:
+            return model, None
+        return model, version if precision == "float32" else f"{version}-{precision}"
+
+    def evaluate(self, predictor: DigitPredictor) -> Tuple[str, Optional[dict]]:
+        """Synchronous: return cached metrics or compute and cache them now."""
+        model, fingerprint = self._snapshot(predictor)
+        metrics = self.get(fingerprint) if fingerprint else None
+        if metrics is None:
+            metrics = {**evaluate_model(model), "model_fingerprint": fingerprint}
+            if fingerprint:
+                self.put(fingerprint, metrics)
+        return "ready", metrics
+
+    def get_or_schedule(self, predictor: DigitPredictor) -> Tuple[str, Optional[dict]]:
+        """
+        Non-blocking: ("ready", metrics) if cached, else ("pending", None)
+        after starting one background evaluation for this model version.
+        ("error", {"error": ...}) if the last background run failed.
+        """
+        model, fingerprint = self._snapshot(predictor)
+        if fingerprint is None:
+            # Unsaved in-memory model: nothing to key the cache on
+            return self.evaluate(predictor)
+        metrics = self.get(fingerprint)
+        if metrics is not None:
+            return "ready", metrics
+
+        with self._lock:
+            if fingerprint in self._errors:
+                return "error", {"error": self._errors.pop(fingerprint), "model_fingerprint": fingerprint}
+            if fingerprint not in self._pending:
+                thread = threading.Thread(
+                    target=self._run, args=(fingerprint, model),
+                    name=f"evaluate-{fingerprint[:8]}", daemon=True,
+                )
+                self._pending[fingerprint] = thread
+                thread.start()
+        return "pending", {"model_fingerprint": fingerprint}
+
+    def _run(self, fingerprint: str, model):
+        try:
+            self.put(fingerprint, {**evaluate_model(model), "model_fingerprint": fingerprint})
+        except Exception as e:
+            with self._lock:
+                self._errors[fingerprint] = str(e)
+        finally:
+            with self._lock:
+                self._pending.pop(fingerprint, None)
+
+
+_cache: Optional[EvaluationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_evaluation_cache() -> EvaluationCache:
+    """Get or create the global evaluation cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EvaluationCache()
+    return _cache
@@ -0,0 +1,114 @@
+"""
+Bounded worker pool with admission control for blocking work (inference,
+image decoding) called from the FastAPI event loop.
+A fixed number of threads run jobs; at most `max_queue` more may wait.
+Submissions beyond that are rejected immediately instead of piling up.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from config import INFERENCE_QUEUE_SIZE, INFERENCE_QUEUE_TIMEOUT, INFERENCE_WORKERS
+
+
+class QueueFull(Exception):
+    """More work is waiting than the executor admits; retry later (HTTP 429)."""
+
+
+class QueueTimeout(Exception):
+    """Admitted work waited too long for a worker (HTTP 503)."""
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor that caps in-flight plus queued jobs."""
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_QUEUE_SIZE,
+                 queue_timeout: float = INFERENCE_QUEUE_TIMEOUT):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.workers = workers
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout = queue_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run `fn` on a worker and await its result. Raises QueueFull if the
+        queue is full and QueueTimeout if no worker picked it up in time.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"{self.workers + self.max_queue} requests already in flight")
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def job():
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+            try:
+                started.set()
+                if cancelled.is_set():
+                    return None
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                self._slots.release()
+
+        with self._lock:
+            self._pending += 1
+        future = asyncio.wrap_future(self._pool.submit(job))
+        if not self.queue_timeout:
+            return await future
+        try:
+            # Only the wait for a worker is bounded; work already running is awaited in full
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not started.is_set():
+                cancelled.set()
+                with self._lock:
+                    self.timed_out += 1
+                raise QueueTimeout(f"no inference worker free after {self.queue_timeout:g}s")
+        return await future
+
+    def queue_depth(self) -> int:
+        """Jobs admitted but not yet picked up by a worker."""
+        return self._pending
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._pending,
+                "running": self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor = None
+
+
+def get_executor() -> BoundedExecutor:
+    """Get or create the shared inference executor."""
+    global _executor
+    if _executor is None:
+        _executor = BoundedExecutor()
+    return _executor
@@ -0,0 +1,319 @@
+"""
+Lower a trained Keras model to a flat inference graph.
+Training-only layers (augmentation, dropout, noise) are dropped and
+BatchNormalization is folded into neighbouring Conv2D/Dense weights. The
+result is exported either as .npz for numpy_runtime (no TensorFlow needed) or
+rebuilt as a lean Keras model that DigitPredictor prefers over the full one.
+
+Usage: python inference_graph.py mnist_cnn_model.keras [out.npz | out.inference.keras]
+"""
+
+import json
+import logging
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from numpy_runtime import FORMAT_VERSION, GRAPH_KEY
+
+logger = logging.getLogger(__name__)
+
+ACTIVATIONS = {"linear", "relu", "softmax", "sigmoid", "tanh"}
+
+# Layers that are the identity at inference time
+TRAINING_ONLY_PREFIXES = ("Random", "Dropout", "SpatialDropout", "GaussianNoise",
+                          "GaussianDropout", "AlphaDropout", "ActivityRegularization")
+
+
+class Node(dict):
+    """One graph op: name, op, inputs, attrs (JSON-able) and params (arrays)."""
+
+    def __init__(self, name, op, inputs, attrs=None, params=None):
+        super().__init__(name=name, op=op, inputs=list(inputs), attrs=attrs or {}, params=params or {})
+
+
+def _is_training_only(layer) -> bool:
+    cls = type(layer).__name__
+    if cls.startswith(TRAINING_ONLY_PREFIXES):
+        return True
+    sublayers = getattr(layer, "layers", None)
+    if sublayers is not None and cls in ("Sequential", "Functional"):
+        return all(_is_training_only(l) for l in sublayers if type(l).__name__ != "InputLayer")
+    return False
+
+
+def _activation_name(layer) -> str:
+    name = getattr(layer.activation, "__name__", str(layer.activation))
+    if name not in ACTIVATIONS:
+        raise ValueError(f"{layer.name}: unsupported activation {name!r}")
+    return name
+
+
+def _lower_layer(layer, inputs: List[str]) -> Node:
+    cls = type(layer).__name__
+    cfg = layer.get_config()
+    name = layer.name
+    if cls == "Conv2D":
+        if tuple(cfg["dilation_rate"]) != (1, 1) or cfg.get("groups", 1) != 1:
+            raise ValueError(f"{name}: dilated/grouped convolutions are not supported")
+        if cfg.get("data_format", "channels_last") != "channels_last":
+            raise ValueError(f"{name}: only channels_last is supported")
+        kernel = np.asarray(layer.kernel.numpy(), dtype=np.float32)
+        bias = layer.bias.numpy() if layer.use_bias else np.zeros(kernel.shape[-1])
+        return Node(name, "conv2d", inputs,
+                    {"strides": list(cfg["strides"]), "padding": cfg["padding"],
+                     "activation": _activation_name(layer)},
+                    {"kernel": kernel, "bias": np.asarray(bias, dtype=np.float32)})
+    if cls == "Dense":
+        kernel = np.asarray(layer.kernel.numpy(), dtype=np.float32)
+        bias = layer.bias.numpy() if layer.use_bias else np.zeros(kernel.shape[-1])
+        return Node(name, "dense", inputs, {"activation": _activation_name(layer)},
+                    {"kernel": kernel, "bias": np.asarray(bias, dtype=np.float32)})
+    if cls == "BatchNormalization":
+        if cfg["axis"] not in (-1, 3, [-1], [3]):
+            raise ValueError(f"{name}: BatchNormalization must normalize the channel axis")
+        var = layer.moving_variance.numpy().astype(np.float64)
+        mean = layer.moving_mean.numpy().astype(np.float64)
+        gamma = layer.gamma.numpy() if layer.scale else np.ones_like(var)
+        beta = layer.beta.numpy() if layer.center else np.zeros_like(var)
+        scale = gamma / np.sqrt(var + cfg["epsilon"])
+        return Node(name, "affine", inputs, {},
+                    {"scale": scale.astype(np.float32), "shift": (beta - mean * scale).astype(np.float32)})
+    if cls == "Activation":
+        return Node(name, "activation", inputs, {"activation": _activation_name(layer)})
+    if cls == "ReLU" and not cfg.get("max_value") and not cfg.get("negative_slope") and not cfg.get("threshold"):
+        return Node(name, "activation", inputs, {"activation": "relu"})
+    if cls == "Softmax":
+        return Node(name, "activation", inputs, {"activation": "softmax"})
+    if cls in ("MaxPooling2D", "AveragePooling2D"):
+        return Node(name, "maxpool2d" if cls == "MaxPooling2D" else "avgpool2d", inputs,
+                    {"pool_size": list(cfg["pool_size"]),
+                     "strides": list(cfg["strides"] or cfg["pool_size"]),
+                     "padding": cfg["padding"]})
+    if cls == "GlobalAveragePooling2D" and not cfg.get("keepdims"):
+        return Node(name, "global_avgpool", inputs)
+    if cls == "GlobalMaxPooling2D" and not cfg.get("keepdims"):
+        return Node(name, "global_maxpool", inputs)
+    if cls == "Flatten":
+        return Node(name, "flatten", inputs)
+    if cls == "Add":
+        return Node(name, "add", inputs)
+    raise ValueError(f"{name}: layer type {cls} is not supported by the NumPy runtime")
+
+
+def lower(model) -> Dict:
+    """Trace a built Keras model into {"input", "output", "nodes"}, training-only layers removed."""
+    if len(model.inputs) != 1 or len(model.outputs) != 1:
+        raise ValueError("Only single-input, single-output models can be exported")
+    input_name = model.inputs[0]._keras_history.operation.name
+    output_name = model.outputs[0]._keras_history.operation.name
+    alias = {input_name: "input"}
+    nodes = [Node("input", "input", [], {"shape": list(model.inputs[0].shape[1:])})]
+
+    for layer in model.layers:
+        if type(layer).__name__ == "InputLayer":
+            continue
+        if len(layer._inbound_nodes) != 1:
+            raise ValueError(f"{layer.name}: shared layers are not supported")
+        inputs = [alias[t._keras_history.operation.name] for t in layer._inbound_nodes[0].input_tensors]
+        if _is_training_only(layer):
+            alias[layer.name] = inputs[0]
+            continue
+        node = _lower_layer(layer, inputs)
+        nodes.append(node)
+        alias[layer.name] = node["name"]
+
+    return {"input": "input", "output": alias[output_name], "nodes": nodes}
+
+
+def _consumers(graph) -> Dict[str, List[Dict]]:
+    users = {n["name"]: [] for n in graph["nodes"]}
+    for n in graph["nodes"]:
+        for i in n["inputs"]:
+            users[i].append(n)
+    return users
+
+
+def _remove(graph, node, replacement: str):
+    """Drop `node` and point its consumers (and the graph output) at `replacement`."""
+    graph["nodes"].remove(node)
+    for n in graph["nodes"]:
+        n["inputs"] = [replacement if i == node["name"] else i for i in n["inputs"]]
+    if graph["output"] == node["name"]:
+        graph["output"] = replacement
+
+
+def optimize(graph) -> Dict:
+    """
+    Fold BatchNorm (affine) nodes and fuse activations, in place.
+
+    affine after a linear conv/dense folds into that layer's kernel and bias;
+    otherwise, affine feeding only a dense layer folds into that layer's
+    inputs. A standalone activation after a linear conv/dense is fused into it.
+    """
+    by_name = {n["name"]: n for n in graph["nodes"]}
+
+    def sole_consumer(name):
+        users = _consumers(graph)[name]
+        if graph["output"] == name or len(users) != 1:
+            return None
+        return users[0]
+
+    changed = True
+    while changed:
+        changed = False
+        for node in list(graph["nodes"]):
+            if node["op"] != "affine":
+                continue
+            scale, shift = node["params"]["scale"], node["params"]["shift"]
+            prev = by_name[node["inputs"][0]]
+            if (prev["op"] in ("conv2d", "dense") and prev["attrs"]["activation"] == "linear"
+                    and sole_consumer(prev["name"]) is node):
+                prev["params"]["kernel"] = prev["params"]["kernel"] * scale
+                prev["params"]["bias"] = prev["params"]["bias"] * scale + shift
+                _remove(graph, node, prev["name"])
+                changed = True
+                continue
+            nxt = sole_consumer(node["name"])
+            if nxt is not None and nxt["op"] == "dense":
+                kernel = nxt["params"]["kernel"]
+                nxt["params"]["bias"] = nxt["params"]["bias"] + shift @ kernel
+                nxt["params"]["kernel"] = kernel * scale[:, None]
+                _remove(graph, node, node["inputs"][0])
+                changed = True
+
+        for node in list(graph["nodes"]):
+            if node["op"] != "activation":
+                continue
+            prev = by_name[node["inputs"][0]]
+            if (prev["op"] in ("conv2d", "dense") and prev["attrs"]["activation"] == "linear"
+                    and sole_consumer(prev["name"]) is node):
+                prev["attrs"]["activation"] = node["attrs"]["activation"]
+                _remove(graph, node, prev["name"])
+                changed = True
+
+    for node in graph["nodes"]:
+        for k, v in node["params"].items():
+            node["params"][k] = np.ascontiguousarray(v, dtype=np.float32)
+    return graph
+
+
+def save_graph(graph, path: str):
+    """Write a lowered graph to `path` (.npz): params as arrays plus a JSON manifest."""
+    manifest = {
+        "format": FORMAT_VERSION,
+        "input": graph["input"],
+        "output": graph["output"],
+        "nodes": [{k: n[k] for k in ("name", "op", "inputs", "attrs")} | {"params": sorted(n["params"])}
+                  for n in graph["nodes"]],
+    }
+    arrays = {f"{n['name']}/{k}": v for n in graph["nodes"] for k, v in n["params"].items()}
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **{GRAPH_KEY: np.array(json.dumps(manifest))}, **arrays)
+    os.replace(tmp, path)
+
+
+def export_npz(model, path: str) -> str:
+    """Lower, optimize and save a Keras model (or a path to one) for numpy_runtime."""
+    if isinstance(model, str):
+        import tensorflow.keras as keras
+        model = keras.models.load_model(model)
+    save_graph(optimize(lower(model)), path)
+    return path
+
+
+def to_keras(graph):
+    """Rebuild a lowered graph as a plain Keras model containing only inference ops."""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    tensors = {}
+    weights = []
+    for node in graph["nodes"]:
+        op, attrs, p, name = node["op"], node["attrs"], node["params"], node["name"]
+        args = [tensors[i] for i in node["inputs"]]
+        if op == "input":
+            tensors[name] = keras.Input(shape=tuple(attrs["shape"]), name=name)
+            continue
+        if op == "conv2d":
+            layer = layers.Conv2D(p["kernel"].shape[-1], p["kernel"].shape[:2], strides=attrs["strides"],
+                                  padding=attrs["padding"], activation=attrs["activation"], name=name)
+            weights.append((layer, [p["kernel"], p["bias"]]))
+        elif op == "dense":
+            layer = layers.Dense(p["kernel"].shape[-1], activation=attrs["activation"], name=name)
+            weights.append((layer, [p["kernel"], p["bias"]]))
+        elif op == "affine":
+            # Unfolded BatchNorm: identity statistics so it computes x * scale + shift
+            layer = layers.BatchNormalization(epsilon=1e-3, name=name)
+            n = len(p["scale"])
+            weights.append((layer, [p["scale"], p["shift"], np.zeros(n, np.float32),
+                                    np.full(n, 1 - 1e-3, np.float32)]))
+        elif op == "activation":
+            layer = layers.Activation(attrs["activation"], name=name)
+        elif op == "add":
+            layer = layers.Add(name=name)
+        elif op in ("maxpool2d", "avgpool2d"):
+            cls = layers.MaxPooling2D if op == "maxpool2d" else layers.AveragePooling2D
+            layer = cls(attrs["pool_size"], strides=attrs["strides"], padding=attrs["padding"], name=name)
+        elif op == "global_avgpool":
+            layer = layers.GlobalAveragePooling2D(name=name)
+        elif op == "global_maxpool":
+            layer = layers.GlobalMaxPooling2D(name=name)
+        elif op == "flatten":
+            layer = layers.Flatten(name=name)
+        else:
+            raise ValueError(f"Unknown op: {op}")
+        tensors[name] = layer(args if op == "add" else args[0])
+
+    model = keras.Model(tensors[graph["input"]], tensors[graph["output"]], name="inference")
+    for layer, w in weights:
+        layer.set_weights(w)
+    return model
+
+
+def inference_model_path(model_path: str) -> str:
+    """Where the inference-only copy of `model_path` is saved."""
+    return f"{os.path.splitext(model_path)[0]}.inference.keras"
+
+
+def export_inference_model(model, model_path: str):
+    """
+    Save an inference-only copy of `model` (already saved at `model_path`) next
+    to it and return it for serving. If the model can't be lowered, log and
+    return the original model so training never fails on export.
+    """
+    from predictor import write_artifact_meta
+
+    try:
+        inference = to_keras(optimize(lower(model)))
+    except ValueError as e:
+        logger.warning("Not exporting an inference model: %s", e)
+        return model
+    path = inference_model_path(model_path)
+    tmp = f"{os.path.splitext(path)[0]}.{os.getpid()}.tmp.keras"
+    inference.save(tmp)
+    os.replace(tmp, path)
+    write_artifact_meta(path, model_path, kind="inference")
+    return inference
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + ".npz"
+    if dst.endswith(".keras"):
+        import tensorflow.keras as keras
+        if dst != inference_model_path(src):
+            raise SystemExit(f"Inference models are saved as {inference_model_path(src)}")
+        export_inference_model(keras.models.load_model(src), src)
+    else:
+        export_npz(src, dst)
+    print(f"Exported {src} -> {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+tf.data input pipeline for training.
+Splits off the validation set explicitly (the same last 10% `validation_split`
+would take, as views rather than copies) and feeds model.fit from a cached,
+shuffled, batched dataset. Augmentation runs on whole batches in parallel
+map calls outside the model, and batches are prefetched with autotune.
+"""
+
+from typing import Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from config import TRAINING_SHUFFLE_BUFFER
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def split_validation(x: np.ndarray, y: np.ndarray, fraction: float = 0.1):
+    """((x_train, y_train), (x_val, y_val)); the last `fraction` is validation, like validation_split."""
+    if not 0 < fraction < 1:
+        raise ValueError("fraction must be between 0 and 1")
+    cut = int(len(x) * (1 - fraction))
+    return (x[:cut], y[:cut]), (x[cut:], y[cut:])
+
+
+def _to_float(x, y):
+    """uint8 pixels -> float32 in [0, 1] with a channel dim; float inputs pass through."""
+    if x.dtype == tf.uint8:
+        x = tf.cast(x, tf.float32) / 255.0
+    if x.shape.rank == 2:
+        x = x[..., tf.newaxis]
+    return x, y
+
+
+def train_dataset(x: np.ndarray, y: np.ndarray, batch_size: int = 128, augment: bool = True,
+                  shuffle_buffer: int = TRAINING_SHUFFLE_BUFFER, seed=None) -> tf.data.Dataset:
+    """Shuffled, batched (and optionally augmented) training batches, prefetched."""
+    ds = tf.data.Dataset.from_tensor_slices((x, y)).map(_to_float, num_parallel_calls=AUTOTUNE).cache()
+    ds = ds.shuffle(min(shuffle_buffer or len(x), len(x)), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size, num_parallel_calls=AUTOTUNE)
+    if augment:
+        from model import create_data_augmentation
+
+        augmentation = create_data_augmentation()
+        ds = ds.map(lambda xb, yb: (augmentation(xb, training=True), yb),
+                    num_parallel_calls=AUTOTUNE, deterministic=False)
+    return ds.prefetch(AUTOTUNE)
+
+
+def eval_dataset(x: np.ndarray, y: np.ndarray, batch_size: int = 1024) -> tf.data.Dataset:
+    """Batched, cached and prefetched validation/test batches in order."""
+    ds = tf.data.Dataset.from_tensor_slices((x, y)).map(_to_float, num_parallel_calls=AUTOTUNE)
+    return ds.batch(batch_size).cache().prefetch(AUTOTUNE)
+
+
+def fit_datasets(x_train, y_train, batch_size: int = 128, augment: bool = True,
+                 validation_fraction: float = 0.1) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
+    """(train, validation) datasets for model.fit in place of validation_split."""
+    (x_tr, y_tr), (x_val, y_val) = split_validation(x_train, y_train, validation_fraction)
+    return train_dataset(x_tr, y_tr, batch_size, augment), eval_dataset(x_val, y_val)
@@ -7,24 +7,16 @@ import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers
-from tensorflow.keras.datasets import mnist
 
 
 def load_mnist_data():
-    """Load and preprocess MNIST dataset."""
-    (x_train, y_train), (x_test, y_test) = mnist.load_data()
-    
-    # Normalize pixel values to [0, 1] and add channel dimension
-    x_train = x_train.astype("float32") / 255.0
-    x_test = x_test.astype("float32") / 255.0
-    x_train = np.expand_dims(x_train, -1)
-    x_test = np.expand_dims(x_test, -1)
-    
-    # One-hot encode labels
-    y_train = keras.utils.to_categorical(y_train, 10)
-    y_test = keras.utils.to_categorical(y_test, 10)
-    
-    return (x_train, y_train), (x_test, y_test)
+    """
+    Load and preprocess MNIST dataset.
+    Pixels are float32 in [0, 1] with a channel dim; labels are one-hot.
+    Backed by the uint8 cache in dataset.py, so raw MNIST is decoded once.
+    """
+    from dataset import get_dataset
+    return get_dataset().load_float()
 
 
 def create_data_augmentation():
@@ -36,6 +28,16 @@ def create_data_augmentation():
     ])
 
 
+def has_augmentation(model) -> bool:
+    """True if the model applies Random* augmentation layers itself (e.g. build_cnn_model())."""
+    for layer in model.layers:
+        if type(layer).__name__.startswith("Random"):
+            return True
+        if hasattr(layer, "layers") and has_augmentation(layer):
+            return True
+    return False
+
+
 def _residual_block(x, filters, strides=1):
     """Residual block with skip connection."""
     shortcut = x
@@ -52,16 +54,19 @@ def _residual_block(x, filters, strides=1):
     return x
 
 
-def build_cnn_model(input_shape=(28, 28, 1), num_classes=10):
+def build_cnn_model(input_shape=(28, 28, 1), num_classes=10, augment=True, dropout=0.5):
     """
     Advanced CNN with residual blocks, deeper architecture, and data augmentation.
     - Residual connections for gradient flow
     - 4 convolutional blocks with BatchNorm and Dropout
     - GlobalAveragePooling for parameter efficiency
     - Dense head with regularization
+    Pass augment=False when augmentation runs in the input pipeline instead.
+    `dropout` is the head's rate; the block rates scale with it (0.5 = defaults).
     """
+    scale = dropout / 0.5
     inputs = keras.Input(shape=input_shape)
-    x = create_data_augmentation()(inputs)
+    x = create_data_augmentation()(inputs) if augment else inputs
 
     # Initial conv
     x = layers.Conv2D(32, (3, 3), padding="same", use_bias=False)(x)
@@ -70,38 +75,38 @@ def build_cnn_model(input_shape=(28, 28, 1), num_classes=10):
     x = layers.Conv2D(32, (3, 3), strides=2, padding="same", use_bias=False)(x)
     x = layers.BatchNormalization()(x)
     x = layers.Activation("relu")(x)
-    x = layers.Dropout(0.2)(x)
+    x = layers.Dropout(0.2 * scale)(x)
 
     # Residual block 1 (32 filters)
     x = _residual_block(x, 32)
-    x = layers.Dropout(0.2)(x)
+    x = layers.Dropout(0.2 * scale)(x)
 
     # Downsample + residual block 2 (64 filters)
     x = _residual_block(x, 64, strides=2)
-    x = layers.Dropout(0.25)(x)
+    x = layers.Dropout(0.25 * scale)(x)
 
     # Residual block 3 (128 filters)
     x = _residual_block(x, 128, strides=2)
-    x = layers.Dropout(0.3)(x)
+    x = layers.Dropout(0.3 * scale)(x)
 
     # Residual block 4 (256 filters)
     x = _residual_block(x, 256)
     x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dropout(0.5)(x)
+    x = layers.Dropout(0.5 * scale)(x)
 
     # Dense head
     x = layers.Dense(512, activation="relu", kernel_regularizer=keras.regularizers.l2(1e-4))(x)
     x = layers.BatchNormalization()(x)
-    x = layers.Dropout(0.5)(x)
+    x = layers.Dropout(0.5 * scale)(x)
     x = layers.Dense(256, activation="relu", kernel_regularizer=keras.regularizers.l2(1e-4))(x)
-    x = layers.Dropout(0.4)(x)
+    x = layers.Dropout(0.4 * scale)(x)
     outputs = layers.Dense(num_classes, activation="softmax")(x)
 
     model = keras.Model(inputs=inputs, outputs=outputs)
     return model
 
 
-def build_simple_model(input_shape=(28, 28, 1), num_classes=10):
+def build_simple_model(input_shape=(28, 28, 1), num_classes=10, dropout=0.5):
     """Build a simpler/faster model for quick training."""
     model = keras.Sequential([
         layers.Input(shape=input_shape),
@@ -110,17 +115,27 @@ def build_simple_model(input_shape=(28, 28, 1), num_classes=10):
         layers.Conv2D(64, (3, 3), activation="relu"),
         layers.MaxPooling2D((2, 2)),
         layers.Flatten(),
-        layers.Dropout(0.5),
+        layers.Dropout(dropout),
         layers.Dense(num_classes, activation="softmax"),
     ])
     return model
 
 
 def train_model(model, x_train, y_train, x_test, y_test, 
-                epochs=15, batch_size=128, use_augmentation=True):
-    """Train the model with optional augmentation."""
+                epochs=15, batch_size=128, use_augmentation=True, callbacks=None,
+                pipeline=None, learning_rate=1e-3, checkpoint_dir=None):
+    """
+    Train the model with optional augmentation. Extra Keras `callbacks` run after the defaults.
+    pipeline="tfdata" feeds fit from input_pipeline.py; augmentation then runs there
+    unless the model already has its own augmentation layers.
+    With `checkpoint_dir`, training is checkpointed there (see checkpoints.py) and
+    resumes from the latest checkpoint found in it.
+    """
+    from config import TRAINING_PIPELINE
+
+    pipeline = pipeline or TRAINING_PIPELINE
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=1e-3),
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
         loss="categorical_crossentropy",
         metrics=["accuracy"],
     )
@@ -135,16 +150,34 @@ def train_model(model, x_train, y_train, x_test, y_test,
         monitor="val_accuracy", patience=5, restore_best_weights=True, verbose=1
     )
     
-    callbacks = [reduce_lr, early_stop]
-    
-    history = model.fit(
-        x_train, y_train,
-        batch_size=batch_size,
-        epochs=epochs,
-        validation_split=0.1,
-        callbacks=callbacks,
-        verbose=1,
-    )
+    defaults = [reduce_lr, early_stop]
+    initial_epoch = 0
+    if checkpoint_dir:
+        from checkpoints import checkpoint_callback
+
+        checkpoints = checkpoint_callback(checkpoint_dir, model, tracked=[reduce_lr, early_stop])
+        initial_epoch = checkpoints.restore()
+        defaults.append(checkpoints)
+    callbacks = [*defaults, *(callbacks or [])]
+    if pipeline == "tfdata":
+        from input_pipeline import fit_datasets
+
+        train_ds, val_ds = fit_datasets(
+            x_train, y_train, batch_size,
+            augment=use_augmentation and not has_augmentation(model),
+        )
+        history = model.fit(train_ds, epochs=epochs, initial_epoch=initial_epoch, validation_data=val_ds,
+                            callbacks=callbacks, verbose=1)
+    else:
+        history = model.fit(
+            x_train, y_train,
+            batch_size=batch_size,
+            epochs=epochs,
+            initial_epoch=initial_epoch,
+            validation_split=0.1,
+            callbacks=callbacks,
+            verbose=1,
+        )
     
     # Final evaluation
     test_loss, test_acc = model.evaluate(x_test, y_test, verbose=0)
@@ -0,0 +1,304 @@
+"""
+Versioned model registry with atomic publish, hot-swap and rollback.
+
+Layout under MODEL_REGISTRY_DIR:
+
+    versions/<id>/model.keras             trained model; <id> hashes its config and weights
+    versions/<id>/model.inference.keras   inference-only export (see inference_graph)
+    versions/<id>/model.<precision>.tflite  quantized exports, if any (see quantization)
+    versions/<id>/version.json            created_at and any publish metadata
+    CURRENT                               id of the version being served
+
+Publishing the same weights again reuses the existing version. A version
+directory is fully written under a temporary name and renamed into
+place, then CURRENT is replaced atomically, so readers never see a partial
+model. Each worker's RegistryWatcher polls CURRENT and swaps the new version
+into its predictor once it is loaded and warmed up.
+
+Usage: python model_registry.py [list | rollback [VERSION]]
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from config import MODEL_PATH, MODEL_REGISTRY_DIR, MODEL_WATCH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.keras"
+VERSION_ID_LENGTH = 16
+_VERSION_ID = re.compile(rf"^[0-9a-f]{{{VERSION_ID_LENGTH}}}$")
+
+
+@dataclass
+class ModelVersion:
+    id: str
+    path: str  # the version's model.keras
+    created_at: float
+    meta: dict
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "path": self.path, "created_at": self.created_at, **self.meta}
+
+
+def valid_version_id(version_id: str) -> bool:
+    return bool(_VERSION_ID.match(version_id or ""))
+
+
+def content_id(model) -> str:
+    """
+    Version id of a Keras model: a hash of its architecture config and weight
+    values. Unlike the .keras archive, which embeds a save timestamp, it is
+    the same every time the same model is saved.
+    """
+    h = hashlib.sha256(json.dumps(model.get_config(), sort_keys=True, default=str).encode())
+    for weight in model.get_weights():
+        weight = np.ascontiguousarray(weight)
+        h.update(f"{weight.dtype.str}{weight.shape}".encode())
+        h.update(weight.tobytes())
+    return h.hexdigest()[:VERSION_ID_LENGTH]
+
+
+def _write_atomic(path: str, data: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _copy_atomic(src: str, dst: str):
+    tmp = f"{os.path.splitext(dst)[0]}.{os.getpid()}.tmp{os.path.splitext(dst)[1]}"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ModelRegistry:
+    """Published model versions and the pointer to the one being served."""
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.pointer_path = os.path.join(root, "CURRENT")
+        self._lock = threading.Lock()
+
+    def _version_dir(self, version_id: str) -> str:
+        # Ids come from clients (rollback); never let one name a path outside versions/
+        if not valid_version_id(version_id):
+            raise ValueError(f"Invalid model version: {version_id!r}")
+        return os.path.join(self.versions_dir, version_id)
+
+    def get(self, version_id: str) -> Optional[ModelVersion]:
+        path = os.path.join(self._version_dir(version_id), MODEL_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(os.path.join(self._version_dir(version_id), "version.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        created_at = meta.pop("created_at", os.path.getmtime(path))
+        return ModelVersion(version_id, path, created_at, meta)
+
+    def versions(self) -> List[ModelVersion]:
+        """All published versions, oldest first."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        found = (self.get(name) for name in os.listdir(self.versions_dir) if valid_version_id(name))
+        return sorted((v for v in found if v is not None), key=lambda v: v.created_at)
+
+    def current_id(self) -> Optional[str]:
+        try:
+            with open(self.pointer_path) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def current(self) -> Optional[ModelVersion]:
+        version_id = self.current_id()
+        if version_id and not valid_version_id(version_id):
+            logger.error("Ignoring invalid model version %r in %s", version_id, self.pointer_path)
+            return None
+        return self.get(version_id) if version_id else None
+
+    def pointer_stamp(self) -> Optional[int]:
+        """mtime of CURRENT; changes whenever a version is published or rolled back."""
+        try:
+            return os.stat(self.pointer_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def publish(self, model, **meta) -> ModelVersion:
+        """
+        Save `model` (and its inference-only export) as a new version and make
+        it current. Weights that are already published just become current again.
+        """
+        version_id = content_id(model)
+        if self.get(version_id) is None:
+            self._write_version(model, version_id, meta)
+        self.activate(version_id)
+        return self.get(version_id)
+
+    def _write_version(self, model, version_id: str, meta: dict):
+        from inference_graph import export_inference_model
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        tmp_dir = os.path.join(self.versions_dir, f".tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(tmp_dir)
+        try:
+            model_file = os.path.join(tmp_dir, MODEL_FILE)
+            model.save(model_file)
+            export_inference_model(model, model_file)
+            _write_atomic(os.path.join(tmp_dir, "version.json"),
+                          json.dumps({"created_at": time.time(), **meta}, indent=2))
+            try:
+                os.rename(tmp_dir, self._version_dir(version_id))
+            except OSError:
+                # Another process published the same content meanwhile
+                if self.get(version_id) is None:
+                    raise
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def activate(self, version_id: str) -> ModelVersion:
+        """Point CURRENT at an already published version."""
+        version = self.get(version_id)
+        if version is None:
+            raise ValueError(f"Unknown model version: {version_id}")
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            _write_atomic(self.pointer_path, version_id + "\n")
+        logger.info("Model version %s is now current", version_id)
+        return version
+
+    def rollback(self, version_id: Optional[str] = None) -> ModelVersion:
+        """Make `version_id` current, or by default the version published before the current one."""
+        if version_id is not None:
+            return self.activate(version_id)
+        current = self.current()
+        older = [v for v in self.versions() if current is None or v.created_at < current.created_at]
+        if not older:
+            raise ValueError("No earlier model version to roll back to")
+        return self.activate(older[-1].id)
+
+    def find(self, model_path: str) -> Optional[ModelVersion]:
+        """The published version with the same content as the model file at `model_path`."""
+        from predictor import model_fingerprint
+
+        fingerprint = model_fingerprint(model_path)
+        if fingerprint is None:
+            return None
+        return next((v for v in reversed(self.versions()) if model_fingerprint(v.path) == fingerprint), None)
+
+    def add_artifact(self, version: ModelVersion, artifact_path: str, name: str) -> str:
+        """Copy a derived artifact (and its .json sidecar) into `version` as `name`."""
+        dst = os.path.join(os.path.dirname(version.path), name)
+        if os.path.abspath(dst) != os.path.abspath(artifact_path):
+            _copy_atomic(artifact_path + ".json", dst + ".json")
+            _copy_atomic(artifact_path, dst)
+        return dst
+
+    def mirror(self, version: ModelVersion, model_path: str = MODEL_PATH):
+        """
+        Atomically copy a version to `model_path` (and its inference and
+        quantized exports next to it) so tools that read MODEL_PATH directly
+        see the current model.
+        """
+        from inference_graph import inference_model_path
+        from quantization import QUANTIZED_PRECISIONS, quantized_path
+
+        artifacts = [(inference_model_path(version.path), inference_model_path(model_path))]
+        artifacts += [(quantized_path(version.path, p), quantized_path(model_path, p)) for p in QUANTIZED_PRECISIONS]
+        for src, dst in artifacts:
+            if os.path.exists(src):
+                _copy_atomic(src, dst)
+                _copy_atomic(src + ".json", dst + ".json")
+        _copy_atomic(version.path, model_path)
+
+
+class RegistryWatcher:
+    """Polls the registry pointer and hot-swaps the predictor when it changes."""
+
+    def __init__(self, registry: ModelRegistry, predictor, interval: float = MODEL_WATCH_INTERVAL):
+        self.registry = registry
+        self.predictor = predictor
+        self.interval = interval
+        self._stamp = registry.pointer_stamp()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stamp = self.registry.pointer_stamp()
+            if stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            try:
+                self.predictor.refresh_from_registry()
+            except Exception:
+                logger.exception("Failed to load model version %s", self.registry.current_id())
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 1)
+
+
+def publish_model(model, predictor=None, model_path: str = MODEL_PATH, **meta) -> ModelVersion:
+    """
+    Publish a trained model as the current version, mirror it to `model_path`
+    and, if given, swap it into `predictor` right away (other workers follow
+    through their watchers).
+    """
+    registry = get_registry()
+    version = registry.publish(model, **meta)
+    registry.mirror(version, model_path)
+    if predictor is not None:
+        predictor.refresh_from_registry(registry)
+    return version
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+def main():
+    registry = get_registry()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if cmd == "list":
+        current = registry.current_id()
+        for v in registry.versions():
+            marker = "*" if v.id == current else " "
+            print(f"{marker} {v.id}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(v.created_at))}")
+    elif cmd == "rollback":
+        version = registry.rollback(sys.argv[2] if len(sys.argv) > 2 else None)
+        registry.mirror(version)
+        print(f"Current model version: {version.id}")
+    else:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+NumPy-only inference runtime for graphs exported by inference_graph.py.
+Convolutions run as im2col + a single GEMM per layer, so serving a .npz model
+needs neither TensorFlow nor a GPU.
+"""
+
+import json
+from typing import Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+GRAPH_KEY = "__graph__"
+FORMAT_VERSION = 1
+
+
+def _same_padding(size: int, k: int, s: int):
+    """(before, after) padding matching TensorFlow's 'same'."""
+    out = -(-size // s)
+    total = max((out - 1) * s + k - size, 0)
+    return total // 2, total - total // 2
+
+
+def _pad(x: np.ndarray, kh: int, kw: int, sh: int, sw: int, padding: str, value=0.0) -> np.ndarray:
+    if padding != "same":
+        return x
+    ph, pw = _same_padding(x.shape[1], kh, sh), _same_padding(x.shape[2], kw, sw)
+    if ph == (0, 0) and pw == (0, 0):
+        return x
+    return np.pad(x, ((0, 0), ph, pw, (0, 0)), constant_values=value)
+
+
+def _windows(x: np.ndarray, kh: int, kw: int, sh: int, sw: int) -> np.ndarray:
+    """Strided (N, OH, OW, C, KH, KW) view of every kernel window."""
+    return sliding_window_view(x, (kh, kw), axis=(1, 2))[:, ::sh, ::sw]
+
+
+def conv2d(x: np.ndarray, kernel: np.ndarray, bias: np.ndarray,
+           strides=(1, 1), padding: str = "valid") -> np.ndarray:
+    """NHWC convolution with a (KH, KW, C, F) kernel via im2col + GEMM."""
+    kh, kw, c, f = kernel.shape
+    sh, sw = strides
+    x = _pad(x, kh, kw, sh, sw, padding)
+    if kh == kw == 1:
+        cols = x[:, ::sh, ::sw, :]
+        n, oh, ow = cols.shape[:3]
+        out = cols.reshape(-1, c) @ kernel.reshape(c, f)
+    else:
+        win = _windows(x, kh, kw, sh, sw)
+        n, oh, ow = win.shape[:3]
+        # Reorder to (KH, KW, C) to match the kernel layout; reshape makes the im2col copy
+        cols = win.transpose(0, 1, 2, 4, 5, 3).reshape(n * oh * ow, kh * kw * c)
+        out = cols @ kernel.reshape(kh * kw * c, f)
+    out += bias
+    return out.reshape(n, oh, ow, f)
+
+
+def pool2d(x: np.ndarray, pool_size, strides, padding: str, mode: str) -> np.ndarray:
+    kh, kw = pool_size
+    sh, sw = strides
+    if mode == "max":
+        win = _windows(_pad(x, kh, kw, sh, sw, padding, -np.inf), kh, kw, sh, sw)
+        return win.max(axis=(4, 5))
+    # Average pooling excludes padding from the mean, like Keras
+    ones = _pad(np.ones_like(x[:1, :, :, :1]), kh, kw, sh, sw, padding)
+    counts = _windows(ones, kh, kw, sh, sw).sum(axis=(4, 5))
+    return _windows(_pad(x, kh, kw, sh, sw, padding), kh, kw, sh, sw).sum(axis=(4, 5)) / counts
+
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def activate(x: np.ndarray, name: str) -> np.ndarray:
+    if name == "linear":
+        return x
+    if name == "relu":
+        return np.maximum(x, 0, out=x)
+    if name == "softmax":
+        return softmax(x)
+    if name == "sigmoid":
+        return 1.0 / (1.0 + np.exp(-x))
+    if name == "tanh":
+        return np.tanh(x, out=x)
+    raise ValueError(f"Unknown activation: {name}")
+
+
+class NumpyModel:
+    """
+    Executes an exported inference graph. Mirrors the subset of the Keras
+    model API the predictor uses: predict(x, verbose=0).
+    """
+
+    def __init__(self, manifest: dict, params: Dict[str, np.ndarray]):
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph format: {manifest.get('format')}")
+        self.nodes = manifest["nodes"]
+        self.output = manifest["output"]
+        self.params = {n["name"]: {k: params[f"{n['name']}/{k}"] for k in n["params"]} for n in self.nodes}
+        self.input_shape = tuple(self.nodes[0]["attrs"]["shape"])
+        # Index of the last node reading each value, so intermediates are freed early
+        self._last_use = {}
+        for i, n in enumerate(self.nodes):
+            for name in n["inputs"]:
+                self._last_use[name] = i
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyModel":
+        with np.load(path, allow_pickle=False) as data:
+            manifest = json.loads(str(data[GRAPH_KEY]))
+            params = {k: np.ascontiguousarray(data[k], dtype=np.float32) for k in data.files if k != GRAPH_KEY}
+        return cls(manifest, params)
+
+    def count_params(self) -> int:
+        return sum(p.size for node in self.params.values() for p in node.values())
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        values = {}
+        for i, node in enumerate(self.nodes):
+            op, attrs, p = node["op"], node["attrs"], self.params[node["name"]]
+            args = [values[name] for name in node["inputs"]]
+            if op == "input":
+                out = np.asarray(x, dtype=np.float32).reshape((-1,) + self.input_shape)
+            elif op == "conv2d":
+                out = activate(conv2d(args[0], p["kernel"], p["bias"], attrs["strides"], attrs["padding"]),
+                               attrs["activation"])
+            elif op == "dense":
+                out = activate(args[0] @ p["kernel"] + p["bias"], attrs["activation"])
+            elif op == "affine":
+                out = args[0] * p["scale"] + p["shift"]
+            elif op == "activation":
+                out = activate(args[0].copy(), attrs["activation"])
+            elif op == "add":
+                out = args[0] + args[1]
+                for extra in args[2:]:
+                    out += extra
+            elif op in ("maxpool2d", "avgpool2d"):
+                out = pool2d(args[0], attrs["pool_size"], attrs["strides"], attrs["padding"], op[:3])
+            elif op == "global_avgpool":
+                out = args[0].mean(axis=(1, 2))
+            elif op == "global_maxpool":
+                out = args[0].max(axis=(1, 2))
+            elif op == "flatten":
+                out = args[0].reshape(len(args[0]), -1)
+            else:
+                raise ValueError(f"Unknown op: {op}")
+            values[node["name"]] = out
+            for name in node["inputs"]:
+                if self._last_use[name] == i and name != self.output:
+                    del values[name]
+        return values[self.output]
+
+    def predict(self, x: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if batch_size is None or len(x) <= batch_size:
+            return self(x)
+        return np.concatenate([self(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+
+def load_model(path: str) -> NumpyModel:
+    return NumpyModel.load(path)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Thin client for bridge_server.py. Same stdin/stdout JSON contract as the
+per-command scripts, so PHP can switch by calling:
+    python bridge_client.py <predict|samples|evaluate|health|train> < request.json
+Falls back to running the command in-process only if the server is not
+running. If it is running but does not answer in time (BRIDGE_CLIENT_TIMEOUT,
+or the longer BRIDGE_EVALUATE_TIMEOUT / BRIDGE_TRAIN_TIMEOUT), the shim
+returns an error instead of repeating the work alongside the server."""
+import json
+import socket
+import sys
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from config import BRIDGE_CLIENT_TIMEOUT, BRIDGE_EVALUATE_TIMEOUT, BRIDGE_SOCKET, BRIDGE_TRAIN_TIMEOUT
+
+# These scripts never read stdin; don't block waiting for it
+NO_INPUT_COMMANDS = {"health", "evaluate"}
+# Commands that legitimately run longer than BRIDGE_CLIENT_TIMEOUT
+COMMAND_TIMEOUTS = {"evaluate": BRIDGE_EVALUATE_TIMEOUT, "train": BRIDGE_TRAIN_TIMEOUT}
+
+
+def request(cmd, data, socket_path=BRIDGE_SOCKET, timeout=BRIDGE_CLIENT_TIMEOUT):
+    """Send one command to the bridge server and return its response dict."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({"id": 1, "cmd": cmd, **data}) + "\n").encode())
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise RuntimeError("Bridge server closed the connection")
+    response = json.loads(line)
+    response.pop("id", None)
+    return response
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    data = {}
+    if cmd not in NO_INPUT_COMMANDS:
+        try:
+            data = json.load(sys.stdin)
+        except Exception as e:
+            print(json.dumps({"error": str(e)}))
+            return
+
+    timeout = COMMAND_TIMEOUTS.get(cmd, BRIDGE_CLIENT_TIMEOUT)
+    try:
+        result = request(cmd, data, timeout=timeout)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # Server not running: behave like the old one-process-per-request scripts
+        result = _run_in_process(cmd, data)
+    except TimeoutError:
+        # The server is still working on it; running it here too would only double the load
+        result = {"error": f"Bridge server did not answer {cmd} within {timeout:g}s"}
+    except Exception as e:
+        result = {"error": str(e)}
+    print(json.dumps(result))
+
+
+def _run_in_process(cmd, data):
+    from bridge_server import HANDLERS
+    handler = HANDLERS.get(cmd)
+    if handler is None:
+        return {"error": f"Unknown command: {cmd}"}
+    try:
+        return handler(data)
+    except Exception as e:
+        return {"error": str(e)}
+
+if __name__ == "__main__":
+    main()
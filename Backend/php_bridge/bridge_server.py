@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Persistent bridge server for PHP. Keeps the model and MNIST data warm.
+
+Speaks newline-delimited JSON over a Unix socket:
+    -> {"id": 1, "cmd": "predict", "image": "data:image/png;base64,..."}
+    <- {"id": 1, "digit": 3, "confidence": 0.99, ...}
+Commands: predict, samples, evaluate, health, train (payloads as the per-command
+scripts). Several requests may be in flight per connection; responses can
+arrive out of order, so match them on "id".
+
+Run: python php_bridge/bridge_server.py [--socket PATH] [--workers N] [--no-warm]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import evaluate_bridge
+import health_check
+import predict_bridge
+import samples_bridge
+import train_bridge
+from config import BRIDGE_MAX_LINE_BYTES, BRIDGE_SOCKET, BRIDGE_WORKERS
+
+HANDLERS = {
+    "predict": predict_bridge.handle,
+    "samples": samples_bridge.handle,
+    "evaluate": evaluate_bridge.handle,
+    "health": health_check.handle,
+    "train": train_bridge.handle,
+}
+
+
+class BridgeServer:
+    """Dispatches NDJSON requests to the bridge handlers on worker threads."""
+
+    def __init__(self, socket_path: str = BRIDGE_SOCKET, workers: int = BRIDGE_WORKERS):
+        self.socket_path = socket_path
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bridge")
+        # Training holds a worker for minutes; keep it off the request pool
+        self._train_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bridge-train")
+        self._server = None
+
+    def warm(self):
+        """Load the model, dataset and sample store before the first request."""
+        health_check.handle()
+        samples_bridge.handle({"count": 1})
+
+    async def dispatch(self, request: dict) -> dict:
+        """Run one request; always returns a response, even if the handler raises."""
+        req_id = request.pop("id", None)
+        cmd = request.pop("cmd", None)
+        handler = HANDLERS.get(cmd)
+        if handler is None:
+            return {"id": req_id, "error": f"Unknown command: {cmd}"}
+        pool = self._train_pool if cmd == "train" else self._pool
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, handler, request)
+            return {"id": req_id, **result}
+        except Exception as e:
+            return {"id": req_id, "error": f"{cmd} failed: {e}"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        in_flight = set()
+
+        async def respond(line: bytes):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {"id": None, "error": f"Invalid request: {e}"}
+            else:
+                try:
+                    response = await self.dispatch(request)
+                except Exception as e:
+                    response = {"id": request.get("id"), "error": str(e)}
+            async with write_lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Line longer than the stream limit; framing is lost
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(respond(line))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path, limit=BRIDGE_MAX_LINE_BYTES,
+        )
+        os.chmod(self.socket_path, 0o660)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._pool.shutdown(wait=False)
+        self._train_pool.shutdown(wait=False)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent PHP bridge server")
+    parser.add_argument("--socket", default=BRIDGE_SOCKET)
+    parser.add_argument("--workers", type=int, default=BRIDGE_WORKERS)
+    parser.add_argument("--no-warm", action="store_true", help="skip preloading model and data")
+    args = parser.parse_args()
+
+    server = BridgeServer(args.socket, args.workers)
+    if not args.no_warm:
+        server.warm()
+    print(f"Bridge server listening on {args.socket}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
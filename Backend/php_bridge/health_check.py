@@ -8,14 +8,19 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import MODEL_PATH
 
-def main():
+def handle(data=None):
+    """Model loaded status; returns the response dict."""
     try:
         from predictor import get_predictor
         pred = get_predictor(model_path=MODEL_PATH)
         loaded = pred.load()
-        print(json.dumps({"loaded": loaded, "path": MODEL_PATH}))
+        return {"loaded": loaded, "path": MODEL_PATH}
     except Exception as e:
-        print(json.dumps({"loaded": False, "path": MODEL_PATH, "error": str(e)}))
+        return {"loaded": False, "path": MODEL_PATH, "error": str(e)}
+
+
+def main():
+    print(json.dumps(handle()))
 
 if __name__ == "__main__":
     main()
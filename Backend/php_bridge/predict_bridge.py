@@ -6,31 +6,38 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def main():
+def handle(data):
+    """Predict from {"image": base64}; returns the response dict."""
     try:
-        data = json.load(sys.stdin)
         image_b64 = data.get("image", "")
         if not image_b64:
-            print(json.dumps({"error": "Missing image"}))
-            return
+            return {"error": "Missing image"}
 
         from predictor import get_predictor
         from config import MODEL_PATH
 
         pred = get_predictor(model_path=MODEL_PATH)
         if not pred.load():
-            print(json.dumps({"error": "Model not loaded"}))
-            return
+            return {"error": "Model not loaded"}
 
         result = pred.predict(image_b64)
-        print(json.dumps({
+        return {
             "digit": result.digit,
             "confidence": result.confidence,
             "probabilities": result.probabilities,
             "label": result.label,
-        }))
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def main():
+    try:
+        data = json.load(sys.stdin)
     except Exception as e:
         print(json.dumps({"error": str(e)}))
+        return
+    print(json.dumps(handle(data)))
 
 if __name__ == "__main__":
     main()
@@ -3,13 +3,39 @@ Prediction service for MNIST digit recognition.
 Orchestrates preprocessing, model loading, and inference.
 """
 
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 
-from config import MODEL_PATH, NUM_CLASSES
-from preprocessing import preprocess
+from config import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    BATCH_RESULT_TIMEOUT,
+    BATCHING_ENABLED,
+    COMPILED_PREDICT_MAX_BATCH,
+    MODEL_PATH,
+    MODEL_PRECISION,
+    MODEL_WATCH_INTERVAL,
+    NUM_CLASSES,
+    PREDICT_BATCH_CHUNK,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    WARMUP_BATCH_SIZES,
+)
+from preprocessing import preprocess, preprocess_batch
+from result_cache import array_key, payload_key
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -24,25 +50,190 @@ class PredictionResult:
 class DigitPredictor:
     """Unified prediction interface for the neural network system."""
 
-    def __init__(self, model_path: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, precision: Optional[str] = None,
+                 registry=None):
         self._model = None
         self._model_path = model_path or MODEL_PATH
+        self._precision = precision or MODEL_PRECISION
+        self._served_path = None
+        self._served_precision = "float32"
+        self._batcher = None
+        self._cache = None
+        self._compiled = None  # (model, tf.function or None): what _forward runs
+        self._served = (None, None, "float32")  # (model, version, precision), swapped as one
+        self._load_lock = threading.Lock()
+        self._warmup_state = "cold"
+        self._warmup_seconds = None
+        self._version = None
+        self._loaded_at = None
+        self._load_seconds = None
+        self._registry = registry
+        self._watcher = None
 
     def load(self) -> bool:
-        """Load model from disk. Returns True if loaded, False otherwise."""
-        import os
-        import tensorflow.keras as keras
-
+        """
+        Load model from disk and warm it up. Returns True if loaded, False otherwise.
+        Concurrent callers wait for a single load. With a registry attached, its
+        current version is loaded in preference to the model path.
+        """
         if self._model is not None:
             return True
-        if not os.path.exists(self._model_path):
+        with self._load_lock:
+            if self._model is not None:
+                return True
+            source = self._registry.current() if self._registry is not None else None
+            path = source.path if source is not None else self._model_path
+            if not os.path.exists(path):
+                self._warmup_state = "missing"
+                return False
+            self._warmup_state = "warming"
+            start = time.perf_counter()
+            try:
+                model, served_path, precision = self._read_model(path)
+                version = source.id if source is not None else model_fingerprint(served_path)
+                self._swap(model, served_path, precision, version, start)
+            except Exception:
+                self._warmup_state = "error"
+                raise
+        return True
+
+    def refresh_from_registry(self, registry=None) -> bool:
+        """
+        Load the registry's current version, if it isn't the one being served,
+        and swap it in once warmed up. Requests keep using the old model until
+        then. Returns True if the model was swapped.
+        """
+        registry = registry or self._registry
+        version = registry.current() if registry is not None else None
+        if version is None or version.id == self._version:
             return False
-        self._model = keras.models.load_model(self._model_path)
+        start = time.perf_counter()
+        model, served_path, precision = self._read_model(version.path)
+        with self._load_lock:
+            self._swap(model, served_path, precision, version.id, start)
         return True
 
+    def _read_model(self, path: str):
+        """(model, served path, precision) for the model file at `path`."""
+        if path.endswith(".npz"):
+            # Exported by inference_graph.py; served without importing TensorFlow
+            from numpy_runtime import load_model
+        elif path.endswith(".tflite"):
+            from quantization import TFLiteModel
+            load_model = TFLiteModel.load
+        else:
+            if self._precision != "float32":
+                from quantization import load_quantized
+                quantized = load_quantized(path, self._precision)
+                if quantized is not None:
+                    return quantized, quantized.path, self._precision
+            from tensorflow.keras.models import load_model
+            from inference_graph import inference_model_path
+
+            # Prefer the inference-only export (no augmentation/dropout, BN folded)
+            inference_path = inference_model_path(path)
+            if artifact_is_current(inference_path, path):
+                return load_model(inference_path), inference_path, "float32"
+
+        return load_model(path), path, self._precision if path.endswith(".tflite") else "float32"
+
+    def _warm_up(self, model, batch_sizes: List[int] = WARMUP_BATCH_SIZES):
+        """Compile `model`'s predict function and run it once per common batch size."""
+        start = time.perf_counter()
+        fn = _compile_predict(model)
+        if fn is not None:
+            for n in batch_sizes:
+                fn(np.zeros((n, 28, 28, 1), dtype=np.float32))
+        return fn, time.perf_counter() - start
+
+    def _swap(self, model, served_path: Optional[str], precision: str,
+              version: Optional[str], start: float):
+        """Warm `model` up off to the side, then make it the served model between batches."""
+        fn, self._warmup_seconds = self._warm_up(model)
+        # The swap point: _forward reads this once per batch, so in-flight batches finish on the old model
+        self._compiled = (model, fn)
+        self._served = (model, version, precision)
+        self._model = model
+        self._served_path = served_path
+        self._served_precision = precision
+        self._version = version
+        self._loaded_at = time.time()
+        self._load_seconds = time.perf_counter() - start
+        self._warmup_state = "ready"
+        if self._cache is not None:
+            self._cache.clear()
+
     def is_loaded(self) -> bool:
         return self._model is not None
 
+    @property
+    def warmup_state(self) -> str:
+        """cold (never loaded), missing (no model file), warming, ready or error."""
+        return self._warmup_state
+
+    def is_ready(self) -> bool:
+        """Loaded and warmed up: the next request won't pay for loading or tracing."""
+        return self._model is not None and self._warmup_state == "ready"
+
+    def warmup_status(self) -> dict:
+        return {"state": self._warmup_state, "seconds": self._warmup_seconds,
+                "compiled": self._compiled is not None and self._compiled[1] is not None}
+
+    def start_warmup(self) -> threading.Thread:
+        """Load and warm up in a background thread (e.g. at server startup)."""
+        def run():
+            try:
+                if not self.load():
+                    logger.info("No model at %s; skipping warm-up", self._model_path)
+            except Exception:
+                logger.exception("Model warm-up failed")
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def load_in_background(self) -> bool:
+        """
+        Start a background load if none has been attempted yet and return
+        is_loaded() right away, so health probes never block on (or retry) a load.
+        """
+        if self._model is None and self._warmup_state == "cold":
+            self._warmup_state = "warming"
+            self.start_warmup()
+        return self._model is not None
+
+    def status(self) -> dict:
+        """Model and readiness snapshot from in-memory state only (no disk access)."""
+        return {
+            "loaded": self._model is not None,
+            "ready": self.is_ready(),
+            "path": self.model_path,
+            "precision": self._served_precision,
+            "version": self._version,
+            "loaded_at": self._loaded_at,
+            "load_seconds": self._load_seconds,
+            "warmup": self.warmup_status(),
+            "queue_depth": self._batcher.queue_depth() if self._batcher is not None else 0,
+        }
+
+    @property
+    def model_path(self) -> str:
+        """File the current model was loaded from (a quantized artifact, if one is served)."""
+        return self._served_path or self._model_path
+
+    @property
+    def precision(self) -> str:
+        """Precision actually being served (float32 if no quantized artifact was usable)."""
+        return self._served_precision
+
+    @property
+    def model(self):
+        return self._model
+
+    def serving(self) -> Tuple[object, Optional[str], str]:
+        """(model, version, precision) being served, read in one step so they always match."""
+        return self._served
+
     def predict(self, image, return_probs: bool = True) -> PredictionResult:
         """
         Predict digit from image.
@@ -57,31 +248,259 @@ class DigitPredictor:
         if not self.is_loaded() and not self.load():
             raise RuntimeError("Model not loaded. Train or load a model first.")
 
+        cache = self._cache
+        if cache is None:
+            return self._to_result(self._infer(self._prepare(image)), return_probs)
+
+        generation = cache.generation
+        raw_key = payload_key(image)
+        probs = cache.get(raw_key, record_miss=False) if raw_key else None
+        if probs is None:
+            arr = self._prepare(image)
+            arr_key = array_key(arr)
+            probs = cache.get(arr_key)
+            if probs is None:
+                probs = self._infer(arr)
+            cache.put([raw_key, arr_key], probs, generation)
+        return self._to_result(probs, return_probs)
+
+    def _infer(self, arr: np.ndarray) -> np.ndarray:
+        """Probabilities for one prepared input, via the micro-batcher if enabled."""
+        if self._batcher is not None:
+            fut = self._batcher.submit(arr)
+            try:
+                return fut.result(timeout=BATCH_RESULT_TIMEOUT)
+            except FutureTimeoutError:
+                fut.cancel()
+                raise RuntimeError(f"Batched prediction timed out after {BATCH_RESULT_TIMEOUT:g}s")
+        return self._forward(np.expand_dims(arr, 0))[0]
+
+    def _prepare(self, image) -> np.ndarray:
+        """Preprocess a single image to a (28, 28, 1) float32 model input."""
         arr = preprocess(image)
-        # Add batch and channel dims
         if arr.ndim == 2:
-            arr = np.expand_dims(np.expand_dims(arr, -1), 0)
-        else:
-            arr = np.expand_dims(arr, 0)
+            arr = np.expand_dims(arr, -1)
+        return arr
 
-        probs = self._model.predict(arr, verbose=0)[0]
-        digit = int(np.argmax(probs))
-        confidence = float(probs[digit])
+    def _forward(self, batch: np.ndarray) -> np.ndarray:
+        """Run the current model on an (N, 28, 28, 1) batch."""
+        model, fn = self._compiled  # one read, so a concurrent swap can't mix models
+        if fn is not None and len(batch) <= COMPILED_PREDICT_MAX_BATCH:
+            return fn(batch).numpy()
+        return model.predict(batch, verbose=0)
 
+    @staticmethod
+    def _to_result(probs, return_probs: bool = True) -> PredictionResult:
+        digit = int(np.argmax(probs))
         return PredictionResult(
             digit=digit,
-            confidence=confidence,
+            confidence=float(probs[digit]),
             probabilities=[float(p) for p in probs] if return_probs else [],
             label=str(digit),
         )
 
-    def predict_batch(self, images: List) -> List[PredictionResult]:
-        """Predict for multiple images."""
-        return [self.predict(img) for img in images]
+    def predict_batch(self, images: List, return_probs: bool = True,
+                      chunk_size: int = PREDICT_BATCH_CHUNK,
+                      return_exceptions: bool = False) -> List[Union[PredictionResult, Exception]]:
+        """
+        Predict for multiple images with a single (chunked) forward pass.
+
+        Args:
+            images: list of anything predict() accepts
+            return_probs: include full probability distributions
+            chunk_size: max images per forward pass
+            return_exceptions: put the exception in place of a result for
+                items that fail preprocessing instead of raising
+
+        Returns:
+            One PredictionResult (or Exception) per input, in order
+        """
+        if not self.is_loaded() and not self.load():
+            raise RuntimeError("Model not loaded. Train or load a model first.")
+
+        cache = self._cache
+        generation = cache.generation if cache is not None else None
+        results: List[Union[PredictionResult, Exception]] = [None] * len(images)
+        raw_keys: List[Optional[str]] = [None] * len(images)
+        pending = list(range(len(images)))
+        if cache is not None:
+            raw_keys = [payload_key(image) for image in images]
+            pending = []
+            for i, key in enumerate(raw_keys):
+                probs = cache.get(key, record_miss=False) if key else None
+                if probs is None:
+                    pending.append(i)
+                else:
+                    results[i] = self._to_result(probs, return_probs)
+            if not pending:
+                return results
+
+        batch, errors = self._prepare_batch([images[i] for i in pending], return_exceptions)
+        ok = []
+        arr_keys = {}
+        for j, i in enumerate(pending):
+            if j in errors:
+                results[i] = errors[j]
+                continue
+            if cache is not None:
+                arr_keys[i] = array_key(batch[j])
+                probs = cache.get(arr_keys[i])
+                if probs is not None:
+                    cache.put([raw_keys[i]], probs, generation)
+                    results[i] = self._to_result(probs, return_probs)
+                    continue
+            ok.append(j)
+        if not ok:
+            return results
+
+        batch = batch[ok] if len(ok) < len(batch) else batch
+        chunk_size = max(1, chunk_size)
+        for start in range(0, len(batch), chunk_size):
+            probs = self._forward(batch[start : start + chunk_size])
+            for k, p in enumerate(probs):
+                i = pending[ok[start + k]]
+                if cache is not None:
+                    cache.put([raw_keys[i], arr_keys[i]], p, generation)
+                results[i] = self._to_result(p, return_probs)
+        return results
+
+    def _prepare_batch(self, images: List, return_exceptions: bool = False):
+        """Preprocess into one preallocated (N, 28, 28, 1) array; map failures by index."""
+        batch = np.zeros((len(images), 28, 28, 1), dtype=np.float32)
+        errors = {}
+        preprocess_batch(images, out=batch[..., 0], errors=errors if return_exceptions else None)
+        return batch, errors
 
     def set_model(self, model):
-        """Update the loaded model (e.g. after training)."""
-        self._model = model
+        """Update the loaded model (e.g. after training), warm it up and drop cached results."""
+        with self._load_lock:
+            self._swap(model, None, "float32", model_fingerprint(self._model_path), time.perf_counter())
+
+    def enable_result_cache(self, max_entries: int = RESULT_CACHE_SIZE,
+                            ttl: float = RESULT_CACHE_TTL):
+        """Serve repeat inputs (same payload or same normalized pixels) from memory."""
+        from result_cache import ResultCache
+
+        self._cache = ResultCache(max_entries=max_entries, ttl=ttl)
+
+    def disable_result_cache(self):
+        self._cache = None
+
+    def result_cache_stats(self) -> dict:
+        """Hit, miss and eviction counters for monitoring."""
+        if self._cache is None:
+            return {"enabled": False}
+        return self._cache.stats()
+
+    def enable_batching(self, max_batch_size: int = BATCH_MAX_SIZE,
+                        max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        """Route predict() through a shared micro-batcher."""
+        from batching import MicroBatcher
+
+        self.disable_batching()
+        self._batcher = MicroBatcher(
+            # Look up the model per batch so set_model() takes effect between batches
+            lambda batch: self._forward(batch),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+
+    def disable_batching(self):
+        """Stop the micro-batcher; predict() falls back to per-request passes."""
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
+
+    def enable_registry_watch(self, interval: float = MODEL_WATCH_INTERVAL):
+        """Hot-swap whenever the registry's current version changes."""
+        from model_registry import RegistryWatcher
+
+        self.disable_registry_watch()
+        if self._registry is not None:
+            self._watcher = RegistryWatcher(self._registry, self, interval)
+
+    def disable_registry_watch(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def batching_stats(self) -> dict:
+        """Batch-size and queue-wait statistics for monitoring."""
+        if self._batcher is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "max_batch_size": self._batcher.max_batch_size,
+            "max_wait_ms": self._batcher.max_wait * 1000.0,
+            "queue_depth": self._batcher.queue_depth(),
+            **self._batcher.stats.as_dict(),
+        }
+
+
+_fingerprints: Dict[str, Tuple[int, int, str]] = {}
+_fingerprint_lock = threading.Lock()
+
+
+def model_fingerprint(path: str) -> Optional[str]:
+    """
+    SHA-256 of a model file, or None if it does not exist.
+    Memoised on (size, mtime) so repeat calls only stat the file.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _fingerprint_lock:
+        cached = _fingerprints.get(path)
+        if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _fingerprint_lock:
+        _fingerprints[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+
+def write_artifact_meta(artifact_path: str, source_path: str, **extra) -> dict:
+    """Record which model file a derived artifact was built from (sidecar JSON)."""
+    meta = {"source": os.path.abspath(source_path),
+            "source_fingerprint": model_fingerprint(source_path), **extra}
+    with open(artifact_path + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def artifact_is_current(artifact_path: str, source_path: str) -> bool:
+    """True if the artifact exists and was built from the current `source_path`."""
+    if not os.path.exists(artifact_path):
+        return False
+    try:
+        with open(artifact_path + ".json") as f:
+            source = json.load(f).get("source_fingerprint")
+    except (OSError, ValueError):
+        return False
+    return source is not None and source == model_fingerprint(source_path)
+
+
+def _compile_predict(model):
+    """
+    A tf.function calling `model(x, training=False)` with a fixed
+    (None, 28, 28, 1) float32 signature, so it is traced once instead of
+    model.predict rebuilding its predict function. None for non-Keras models.
+    """
+    if "tensorflow" not in sys.modules:
+        return None
+    import tensorflow as tf
+
+    if not isinstance(model, tf.keras.Model):
+        return None
+    return tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec((None, 28, 28, 1), tf.float32)],
+    )
 
 
 # Singleton for API use
@@ -93,5 +512,23 @@ def get_predictor(model_path: Optional[str] = None) -> DigitPredictor:
     global _predictor
     path = model_path or MODEL_PATH
     if _predictor is None or (model_path and _predictor._model_path != model_path):
-        _predictor = DigitPredictor(model_path=path)
+        if _predictor is not None:
+            _predictor.disable_batching()
+            _predictor.disable_registry_watch()
+        registry = None
+        if not path.endswith((".npz", ".tflite")):
+            from model_registry import get_registry
+            registry = get_registry()
+        _predictor = DigitPredictor(model_path=path, registry=registry)
+        if registry is not None and MODEL_WATCH_INTERVAL > 0:
+            _predictor.enable_registry_watch()
+        if BATCHING_ENABLED:
+            _predictor.enable_batching()
+        if RESULT_CACHE_ENABLED:
+            _predictor.enable_result_cache()
     return _predictor
+
+
+def prewarm(model_path: Optional[str] = None) -> threading.Thread:
+    """Start loading and warming the global predictor in the background."""
+    return get_predictor(model_path).start_warmup()
@@ -5,10 +5,74 @@ Handles various input formats (PIL, numpy, base64) and normalizes for the neural
 
 import base64
 import io
-from typing import Union
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
 
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageDraw
+
+from config import PREDICT_RAW_MAX_PIXELS, PREPROCESS_BATCH_CHUNK, PREPROCESS_REDUCE_ABOVE
+
+# Max abs difference between preprocess_batch() and preprocess() per pixel.
+# The batch path reproduces Pillow's fixed-point LANCZOS arithmetic, so in
+# practice outputs are identical; this bounds float rounding in the weights.
+BATCH_TOLERANCE = 1 / 255
+
+_PRECISION_BITS = 22  # Pillow's 8-bit resampling precision (32 - 8 - 2)
+_REDUCING_GAP = 3.0  # Pillow's recommended reducing_gap for large downscales
+
+_scratch_buffers = threading.local()
+_SCRATCH_MAX_ELEMENTS = 4096 * 4096
+
+
+def _scratch(name: str, shape: tuple, dtype) -> np.ndarray:
+    """
+    Per-thread reusable buffer of `shape` (contents undefined). Valid until the
+    next request for the same name on this thread; very large shapes get a
+    fresh array so one outsized input doesn't pin memory in every thread.
+    """
+    size = int(np.prod(shape))
+    if size > _SCRATCH_MAX_ELEMENTS:
+        return np.empty(shape, dtype)
+    buf = getattr(_scratch_buffers, name, None)
+    if buf is None or buf.size < size:
+        buf = np.empty(size, dtype)
+        setattr(_scratch_buffers, name, buf)
+    return buf[:size].reshape(shape)
+
+
+def _decode(image: Union[np.ndarray, Image.Image, bytes, str]) -> Union[np.ndarray, Image.Image]:
+    """
+    Decode base64 strings and open encoded bytes (lazily, as a PIL image);
+    arrays and PIL images pass through. Large JPEGs are set to decode
+    straight to grayscale at a reduced scale (draft; other formats ignore it).
+    """
+    if isinstance(image, str):
+        if image.strip().startswith("data:"):
+            image = image.split(",", 1)[-1]
+        image = base64.b64decode(image)
+    if isinstance(image, bytes):
+        image = Image.open(io.BytesIO(image))
+        width, height = image.size
+        if max(width, height) > PREPROCESS_REDUCE_ABOVE:
+            scale = PREPROCESS_REDUCE_ABOVE / max(width, height)
+            image.draft("L", (max(1, int(width * scale)), max(1, int(height * scale))))
+    return image
+
+
+def _gray(image) -> np.ndarray:
+    """
+    2D grayscale array for any preprocess() input. 8-bit grayscale arrays and
+    mode "L" images are used without copying or converting to float.
+    """
+    image = _decode(image)
+    if isinstance(image, Image.Image):
+        return np.asarray(image if image.mode == "L" else image.convert("L"))
+    if isinstance(image, np.ndarray) and image.ndim == 2:
+        return image
+    return to_grayscale(image)
 
 
 def to_grayscale(img: Union[np.ndarray, Image.Image]) -> np.ndarray:
@@ -25,62 +89,143 @@ def to_grayscale(img: Union[np.ndarray, Image.Image]) -> np.ndarray:
     return arr.astype(np.float32)
 
 
+def _as_uint8(arr: np.ndarray) -> np.ndarray:
+    """0..255 uint8 view of a 2D grayscale array; [0, 1] images are scaled up."""
+    if arr.dtype == np.uint8:
+        return arr * np.uint8(255) if arr.max() <= 1 else arr
+    # Same float32 arithmetic as to_grayscale() then a cast, in scratch space
+    scaled = _scratch("float32", arr.shape, np.float32)
+    np.copyto(scaled, arr, casting="unsafe")
+    if scaled.max() <= 1.0:
+        scaled *= 255.0
+    out = _scratch("uint8", arr.shape, np.uint8)
+    np.copyto(out, scaled, casting="unsafe")
+    return out
+
+
 def _crop_and_center_to_28x28(arr: np.ndarray) -> np.ndarray:
     """
     Crop around the digit, center it, and resize to 28x28.
 
     This is critical when going from a large drawing canvas to MNIST format,
     so that the digit isn't tiny or off-center.
-    """
-    # Ensure we are working with 0..255 grayscale
-    if arr.max() <= 1.0:
-        arr_255 = (arr * 255.0).astype(np.uint8)
-    else:
-        arr_255 = arr.astype(np.uint8)
 
+    Works in uint8 and only copies the cropped digit: the background is
+    inverted on the crop, not the whole canvas, and the ink mask lives in a
+    scratch buffer. Inputs larger than PREPROCESS_REDUCE_ABOVE on a side are
+    box-reduced by PIL before the LANCZOS resize.
+    """
+    arr_255 = _as_uint8(arr)
     h, w = arr_255.shape
 
-    # Estimate background from image border and invert if background is light.
+    # Estimate background from image border; a light background means a dark digit.
     border_pixels = np.concatenate(
         [arr_255[0, :], arr_255[-1, :], arr_255[:, 0], arr_255[:, -1]]
     )
-    bg = float(np.median(border_pixels)) / 255.0
-    if bg > 0.5:
-        # Light background, dark digit -> invert so digit is bright on dark.
-        arr_255 = 255 - arr_255
-
-    # Normalize to [0, 1] for thresholding and later use
-    arr_norm = arr_255.astype(np.float32) / 255.0
+    invert = float(np.median(border_pixels)) / 255.0 > 0.5
 
-    # Find "ink" pixels (digit) by simple threshold
-    mask = arr_norm > 0.2
-    if not np.any(mask):
+    # "Ink" is brighter than 0.2 once the digit is bright on dark (255 - v > 51 <=> v < 204)
+    mask = _scratch("mask", (h, w), np.bool_)
+    if invert:
+        np.less(arr_255, 204, out=mask)
+    else:
+        np.greater(arr_255, 51, out=mask)
+    rows = mask.any(axis=1)
+    if not rows.any():
         # Nothing drawn; return a blank MNIST-style image
         return np.zeros((28, 28), dtype=np.float32)
+    cols = mask.any(axis=0)
 
     # Bounding box of the digit
-    rows = np.any(mask, axis=1)
-    cols = np.any(mask, axis=0)
-    rmin, rmax = np.where(rows)[0][[0, -1]]
-    cmin, cmax = np.where(cols)[0][[0, -1]]
-
-    cropped = arr_norm[rmin : rmax + 1, cmin : cmax + 1]
+    rmin, rmax = rows.argmax(), h - 1 - rows[::-1].argmax()
+    cmin, cmax = cols.argmax(), w - 1 - cols[::-1].argmax()
+    cropped = arr_255[rmin : rmax + 1, cmin : cmax + 1]
 
     # Pad to square to preserve aspect ratio when resizing
     ch, cw = cropped.shape
     size = max(ch, cw)
-    padded = np.zeros((size, size), dtype=np.float32)
+    padded = _scratch("padded", (size, size), np.uint8)
+    padded.fill(0)
     y_off = (size - ch) // 2
     x_off = (size - cw) // 2
-    padded[y_off : y_off + ch, x_off : x_off + cw] = cropped
+    target = padded[y_off : y_off + ch, x_off : x_off + cw]
+    if invert:
+        np.subtract(255, cropped, out=target)
+    else:
+        target[...] = cropped
 
     # Resize to 28x28 using PIL
-    pil = Image.fromarray((padded * 255.0).astype(np.uint8), mode="L")
-    pil = pil.resize((28, 28), Image.Resampling.LANCZOS)
-    out = np.array(pil).astype(np.float32) / 255.0
+    pil = Image.fromarray(padded).resize(
+        (28, 28), Image.Resampling.LANCZOS,
+        reducing_gap=_REDUCING_GAP if max(h, w) > PREPROCESS_REDUCE_ABOVE else None,
+    )
+    out = np.asarray(pil, dtype=np.float32)
+    out /= 255.0
     return out
 
 
+class ImageTooLarge(ValueError):
+    """More than PREDICT_RAW_MAX_PIXELS pixels (HTTP 413)."""
+
+
+def _check_size(width: int, height: int):
+    if width < 1 or height < 1:
+        raise ValueError("width and height must be positive")
+    if width * height > PREDICT_RAW_MAX_PIXELS:
+        raise ImageTooLarge(f"At most {PREDICT_RAW_MAX_PIXELS} pixels per image")
+
+
+def raw_pixels_length(width: int, height: int, content_length: Optional[str] = None) -> int:
+    """
+    Byte length of a width x height raw buffer, checked before the body is
+    read: raises ImageTooLarge if the image, or a declared Content-Length,
+    exceeds what is allowed.
+    """
+    _check_size(width, height)
+    expected = width * height
+    if content_length is not None and int(content_length) > expected:
+        raise ImageTooLarge(f"Body of {content_length} bytes exceeds {expected} for {width}x{height} pixels")
+    return expected
+
+
+def from_raw_pixels(data: Union[bytes, bytearray, memoryview], width: int, height: int) -> np.ndarray:
+    """
+    (height, width) uint8 array over a raw 8-bit grayscale buffer (row-major,
+    one byte per pixel), without copying. Pass it straight to preprocess().
+    """
+    _check_size(width, height)
+    if len(data) != width * height:
+        raise ValueError(f"Expected {width * height} bytes for {width}x{height} pixels, got {len(data)}")
+    return np.frombuffer(data, dtype=np.uint8).reshape(height, width)
+
+
+def rasterize_strokes(strokes: List[List[float]], width: int, height: int,
+                      line_width: Optional[float] = None) -> np.ndarray:
+    """
+    Draw strokes white on black into a (height, width) uint8 canvas, with
+    round caps and joins like the frontend canvas. Each stroke is a flat
+    [x0, y0, x1, y1, ...] list in canvas pixels; a single point is a dot.
+    `line_width` defaults to the canvas brush, max(14, width / 18).
+    """
+    _check_size(width, height)
+    if line_width is None:
+        line_width = max(14.0, width / 18)
+    if line_width <= 0:
+        raise ValueError("line_width must be positive")
+    canvas = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(canvas)
+    radius = line_width / 2
+    for stroke in strokes:
+        if not stroke or len(stroke) % 2:
+            raise ValueError("Each stroke must be a non-empty list of x, y pairs")
+        points = [(float(x), float(y)) for x, y in zip(stroke[0::2], stroke[1::2])]
+        if len(points) > 1:
+            draw.line(points, fill=255, width=max(1, round(line_width)), joint="curve")
+        for x, y in (points[0], points[-1]):
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=255)
+    return np.asarray(canvas)
+
+
 def preprocess(image: Union[np.ndarray, Image.Image, bytes, str]) -> np.ndarray:
     """
     Full preprocessing pipeline. Output: (28, 28) float32 in [0, 1], ready for model.
@@ -91,23 +236,177 @@ def preprocess(image: Union[np.ndarray, Image.Image, bytes, str]) -> np.ndarray:
     - raw bytes (PNG/JPEG)
     - base64 string (with or without data URL prefix)
     """
-    if isinstance(image, str):
-        if image.strip().startswith("data:"):
-            image = image.split(",", 1)[-1]
-        image = base64.b64decode(image)
-    if isinstance(image, bytes):
-        image = Image.open(io.BytesIO(image)).convert("L")
-        image = np.array(image)
-
-    gray = to_grayscale(image)
+    gray = _gray(image)
 
     # If this already looks like a MNIST-sized image, just normalize.
     if gray.shape == (28, 28):
         arr = gray.astype(np.float32)
         if arr.max() > 1.0:
-            arr = arr / 255.0
-        return arr.astype(np.float32)
+            arr /= 255.0
+        return arr
 
     # For larger inputs (e.g. canvas), crop, center, and resize to 28x28.
-    normalized = _crop_and_center_to_28x28(gray)
-    return normalized.astype(np.float32)
+    return _crop_and_center_to_28x28(gray)
+
+
+def _lanczos(x: np.ndarray) -> np.ndarray:
+    """Pillow's LANCZOS kernel: sinc(x) * sinc(x / 3) on [-3, 3)."""
+    def sinc(v):
+        v = v * np.pi
+        return np.divide(np.sin(v), v, out=np.ones_like(v), where=v != 0)
+    return np.where((x >= -3.0) & (x < 3.0), sinc(x) * sinc(x / 3), 0.0)
+
+
+@lru_cache(maxsize=1024)
+def _resize_weights(in_size: int, out_size: int = 28) -> np.ndarray:
+    """
+    (out_size, in_size) LANCZOS weights in Pillow's fixed point (scaled by
+    2**22, rounded away from zero), computed as its 8-bit resampler does.
+    """
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = 3.0 * filterscale
+    ss = 1.0 / filterscale
+    center = (np.arange(out_size) + 0.5) * scale
+    # Pillow truncates toward zero, then clamps to the image
+    xmin = np.maximum(np.trunc(center - support + 0.5), 0)[:, None]
+    xmax = np.minimum(np.trunc(center + support + 0.5), in_size)[:, None]
+    x = np.arange(in_size)[None, :]
+    k = np.where((x >= xmin) & (x < xmax), _lanczos(((x - center[:, None]) + 0.5) * ss), 0.0)
+    total = k.sum(axis=1, keepdims=True)
+    k = np.divide(k, total, out=k, where=total != 0) * (1 << _PRECISION_BITS)
+    return np.where(k < 0, np.trunc(k - 0.5), np.trunc(k + 0.5))
+
+
+def _fixed_point_round(acc: np.ndarray) -> np.ndarray:
+    """Pillow's clip8: round the fixed-point sums to 0..255."""
+    half = 1 << (_PRECISION_BITS - 1)
+    return np.clip(np.floor((acc + half) / (1 << _PRECISION_BITS)), 0, 255)
+
+
+def _crop_and_center_group(group: np.ndarray, out: np.ndarray):
+    """
+    Vectorized _crop_and_center_to_28x28 for a (G, H, W) stack of same-sized
+    grayscale images (uint8 or float), written into `out` (G, 28, 28).
+
+    Background inversion and bounding boxes are computed for the whole group.
+    The crop, square padding and LANCZOS resize of each image are expressed as
+    a pair of weight matrices (zero outside its crop) over the group's union
+    bounding box, so the group resizes with two batched matmuls.
+    """
+    n, h, w = group.shape
+    small = group.reshape(n, -1).max(axis=1) <= 1
+    if group.dtype == np.uint8:
+        arr_255 = group  # a fresh stack, safe to modify in place
+        arr_255[small] *= 255
+    else:
+        arr_255 = group.astype(np.uint8)
+        if small.any():
+            arr_255[small] = (group[small] * 255.0).astype(np.uint8)
+
+    border = np.concatenate([arr_255[:, 0, :], arr_255[:, -1, :], arr_255[:, :, 0], arr_255[:, :, -1]], axis=1)
+    invert = np.median(border, axis=1) / 255.0 > 0.5
+    if invert.any():
+        arr_255[invert] = 255 - arr_255[invert]
+
+    mask = arr_255 > 51  # arr_255 / 255 > 0.2 in float32
+    rows = mask.any(axis=2)
+    cols = mask.any(axis=1)
+    ink = rows.any(axis=1)
+    out[~ink] = 0.0
+    if not ink.any():
+        return
+    rmin = rows.argmax(axis=1)
+    rmax = h - 1 - rows[:, ::-1].argmax(axis=1)
+    cmin = cols.argmax(axis=1)
+    cmax = w - 1 - cols[:, ::-1].argmax(axis=1)
+    r0, r1 = rmin[ink].min(), rmax[ink].max() + 1
+    c0, c1 = cmin[ink].min(), cmax[ink].max() + 1
+
+    row_weights = np.zeros((n, 28, r1 - r0))
+    col_weights = np.zeros((n, c1 - c0, 28))
+    for i in np.flatnonzero(ink):
+        ch, cw = rmax[i] - rmin[i] + 1, cmax[i] - cmin[i] + 1
+        size = max(ch, cw)
+        k = _resize_weights(size)
+        y_off, x_off = (size - ch) // 2, (size - cw) // 2
+        row_weights[i, :, rmin[i] - r0:rmax[i] + 1 - r0] = k[:, y_off:y_off + ch]
+        col_weights[i, cmin[i] - c0:cmax[i] + 1 - c0, :] = k[:, x_off:x_off + cw].T
+
+    # The per-image path's uint8 -> /255 -> *255 -> uint8 round trip is lossless,
+    # so these are the pixels PIL resizes. Integer-valued float64 sums stay
+    # exact, which makes both passes match Pillow's int32 arithmetic.
+    pixels = arr_255[:, r0:r1, c0:c1].astype(np.float64)
+    horizontal = _fixed_point_round(pixels @ col_weights)
+    resized = _fixed_point_round(row_weights @ horizontal)
+    out[ink] = resized[ink].astype(np.float32) / 255.0
+
+
+def preprocess_batch(images: List, out: Optional[np.ndarray] = None,
+                     errors: Optional[Dict[int, Exception]] = None,
+                     chunk_size: int = PREPROCESS_BATCH_CHUNK) -> np.ndarray:
+    """
+    preprocess() for many images at once. Output: (N, 28, 28) float32.
+
+    Inputs may be of mixed types and sizes. They are decoded `chunk_size` at a
+    time, then grouped by shape; each group is inverted, cropped and resized
+    together (see _crop_and_center_group). Chunking bounds the decoded images
+    and float64 intermediates held at once, whatever the batch size. Images
+    larger than PREPROCESS_REDUCE_ABOVE go through the per-image path. Results
+    match preprocess() to within BATCH_TOLERANCE.
+
+    Args:
+        images: list of anything preprocess() accepts
+        out: preallocated (N, 28, 28) float32 array (or view) to write into
+        errors: if given, failures are recorded here by index (their output
+            row is left zero) instead of raised
+        chunk_size: inputs decoded and resized per step
+    """
+    if out is None:
+        out = np.zeros((len(images), 28, 28), dtype=np.float32)
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(images), chunk_size):
+        _preprocess_chunk(images[start:start + chunk_size], out, errors, start)
+    return out
+
+
+def _preprocess_chunk(images: List, out: np.ndarray, errors: Optional[Dict[int, Exception]], offset: int):
+    """preprocess_batch for one chunk, written to out[offset:offset + len(images)]."""
+    groups = defaultdict(list)
+    for i, image in enumerate(images, offset):
+        try:
+            gray = _gray(image)
+            if gray.dtype != np.uint8:
+                gray = gray.astype(np.float32, copy=False)  # preprocess() computes these in float32
+        except Exception as e:
+            if errors is None:
+                raise
+            errors[i] = e
+            out[i] = 0.0
+            continue
+        groups[gray.shape, gray.dtype == np.uint8].append((i, gray))
+
+    for (shape, _), members in groups.items():
+        index = [i for i, _ in members]
+        try:
+            if len(shape) != 2:
+                raise ValueError(f"Expected a 2D grayscale image, got shape {shape}")
+            if max(shape) > PREPROCESS_REDUCE_ABOVE:
+                # preprocess() box-reduces these before resizing; do the same one by one
+                for i, gray in members:
+                    out[i] = _crop_and_center_to_28x28(gray)
+                continue
+            stack = np.stack([gray for _, gray in members])
+            if shape == (28, 28):
+                scale = np.where(stack.reshape(len(stack), -1).max(axis=1) > 1, 255.0, 1.0)
+                out[index] = stack.astype(np.float32) / scale[:, None, None].astype(np.float32)
+            else:
+                resized = np.empty((len(members), 28, 28), dtype=np.float32)
+                _crop_and_center_group(stack, resized)
+                out[index] = resized
+        except Exception as e:
+            if errors is None:
+                raise
+            for i in index:
+                errors[i] = e
+                out[i] = 0.0
@@ -0,0 +1,202 @@
+"""
+Post-training quantization of the served model (opt-in via MODEL_PRECISION).
+Converts the Keras model to a TFLite artifact with float16 or int8 weights;
+int8 activations are calibrated on a sample of MNIST training images. The
+artifact records the fingerprint of the model it came from, so a stale one
+(the model was retrained since) is ignored instead of served.
+
+Usage: python quantization.py --precision int8 [--model mnist_cnn_model.keras]
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import warnings
+from typing import Optional
+
+import numpy as np
+
+from config import MODEL_PATH, QUANT_CALIBRATION_SIZE
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("float32", "float16", "int8")
+QUANTIZED_PRECISIONS = PRECISIONS[1:]
+
+
+def quantized_path(model_path: str, precision: str) -> str:
+    """Artifact path for `precision`, next to the float model."""
+    return f"{os.path.splitext(model_path)[0]}.{precision}.tflite"
+
+
+def calibration_images(dataset=None, size: int = QUANT_CALIBRATION_SIZE, seed: int = 0) -> np.ndarray:
+    """A fixed random sample of training images as float32 (N, 28, 28, 1) in [0, 1]."""
+    if dataset is None:
+        from dataset import get_dataset
+        dataset = get_dataset()
+    images = dataset.images("train")
+    idx = np.sort(np.random.default_rng(seed).choice(len(images), min(size, len(images)), replace=False))
+    x = images[idx].astype(np.float32)
+    x *= 1.0 / 255.0
+    return x[..., None]
+
+
+def convert(model, precision: str, calibration: Optional[np.ndarray] = None) -> bytes:
+    """Convert a Keras model to a TFLite flatbuffer at the given precision."""
+    import tensorflow as tf
+
+    if precision not in ("float16", "int8"):
+        raise ValueError(f"precision must be float16 or int8, got {precision!r}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if precision == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        if calibration is None:
+            raise ValueError("int8 quantization needs calibration images")
+        converter.representative_dataset = lambda: ([calibration[i : i + 1]] for i in range(len(calibration)))
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def _interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    TFLite interpreter behind the predict(x, verbose=0) interface the
+    predictor uses. Inputs and outputs stay float32; calls are serialized
+    because an interpreter is not thread-safe.
+    """
+
+    def __init__(self, model_content: bytes, path: Optional[str] = None, num_threads: Optional[int] = None):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # tf.lite.Interpreter deprecation notice
+            self._interpreter = _interpreter_class()(model_content=model_content, num_threads=num_threads)
+        self.path = path
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, num_threads: Optional[int] = None) -> "TFLiteModel":
+        with open(path, "rb") as f:
+            return cls(f.read(), path=path, num_threads=num_threads)
+
+    def predict(self, x: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        with self._lock:
+            if self._batch != len(x):
+                self._interpreter.resize_tensor_input(self._input, [len(x), *x.shape[1:]])
+                self._interpreter.allocate_tensors()
+                self._batch = len(x)
+            self._interpreter.set_tensor(self._input, x)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+def export_quantized(model_path: str = MODEL_PATH, precision: str = "int8",
+                     calibration_size: int = QUANT_CALIBRATION_SIZE,
+                     out_path: Optional[str] = None, dataset=None, registry=None) -> dict:
+    """
+    Write the quantized artifact (and its metadata) for the float model at
+    `model_path`. If that model is a published registry version (e.g. the
+    MODEL_PATH mirror), the artifact is also stored in the version directory,
+    which is where the predictor looks when serving from the registry.
+    """
+    from tensorflow import keras
+    from model_registry import get_registry
+    from predictor import write_artifact_meta
+
+    model = keras.models.load_model(model_path)
+    calibration = calibration_images(dataset, calibration_size) if precision == "int8" else None
+    content = convert(model, precision, calibration)
+    out_path = out_path or quantized_path(model_path, precision)
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, out_path)
+    meta = write_artifact_meta(
+        out_path, model_path, precision=precision,
+        calibration_size=len(calibration) if calibration is not None else 0,
+        size_bytes=len(content),
+    )
+    registry = registry or get_registry()
+    version = registry.find(model_path)
+    if version is not None:
+        name = os.path.basename(quantized_path(version.path, precision))
+        meta["version_path"] = registry.add_artifact(version, out_path, name)
+    return {**meta, "path": out_path}
+
+
+def load_quantized(model_path: str, precision: str) -> Optional[TFLiteModel]:
+    """The quantized artifact for `model_path`, or None if missing or built from another model."""
+    from predictor import artifact_is_current
+
+    path = quantized_path(model_path, precision)
+    if not os.path.exists(path):
+        logger.warning("MODEL_PRECISION=%s but %s does not exist; serving float32", precision, path)
+        return None
+    if not artifact_is_current(path, model_path):
+        logger.warning("%s was not built from the current %s; serving float32", path, model_path)
+        return None
+    return TFLiteModel.load(path)
+
+
+def _latency_ms(model, x: np.ndarray, repeat: int = 20) -> float:
+    model.predict(x, verbose=0)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        model.predict(x, verbose=0)
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples)) * 1000
+
+
+def compare(model_path: str, artifact_path: str, dataset=None) -> dict:
+    """Test-set accuracy and latency of the float model vs a quantized artifact."""
+    from tensorflow import keras
+    from evaluation import evaluate_model
+
+    models = {"float32": keras.models.load_model(model_path), "quantized": TFLiteModel.load(artifact_path)}
+    x = calibration_images(dataset, 32, seed=1)
+    report = {}
+    for name, model in models.items():
+        report[name] = {
+            "accuracy": evaluate_model(model, dataset)["accuracy"],
+            "latency_ms_batch1": _latency_ms(model, x[:1]),
+            "latency_ms_batch32": _latency_ms(model, x),
+        }
+    report["float32"]["size_bytes"] = os.path.getsize(model_path)
+    report["quantized"]["size_bytes"] = os.path.getsize(artifact_path)
+    report["accuracy_delta"] = report["quantized"]["accuracy"] - report["float32"]["accuracy"]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the served model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--precision", choices=["float16", "int8"], default="int8")
+    parser.add_argument("--calibration-size", type=int, default=QUANT_CALIBRATION_SIZE)
+    parser.add_argument("--no-eval", action="store_true", help="skip the accuracy/latency comparison")
+    args = parser.parse_args()
+
+    meta = export_quantized(args.model, args.precision, args.calibration_size)
+    print(f"Wrote {meta['path']} ({meta['size_bytes'] / 1e6:.2f} MB)")
+    if not args.no_eval:
+        print(json.dumps(compare(args.model, meta["path"]), indent=2))
+    print(f"Serve it with MODEL_PRECISION={args.precision}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Content-addressed cache of prediction outputs.
+Entries are looked up by a hash of the raw request payload and, failing that,
+by a hash of the normalized 28x28 input, so re-encodings of the same drawing
+also hit. Bounded LRU with a TTL; clear() bumps a generation so results
+computed against a replaced model are never stored.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def payload_key(image) -> Optional[str]:
+    """Key for a raw bytes/str payload; None for inputs without a stable encoding."""
+    if isinstance(image, str):
+        image = image.encode()
+    if not isinstance(image, (bytes, bytearray, memoryview)):
+        return None
+    return "raw:" + hashlib.blake2b(image, digest_size=16).hexdigest()
+
+
+def array_key(arr: np.ndarray) -> str:
+    """Key for a preprocessed model input."""
+    arr = np.ascontiguousarray(arr, dtype=np.float32)
+    return "arr:" + hashlib.blake2b(arr.tobytes(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU + TTL map from payload/array keys to probability vectors."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, *keys: Optional[str], record_miss: bool = True) -> Optional[np.ndarray]:
+        """
+        Probabilities for the first key present and unexpired, else None.
+        Pass record_miss=False for a first-level lookup that will be retried.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key is None:
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires, probs = entry
+                if expires <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return probs
+            if record_miss:
+                self.misses += 1
+            return None
+
+    def put(self, keys: Sequence[Optional[str]], probs: np.ndarray,
+            generation: Optional[int] = None):
+        """
+        Store probabilities under every non-None key.
+        Dropped if `generation` is given and clear() has run since it was read.
+        """
+        probs = np.array(probs, dtype=np.float32)
+        probs.setflags(write=False)
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            for key in keys:
+                if key is None:
+                    continue
+                self._entries[key] = (expires, probs)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (e.g. the model changed)."""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,129 @@
+"""
+Pre-encoded MNIST sample store for the gallery endpoints.
+Holds a per-digit index of training-image positions and every image already
+PNG-encoded as base64, so a gallery request is index picks plus lookups.
+"""
+
+import base64
+import io
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from dataset import MnistDataset, get_dataset
+
+_BLOB = "samples_png_b64.bin"
+_OFFSETS = "samples_png_b64_offsets.npy"
+
+
+@lru_cache(maxsize=64)
+def _permutation(seed: int, n: int) -> np.ndarray:
+    """Stable shuffle of a pool of size n; pages are slices of it."""
+    return np.random.default_rng(seed).permutation(n)
+
+
+def _encode_png_b64(img: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(np.asarray(img), mode="L").save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue())
+
+
+class SampleStore:
+    """
+    Gallery lookups over the training split.
+
+    The encoded images live next to the dataset cache as one concatenated
+    base64 blob plus an (N + 1,) offsets array, both memory-mapped.
+    """
+
+    def __init__(self, dataset: Optional[MnistDataset] = None):
+        self.dataset = dataset or get_dataset()
+        self.labels = np.asarray(self.dataset.labels("train"))
+        self.digit_index = {d: np.flatnonzero(self.labels == d) for d in range(10)}
+        self._blob, self._offsets = self._load_or_build()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dataset.cache_dir, name)
+
+    def _load_or_build(self):
+        if not (os.path.exists(self._path(_BLOB)) and os.path.exists(self._path(_OFFSETS))):
+            self._build()
+        offsets = np.load(self._path(_OFFSETS), mmap_mode="r")
+        if len(offsets) != len(self.labels) + 1:
+            # Dataset was rebuilt under us; re-encode
+            self._build()
+            offsets = np.load(self._path(_OFFSETS), mmap_mode="r")
+        blob = np.memmap(self._path(_BLOB), dtype=np.uint8, mode="r") if offsets[-1] else np.zeros(0, np.uint8)
+        return blob, offsets
+
+    def _build(self):
+        images = self.dataset.images("train")
+        offsets = np.zeros(len(images) + 1, dtype=np.int64)
+        tmp_blob = self._path(f"{_BLOB}.{os.getpid()}.tmp")
+        with open(tmp_blob, "wb") as f:
+            for i in range(len(images)):
+                encoded = _encode_png_b64(images[i])
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        tmp_offsets = self._path(f"offsets.{os.getpid()}.tmp.npy")
+        np.save(tmp_offsets, offsets)
+        os.replace(tmp_blob, self._path(_BLOB))
+        os.replace(tmp_offsets, self._path(_OFFSETS))
+
+    def image_base64(self, idx: int) -> str:
+        return self._blob[self._offsets[idx]:self._offsets[idx + 1]].tobytes().decode("ascii")
+
+    def sample(self, count: int = 10, digit: Optional[int] = None,
+               seed: Optional[int] = None, page: int = 0) -> dict:
+        """
+        Pick `count` samples, optionally of one digit.
+
+        Without a seed the picks are random per call. With a seed the pool is
+        shuffled deterministically and `page` selects consecutive slices, so
+        the same (seed, digit, count, page) always returns the same samples.
+        """
+        pool = self.digit_index[digit] if digit is not None else None
+        total = len(pool) if pool is not None else len(self.labels)
+        count = max(0, min(count, total))
+
+        if seed is None:
+            picks = np.random.default_rng().choice(total, count, replace=False)
+            has_more = True
+        else:
+            start = page * count
+            picks = _permutation(seed, total)[start : start + count]
+            has_more = start + count < total
+        positions = pool[picks] if pool is not None else picks
+
+        return {
+            "samples": [
+                {
+                    "image_base64": self.image_base64(int(idx)),
+                    "label": int(self.labels[idx]),
+                    "index": int(idx),
+                }
+                for idx in positions
+            ],
+            "seed": seed,
+            "page": page,
+            "total": total,
+            "has_more": has_more,
+        }
+
+
+_store: Optional[SampleStore] = None
+_store_lock = threading.Lock()
+
+
+def get_sample_store() -> SampleStore:
+    """Get or create the global sample store (built on first use)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SampleStore()
+    return _store
@@ -0,0 +1,160 @@
+"""
+Parallel hyperparameter sweep over the model.py architectures.
+
+Trials (grid or random search over model type, learning rate, batch size and
+dropout) run in a process pool. Each worker process runs one trial with its
+TensorFlow intra-/inter-op thread pools pinned so parallel trials share the
+cores instead of oversubscribing them. After each epoch a trial reports its
+validation accuracy to the other trials; from `prune_after` epochs on, a trial
+below the median of the others at the same epoch is stopped (status "pruned").
+
+Run via Django so each trial is stored as a TrainingRun:
+    python manage.py sweep --model simple,advanced --lr 1e-3,3e-4 --batch-size 64,128
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_SPACE = {
+    "model_type": ["simple", "advanced"],
+    "learning_rate": [1e-3, 3e-4],
+    "batch_size": [64, 128],
+    "dropout": [0.3, 0.5],
+}
+
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    """Every combination of the values in `space`."""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_search(space: Dict[str, list], trials: int, seed: Optional[int] = None) -> List[dict]:
+    """`trials` distinct random combinations (fewer if the grid is smaller)."""
+    combos = grid(space)
+    return random.Random(seed).sample(combos, min(trials, len(combos)))
+
+
+def threads_per_trial(workers: int, cpus: Optional[int] = None) -> int:
+    """Intra-op threads for each trial so that workers * threads ~= cores."""
+    return max(1, (cpus or os.cpu_count() or 1) // max(1, workers))
+
+
+def _pin_threads(intra: int, inter: int):
+    """Must run before TensorFlow executes anything in this process."""
+    os.environ["OMP_NUM_THREADS"] = str(intra)
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra)
+    tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+
+def should_prune(value: float, others: Iterable[float], min_reports: int = 2) -> bool:
+    """Median rule: prune if `value` is below the median of at least `min_reports` other trials."""
+    others = list(others)
+    return len(others) >= min_reports and value < statistics.median(others)
+
+
+def run_trial(trial_id: str, params: dict, epochs: int, samples: Optional[int],
+              intra_threads: int, inter_threads: int, reports, prune_after: int) -> dict:
+    """Train one configuration in this (fresh) worker process and return its record."""
+    started = time.perf_counter()
+    _pin_threads(intra_threads, inter_threads)
+    from tensorflow import keras
+    from config import TRAINING_PIPELINE
+    from model import build_cnn_model, build_simple_model, load_mnist_data, train_model
+
+    (x_train, y_train), (x_test, y_test) = load_mnist_data()
+    if samples:
+        x_train, y_train = x_train[:samples], y_train[:samples]
+
+    state = {"pruned": False, "epochs": 0, "fit_seconds": 0.0}
+
+    class Report(keras.callbacks.Callback):
+        def on_train_begin(self, logs=None):
+            self.t0 = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            state["epochs"] = epoch + 1
+            value = float((logs or {}).get("val_accuracy", 0.0))
+            prefix = f"{epoch + 1}/"
+            others = [v for k, v in reports.items() if k.startswith(prefix)]
+            reports[prefix + trial_id] = value
+            if epoch + 1 >= prune_after and should_prune(value, others):
+                state["pruned"] = True
+                self.model.stop_training = True
+
+        def on_train_end(self, logs=None):
+            state["fit_seconds"] = time.perf_counter() - self.t0
+
+    if params["model_type"] == "simple":
+        model = build_simple_model(dropout=params["dropout"])
+    else:
+        model = build_cnn_model(augment=TRAINING_PIPELINE != "tfdata", dropout=params["dropout"])
+    _, test_loss, test_acc = train_model(
+        model, x_train, y_train, x_test, y_test,
+        epochs=epochs,
+        batch_size=params["batch_size"],
+        use_augmentation=params["model_type"] != "simple",
+        learning_rate=params["learning_rate"],
+        callbacks=[Report()],
+    )
+
+    if state["pruned"]:
+        status = "pruned"
+    elif state["epochs"] < epochs:
+        status = "early_stopped"
+    else:
+        status = "completed"
+    trained = int(len(x_train) * 0.9) * state["epochs"]  # validation_split holds out 10%
+    return {
+        "trial_id": trial_id,
+        **params,
+        "epochs": epochs,
+        "epochs_completed": state["epochs"],
+        "status": status,
+        "test_accuracy": float(test_acc),
+        "test_loss": float(test_loss),
+        "duration_seconds": time.perf_counter() - started,
+        "throughput": trained / state["fit_seconds"] if state["fit_seconds"] else 0.0,
+    }
+
+
+def run_sweep(trials: List[dict], epochs: int = 5, workers: int = 2, samples: Optional[int] = None,
+              intra_threads: Optional[int] = None, inter_threads: int = 1, prune_after: int = 1,
+              on_result: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """
+    Run `trials` (dicts of model_type/learning_rate/batch_size/dropout) in a
+    process pool and return their records, best test accuracy first.
+    `on_result` is called in this process as each trial finishes.
+    """
+    intra = intra_threads or threads_per_trial(workers)
+    sweep_id = uuid.uuid4().hex[:12]
+    ctx = mp.get_context("spawn")
+    results = []
+    with ctx.Manager() as manager:
+        reports = manager.dict()
+        # One trial per process: TensorFlow's thread pools can only be sized before first use
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, max_tasks_per_child=1) as pool:
+            futures = {
+                pool.submit(run_trial, f"{sweep_id}-{i}", params, epochs, samples,
+                            intra, inter_threads, reports, prune_after): params
+                for i, params in enumerate(trials)
+            }
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {**futures[future], "epochs": epochs, "status": "failed", "error": str(e)}
+                record["sweep_id"] = sweep_id
+                results.append(record)
+                if on_result is not None:
+                    on_result(record)
+    return sorted(results, key=lambda r: r.get("test_accuracy", -1.0), reverse=True)
@@ -0,0 +1,116 @@
+"""
+Tests for the persistent PHP bridge server and client shim.
+"""
+import asyncio
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "php_bridge"))
+
+import pytest
+
+
+@pytest.fixture
+def bridge_socket(tmp_path, monkeypatch):
+    import bridge_server
+
+    monkeypatch.setitem(bridge_server.HANDLERS, "echo", lambda data: {"echo": data})
+    path = str(tmp_path / "bridge.sock")
+    server = bridge_server.BridgeServer(socket_path=path, workers=2)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield path
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+def test_bridge_server_handles_pipelined_requests(bridge_socket):
+    """Several in-flight requests on one connection get responses matched by id."""
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(10)
+        sock.connect(bridge_socket)
+        sock.sendall(
+            b'{"id": 1, "cmd": "echo", "x": 1}\n'
+            b'{"id": 2, "cmd": "nope"}\n'
+            b'not json\n'
+            b'{"id": 3, "cmd": "echo", "x": 3}\n'
+        )
+        with sock.makefile("rb") as f:
+            responses = [json.loads(f.readline()) for _ in range(4)]
+
+    by_id = {r["id"]: r for r in responses}
+    assert by_id[1] == {"id": 1, "echo": {"x": 1}}
+    assert by_id[3] == {"id": 3, "echo": {"x": 3}}
+    assert "Unknown command" in by_id[2]["error"]
+    assert "Invalid request" in by_id[None]["error"]
+
+
+def test_bridge_client_round_trip(bridge_socket):
+    from bridge_client import request
+
+    assert request("echo", {"image": "abc"}, socket_path=bridge_socket, timeout=10) == {"echo": {"image": "abc"}}
+
+
+def test_bridge_server_answers_when_handler_raises(bridge_socket, monkeypatch):
+    import bridge_server
+    from bridge_client import request
+
+    def boom(data):
+        raise RuntimeError("handler exploded")
+
+    monkeypatch.setitem(bridge_server.HANDLERS, "boom", boom)
+    response = request("boom", {}, socket_path=bridge_socket, timeout=10)
+    assert "handler exploded" in response["error"]
+
+
+def test_bridge_client_times_out_without_rerunning(tmp_path, monkeypatch, capsys):
+    """A server that accepts but never answers yields an error, not a second in-process run."""
+    import functools
+    import io
+    import json
+    import socket
+
+    import bridge_client
+    import bridge_server
+
+    calls = []
+    path = str(tmp_path / "silent.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent:
+        silent.bind(path)
+        silent.listen(1)
+        monkeypatch.setitem(bridge_server.HANDLERS, "echo", lambda data: calls.append(data) or {"echo": data})
+        monkeypatch.setattr(bridge_client, "request", functools.partial(bridge_client.request, socket_path=path))
+        monkeypatch.setattr(bridge_client, "BRIDGE_CLIENT_TIMEOUT", 0.2)
+        monkeypatch.setattr(sys, "argv", ["bridge_client.py", "echo"])
+        monkeypatch.setattr(sys, "stdin", io.StringIO('{"x": 1}'))
+        bridge_client.main()
+
+    assert "did not answer echo" in json.loads(capsys.readouterr().out)["error"]
+    assert calls == []
+
+
+def test_bridge_client_runs_in_process_without_server(tmp_path, monkeypatch, capsys):
+    import functools
+    import io
+    import json
+
+    import bridge_client
+    import bridge_server
+
+    monkeypatch.setitem(bridge_server.HANDLERS, "echo", lambda data: {"echo": data})
+    monkeypatch.setattr(bridge_client, "request",
+                        functools.partial(bridge_client.request, socket_path=str(tmp_path / "missing.sock")))
+    monkeypatch.setattr(sys, "argv", ["bridge_client.py", "echo"])
+    monkeypatch.setattr(sys, "stdin", io.StringIO('{"x": 1}'))
+    bridge_client.main()
+
+    assert json.loads(capsys.readouterr().out) == {"echo": {"x": 1}}
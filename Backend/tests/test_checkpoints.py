@@ -0,0 +1,58 @@
+"""
+Tests for checkpointed, resumable training on a few random images.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+
+def _data(n=64, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.random((n, 28, 28, 1), dtype=np.float32)
+    y = np.eye(10, dtype=np.float32)[rng.integers(0, 10, n)]
+    return x, y
+
+
+def _train(directory, epochs):
+    from tensorflow import keras
+    from model import build_simple_model, train_model
+
+    keras.utils.set_random_seed(0)
+    x, y = _data()
+    model = build_simple_model()
+    history, _, _ = train_model(model, x, y, x[:16], y[:16], epochs=epochs, batch_size=16,
+                                use_augmentation=False, pipeline="numpy", checkpoint_dir=directory)
+    return model, history
+
+
+def test_run_ids_are_path_safe(tmp_path):
+    from checkpoints import new_run_id, run_dir, valid_run_id
+
+    assert valid_run_id(new_run_id())
+    assert run_dir("abc-1", str(tmp_path)) == str(tmp_path / "abc-1")
+    for bad in ("", "../x", "a/b", "x" * 65):
+        assert not valid_run_id(bad)
+    with pytest.raises(ValueError):
+        run_dir("../x", str(tmp_path))
+
+
+def test_checkpoints_are_pruned_and_training_resumes(tmp_path):
+    pytest.importorskip("tensorflow")
+    directory = str(tmp_path / "run")
+
+    _train(directory, epochs=4)
+    sidecars = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    assert sidecars == ["ckpt-2.json", "ckpt-3.json", "ckpt-4.json"]  # TRAINING_CHECKPOINT_KEEP = 3
+    with open(os.path.join(directory, "ckpt-4.json")) as f:
+        saved = json.load(f)
+    assert saved["epoch"] == 4 and len(saved["callbacks"]) == 2
+
+    model, history = _train(directory, epochs=6)
+    assert history.epoch == [4, 5]
+    assert model.optimizer.iterations.numpy() == 6 * 4  # 57 training images -> 4 batches per epoch
+    assert "ckpt-6.json" in os.listdir(directory)
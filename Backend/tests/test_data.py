@@ -0,0 +1,212 @@
+"""
+Tests for dataset-backed services (MNIST cache).
+Uses a small synthetic MNIST stand-in so nothing is downloaded.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+
+def _fake_mnist(n_train=200, n_test=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        (rng.integers(0, 256, (n_train, 28, 28), dtype=np.uint8), np.arange(n_train, dtype=np.uint8) % 10),
+        (rng.integers(0, 256, (n_test, 28, 28), dtype=np.uint8), np.arange(n_test, dtype=np.uint8) % 10),
+    )
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    from dataset import MnistDataset
+
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return _fake_mnist()
+
+    ds = MnistDataset(cache_dir=str(tmp_path / "mnist"), loader=loader)
+    ds.loader_calls = calls
+    return ds
+
+
+def test_dataset_cache_builds_once_and_memory_maps(dataset, tmp_path):
+    """Raw data is converted once; later instances reuse the memory-mapped files."""
+    from dataset import MnistDataset
+
+    (x_train, y_train), _ = _fake_mnist()
+    images = dataset.images("train")
+    assert isinstance(images, np.memmap)
+    assert images.dtype == np.uint8 and images.shape == (200, 28, 28)
+    assert np.array_equal(images, x_train)
+    assert np.array_equal(dataset.labels("train"), y_train)
+
+    reopened = MnistDataset(cache_dir=dataset.cache_dir, loader=lambda: pytest.fail("rebuilt cache"))
+    assert np.array_equal(reopened.labels("test"), dataset.labels("test"))
+    assert len(dataset.loader_calls) == 1
+
+
+def test_dataset_float_views_match_legacy_format(dataset):
+    """load_float() reproduces the old load_mnist_data() arrays."""
+    (x_train, y_train), (x_test, y_test) = dataset.load_float()
+    (raw_train, raw_labels), _ = _fake_mnist()
+
+    assert x_train.shape == (200, 28, 28, 1) and x_train.dtype == np.float32
+    assert np.allclose(x_train[..., 0], raw_train.astype("float32") / 255.0)
+    assert y_train.shape == (200, 10)
+    assert np.array_equal(y_train.argmax(axis=1), raw_labels)
+    assert x_test.shape == (50, 28, 28, 1)
+
+    chunks = list(dataset.iter_batches("test", batch_size=16))
+    assert [len(y) for _, y in chunks] == [16, 16, 16, 2]
+    assert np.allclose(np.concatenate([x for x, _ in chunks]), x_test)
+
+
+def test_sample_store_per_digit_and_seeded_pages(dataset):
+    """Samples come from the right digit, decode to the source image, and seeded pages are stable."""
+    import base64
+    import io
+    from PIL import Image
+    from sample_store import SampleStore
+
+    store = SampleStore(dataset)
+    result = store.sample(count=5, digit=3)
+    assert len(result["samples"]) == 5
+    for s in result["samples"]:
+        assert s["label"] == 3
+        img = np.array(Image.open(io.BytesIO(base64.b64decode(s["image_base64"]))))
+        assert np.array_equal(img, dataset.images("train")[s["index"]])
+
+    page0 = store.sample(count=8, digit=7, seed=42, page=0)
+    page1 = store.sample(count=8, digit=7, seed=42, page=1)
+    assert page0 == store.sample(count=8, digit=7, seed=42, page=0)
+    idx0 = {s["index"] for s in page0["samples"]}
+    idx1 = {s["index"] for s in page1["samples"]}
+    assert not idx0 & idx1
+    assert page0["total"] == 20 and page0["has_more"]
+
+    # Reopening reuses the encoded store on disk
+    assert SampleStore(dataset).image_base64(0) == store.image_base64(0)
+
+
+def test_confusion_accumulator_matches_sklearn():
+    """Streaming metrics agree with sklearn's confusion matrix and report."""
+    sk = pytest.importorskip("sklearn.metrics")
+    from evaluation import ConfusionAccumulator
+
+    rng = np.random.default_rng(1)
+    y_true = rng.integers(0, 10, 1000)
+    y_pred = np.where(rng.random(1000) < 0.8, y_true, rng.integers(0, 9, 1000))
+
+    acc = ConfusionAccumulator()
+    for start in range(0, 1000, 128):
+        acc.update(y_true[start : start + 128], y_pred[start : start + 128])
+
+    assert np.array_equal(acc.matrix, sk.confusion_matrix(y_true, y_pred))
+    expected = sk.classification_report(y_true, y_pred, output_dict=True, zero_division=0)
+    report = acc.report()
+    assert report.keys() == expected.keys()
+    for key in ("3", "macro avg", "weighted avg"):
+        for metric in ("precision", "recall", "f1-score", "support"):
+            assert report[key][metric] == pytest.approx(expected[key][metric])
+    assert report["accuracy"] == pytest.approx(expected["accuracy"])
+
+
+def test_evaluation_cache_pending_then_ready(dataset, tmp_path):
+    """A new model version is scored once in the background and then served from cache."""
+    from evaluation import EvaluationCache
+    from predictor import DigitPredictor
+
+    class LabelModel:
+        calls = 0
+
+        def predict(self, x, verbose=0):
+            LabelModel.calls += 1
+            return np.tile(np.eye(10)[3], (len(x), 1))
+
+    import dataset as dataset_module
+    dataset_module._dataset = dataset  # evaluate_model() reads the global cache
+
+    model_file = tmp_path / "model.keras"
+    model_file.write_bytes(b"weights-v1")
+    predictor = DigitPredictor(model_path=str(model_file))
+    predictor.set_model(LabelModel())
+    cache = EvaluationCache(cache_dir=str(tmp_path / "evals"))
+
+    try:
+        state, _ = cache.get_or_schedule(predictor)
+        assert state == "pending"
+        for thread in list(cache._pending.values()):
+            thread.join(timeout=10)
+        state, metrics = cache.get_or_schedule(predictor)
+    finally:
+        dataset_module._dataset = None
+
+    assert state == "ready"
+    assert metrics["confusion_matrix"][3][3] == 5
+    calls = LabelModel.calls
+    assert EvaluationCache(cache_dir=str(tmp_path / "evals")).get_or_schedule(predictor) == (state, metrics)
+    assert LabelModel.calls == calls
+
+
+def test_evaluation_cache_keys_on_the_served_model(dataset, tmp_path):
+    """A hot-swap right after scheduling can't file the new model's metrics under the old version."""
+    from evaluation import EvaluationCache
+    from predictor import DigitPredictor
+
+    class LabelModel:
+        def __init__(self, label):
+            self.label = label
+
+        def predict(self, x, verbose=0):
+            return np.tile(np.eye(10)[self.label], (len(x), 1))
+
+    import dataset as dataset_module
+    dataset_module._dataset = dataset
+
+    model_file = tmp_path / "model.keras"
+    model_file.write_bytes(b"weights-v1")
+    predictor = DigitPredictor(model_path=str(model_file))
+    predictor.set_model(LabelModel(3))
+    first_version = predictor.status()["version"]
+    cache = EvaluationCache(cache_dir=str(tmp_path / "evals"))
+    try:
+        state, pending = cache.get_or_schedule(predictor)
+        model_file.write_bytes(b"weights-v2")
+        predictor.set_model(LabelModel(7))  # swapped while the first evaluation runs
+        for thread in list(cache._pending.values()):
+            thread.join(timeout=10)
+    finally:
+        dataset_module._dataset = None
+
+    assert state == "pending" and pending["model_fingerprint"] == first_version
+    metrics = cache.get(first_version)
+    assert metrics["confusion_matrix"][3][3] == 5 and metrics["confusion_matrix"][7][7] == 0
+
+
+def test_input_pipeline_split_and_batches(dataset):
+    """Explicit split matches validation_split; batches come out float, augmented and complete."""
+    pytest.importorskip("tensorflow")
+    from input_pipeline import fit_datasets, split_validation, train_dataset
+
+    x, y = dataset.float_images("train"), dataset.one_hot_labels("train")
+    (x_tr, y_tr), (x_val, y_val) = split_validation(x, y, 0.1)
+    assert len(x_tr) == 180 and len(x_val) == 20
+    assert np.shares_memory(x_val, x)
+    np.testing.assert_array_equal(x_val, x[180:])
+
+    train_ds, val_ds = fit_datasets(x, y, batch_size=32)
+    seen = 0
+    for xb, yb in train_ds:
+        assert xb.dtype.name == "float32" and xb.shape[1:] == (28, 28, 1)
+        seen += len(yb)
+    assert seen == 180
+    val = np.concatenate([xb.numpy() for xb, _ in val_ds])
+    np.testing.assert_allclose(val, x[180:])
+
+    xb, _ = next(iter(train_dataset(dataset.images("train"), y, batch_size=8, augment=False)))
+    assert xb.dtype.name == "float32" and float(xb.numpy().max()) <= 1.0
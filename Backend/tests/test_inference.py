@@ -0,0 +1,274 @@
+"""
+Tests for the inference serving path (batching, predictor plumbing).
+Uses a tiny stand-in model so no MNIST download or training is needed.
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+
+class _MeanModel:
+    """Deterministic fake model: class scores from mean intensity."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, x, verbose=0):
+        self.calls.append(len(x))
+        means = x.reshape(len(x), -1).mean(axis=1)
+        logits = -np.abs(np.arange(10)[None, :] - means[:, None] * 9)
+        e = np.exp(logits)
+        return (e / e.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _digit_image(level: float) -> np.ndarray:
+    return np.full((28, 28), level, dtype=np.float32)
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    """Concurrent submits share forward passes and each gets its own row."""
+    from batching import MicroBatcher
+
+    calls = []
+
+    def forward(batch):
+        calls.append(len(batch))
+        return batch.sum(axis=1)
+
+    batcher = MicroBatcher(forward, max_batch_size=8, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(np.array([i, 1.0])) for i in range(20)]
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.close()
+
+    assert results == [i + 1.0 for i in range(20)]
+    assert sum(calls) == 20
+    assert max(calls) <= 8
+    assert len(calls) < 20
+    stats = batcher.stats.as_dict()
+    assert stats["requests"] == 20
+    assert stats["max_batch_size"] <= 8
+
+
+def test_micro_batcher_propagates_errors():
+    from batching import MicroBatcher
+
+    def forward(batch):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(forward, max_batch_size=4, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.submit(np.zeros(2)).result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_micro_batcher_close_resolves_every_future():
+    """Submits racing close() either raise or resolve; none are left hanging."""
+    from batching import MicroBatcher
+
+    batcher = MicroBatcher(lambda batch: batch.sum(axis=1), max_batch_size=4, max_wait_ms=1)
+    futures, rejected = [], []
+    start = threading.Barrier(5)
+
+    def submitter():
+        start.wait()
+        for _ in range(200):
+            try:
+                futures.append(batcher.submit(np.ones(2)))
+            except RuntimeError:
+                rejected.append(1)
+
+    threads = [threading.Thread(target=submitter) for _ in range(4)]
+    for t in threads:
+        t.start()
+    start.wait()
+    batcher.close()
+    for t in threads:
+        t.join()
+
+    for fut in futures:
+        assert fut.exception(timeout=5) is None
+    assert len(futures) + len(rejected) == 800
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.ones(2))
+
+
+def test_predictor_batched_matches_unbatched():
+    """Batched predict() returns the same result as the direct path."""
+    from predictor import DigitPredictor
+
+    predictor = DigitPredictor(model_path="unused.keras")
+    predictor.set_model(_MeanModel())
+    expected = [predictor.predict(_digit_image(v)) for v in (0.1, 0.5, 0.9)]
+
+    predictor.enable_batching(max_batch_size=16, max_wait_ms=20)
+    try:
+        results = [None] * 3
+
+        def worker(i, v):
+            results[i] = predictor.predict(_digit_image(v))
+
+        threads = [threading.Thread(target=worker, args=(i, v)) for i, v in enumerate((0.1, 0.5, 0.9))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = predictor.batching_stats()
+    finally:
+        predictor.disable_batching()
+
+    assert [r.digit for r in results] == [r.digit for r in expected]
+    assert np.allclose(results[1].probabilities, expected[1].probabilities)
+    assert stats["enabled"] and stats["requests"] == 3
+
+
+def test_predict_batch_single_pass_with_item_errors():
+    """predict_batch runs one forward pass and isolates bad inputs."""
+    import base64
+    import io
+    from PIL import Image
+    from predictor import DigitPredictor, PredictionResult
+
+    model = _MeanModel()
+    predictor = DigitPredictor(model_path="unused.keras")
+    predictor.set_model(model)
+
+    buf = io.BytesIO()
+    Image.fromarray(np.full((28, 28), 128, dtype=np.uint8), mode="L").save(buf, format="PNG")
+    png_b64 = base64.b64encode(buf.getvalue()).decode()
+    images = [_digit_image(0.2), "not-base64!!", png_b64, buf.getvalue()]
+
+    results = predictor.predict_batch(images, return_exceptions=True)
+
+    assert model.calls == [3]
+    assert isinstance(results[1], Exception)
+    assert all(isinstance(results[i], PredictionResult) for i in (0, 2, 3))
+    assert results[2].digit == results[3].digit == predictor.predict(png_b64).digit
+    with pytest.raises(Exception):
+        predictor.predict_batch(images)
+
+
+def test_result_cache_hits_across_encodings_and_invalidates():
+    """Same drawing in another encoding hits; set_model() drops stale results."""
+    import base64
+    import io
+    from PIL import Image
+    from predictor import DigitPredictor
+
+    model = _MeanModel()
+    predictor = DigitPredictor(model_path="unused.keras")
+    predictor.set_model(model)
+    predictor.enable_result_cache(max_entries=8, ttl=60)
+
+    buf = io.BytesIO()
+    Image.fromarray(np.full((28, 28), 200, dtype=np.uint8), mode="L").save(buf, format="PNG")
+    png_b64 = base64.b64encode(buf.getvalue()).decode()
+
+    first = predictor.predict(png_b64)
+    assert predictor.predict(png_b64) == first  # same payload
+    assert predictor.predict("data:image/png;base64," + png_b64) == first  # same pixels
+    assert predictor.predict_batch([buf.getvalue(), png_b64]) == [first, first]
+    assert model.calls == [1]
+    stats = predictor.result_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+
+    predictor.set_model(model)
+    predictor.predict(png_b64)
+    assert model.calls == [1, 1]
+
+
+def test_result_cache_lru_and_ttl():
+    from result_cache import ResultCache
+
+    cache = ResultCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.put([key], np.full(10, 0.1))
+    assert cache.get("a") is None and cache.get("c") is not None
+    assert cache.evictions == 1
+
+    gen = cache.generation
+    cache.clear()
+    cache.put(["late"], np.full(10, 0.1), generation=gen)
+    assert len(cache) == 0
+
+    cache.ttl = 0
+    cache.put(["x"], np.full(10, 0.1))
+    assert cache.get("x") is None
+    assert cache.expirations == 1
+
+
+def test_load_warms_up_compiled_function(tmp_path):
+    """load() traces the compiled function and runs it for each warm-up batch size."""
+    pytest.importorskip("tensorflow")
+    from model import build_simple_model
+    from predictor import DigitPredictor
+
+    model = build_simple_model()
+    path = str(tmp_path / "model.keras")
+    model.save(path)
+    predictor = DigitPredictor(path)
+    assert predictor.warmup_state == "cold" and not predictor.is_ready()
+
+    predictor.start_warmup().join(timeout=60)
+    assert predictor.is_ready()
+    assert predictor.warmup_status()["compiled"]
+    x = np.random.default_rng(0).random((3, 28, 28, 1), dtype=np.float32)
+    np.testing.assert_allclose(predictor._forward(x), model.predict(x, verbose=0), atol=1e-5)
+
+
+def test_status_is_answered_from_memory(tmp_path):
+    """Probes never load inline: a cold predictor loads in the background."""
+    from predictor import DigitPredictor
+
+    predictor = DigitPredictor(model_path=str(tmp_path / "missing.keras"))
+    assert predictor.status()["loaded"] is False
+    assert predictor.load_in_background() is False
+    for _ in range(500):
+        if predictor.warmup_state != "warming":
+            break
+        threading.Event().wait(0.01)
+    assert predictor.warmup_state == "missing"
+    assert predictor.status()["ready"] is False
+
+    predictor.set_model(_MeanModel())
+    status = predictor.status()
+    assert status["ready"] and status["loaded"]
+    assert status["queue_depth"] == 0
+    assert status["loaded_at"] is not None
+
+
+def test_bounded_executor_rejects_when_full_and_times_out_queued_work():
+    """Admission control: 1 worker + 1 queued slot; a third caller is rejected."""
+    import asyncio
+    from executor import BoundedExecutor, QueueFull, QueueTimeout
+
+    release = threading.Event()
+    executor = BoundedExecutor(workers=1, max_queue=1, queue_timeout=0.2)
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(executor.run(lambda: "late"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(QueueFull):
+            await executor.run(lambda: None)
+        with pytest.raises(QueueTimeout):
+            await queued
+        release.set()
+        assert await running is True
+        assert await executor.run(lambda: 42) == 42
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["timed_out"] == 1
@@ -0,0 +1,110 @@
+"""
+Tests for the versioned model registry, hot-swap and rollback.
+Small untrained models stand in for trained ones.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def registry(tmp_path):
+    pytest.importorskip("tensorflow")
+    from model_registry import ModelRegistry
+
+    return ModelRegistry(str(tmp_path / "registry"))
+
+
+def _model(seed):
+    from tensorflow import keras
+    from model import build_simple_model
+
+    keras.utils.set_random_seed(seed)
+    return build_simple_model()
+
+
+def test_publish_is_content_addressed_and_rolls_back(registry, tmp_path):
+    first = registry.publish(_model(0))
+    second = registry.publish(_model(1))
+    assert first.id != second.id
+    assert registry.current_id() == second.id
+    assert [v.id for v in registry.versions()] == [first.id, second.id]
+    assert not [n for n in os.listdir(registry.versions_dir) if n.startswith(".")]
+
+    assert registry.rollback().id == first.id
+    assert registry.current_id() == first.id
+    with pytest.raises(ValueError):
+        registry.rollback()
+    assert registry.rollback(second.id).id == second.id
+    # Same weights, saved again: same version, nothing new on disk
+    assert registry.publish(_model(0)).id == first.id
+    assert len(registry.versions()) == 2 and registry.current_id() == first.id
+
+    mirror = str(tmp_path / "model.keras")
+    registry.mirror(second, mirror)
+    with open(mirror, "rb") as a, open(second.path, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_rollback_rejects_ids_outside_the_registry(tmp_path):
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    bait = tmp_path / "x"
+    bait.mkdir()
+    (bait / "model.keras").write_bytes(b"not a registry version")
+    for version_id in ("../../x", "../x", "ABCDEF0123456789", "0123", "/tmp"):
+        with pytest.raises(ValueError):
+            registry.rollback(version_id)
+    assert registry.current_id() is None
+
+
+def test_watcher_hot_swaps_between_requests(registry, tmp_path):
+    from predictor import DigitPredictor
+
+    first = registry.publish(_model(0))
+    predictor = DigitPredictor(str(tmp_path / "unused.keras"), registry=registry)
+    assert predictor.load() and predictor.status()["version"] == first.id
+    image = np.random.default_rng(0).random((28, 28), dtype=np.float32)
+    before = predictor.predict(image).probabilities
+
+    predictor.enable_registry_watch(interval=0.05)
+    try:
+        second = registry.publish(_model(1))
+        deadline = time.time() + 30
+        while predictor.status()["version"] != second.id and time.time() < deadline:
+            predictor.predict(image)  # keeps serving the old model meanwhile
+            time.sleep(0.05)
+    finally:
+        predictor.disable_registry_watch()
+    assert predictor.status()["version"] == second.id
+    assert predictor.is_ready()
+    assert predictor.predict(image).probabilities != before
+
+
+def test_quantized_export_of_mirror_is_served_from_registry(registry, tmp_path):
+    """MODEL_PRECISION still applies when the model is served from the registry."""
+    from predictor import DigitPredictor
+    from quantization import export_quantized, quantized_path
+
+    version = registry.publish(_model(0))
+    mirror = str(tmp_path / "model.keras")
+    registry.mirror(version, mirror)
+    meta = export_quantized(mirror, "float16", registry=registry)
+    assert meta["version_path"] == quantized_path(version.path, "float16")
+
+    predictor = DigitPredictor(str(tmp_path / "unused.keras"), precision="float16", registry=registry)
+    assert predictor.load()
+    assert predictor.status()["version"] == version.id
+    assert (predictor.precision, predictor.model_path) == ("float16", meta["version_path"])
+
+    # Mirroring the version elsewhere carries the quantized export along
+    other = str(tmp_path / "other" / "model.keras")
+    os.makedirs(os.path.dirname(other))
+    registry.mirror(version, other)
+    assert os.path.exists(quantized_path(other, "float16"))
@@ -0,0 +1,113 @@
+"""
+Tests for the NumPy inference runtime and the Keras exporter.
+Models are small and randomly initialised; no MNIST download or training.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pytest
+
+
+def _randomize_batchnorm(model, seed=0):
+    """Non-trivial moving statistics so BN folding is actually exercised."""
+    rng = np.random.default_rng(seed)
+    for layer in model.layers:
+        if type(layer).__name__ == "BatchNormalization":
+            n = layer.moving_mean.shape[0]
+            layer.moving_mean.assign(rng.normal(0, 0.2, n).astype(np.float32))
+            layer.moving_variance.assign(rng.uniform(0.5, 1.5, n).astype(np.float32))
+            layer.gamma.assign(rng.uniform(0.5, 1.5, n).astype(np.float32))
+            layer.beta.assign(rng.normal(0, 0.2, n).astype(np.float32))
+
+
+def _small_residual_model():
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from model import create_data_augmentation
+
+    inputs = keras.Input(shape=(28, 28, 1))
+    x = create_data_augmentation()(inputs)
+    x = layers.Conv2D(8, 3, strides=2, padding="same", use_bias=False)(x)
+    x = layers.BatchNormalization()(x)
+    x = layers.Activation("relu")(x)
+    shortcut = layers.Conv2D(16, 1, strides=2, use_bias=False)(x)
+    y = layers.Conv2D(16, 3, strides=2, padding="same")(x)
+    y = layers.BatchNormalization()(y)
+    x = layers.Activation("relu")(layers.Add()([y, shortcut]))
+    x = layers.MaxPooling2D(2)(x)
+    x = layers.Flatten()(x)
+    x = layers.Dense(32, activation="relu")(x)
+    x = layers.BatchNormalization()(x)
+    x = layers.Dropout(0.5)(x)
+    outputs = layers.Dense(10, activation="softmax")(x)
+    return keras.Model(inputs, outputs)
+
+
+@pytest.mark.parametrize("build", ["simple", "residual"])
+def test_numpy_runtime_matches_keras(tmp_path, build):
+    """Exported graph drops training-only layers, folds BN, and matches Keras."""
+    pytest.importorskip("tensorflow")
+    from inference_graph import export_npz
+    from model import build_simple_model
+    from numpy_runtime import NumpyModel
+
+    model = build_simple_model() if build == "simple" else _small_residual_model()
+    _randomize_batchnorm(model)
+    runtime = NumpyModel.load(export_npz(model, str(tmp_path / "model.npz")))
+
+    ops = [n["op"] for n in runtime.nodes]
+    assert "affine" not in ops
+    assert ops.count("activation") == (1 if build == "residual" else 0)  # only the post-Add ReLU
+    x = np.random.default_rng(1).random((5, 28, 28, 1), dtype=np.float32)
+    np.testing.assert_allclose(runtime.predict(x), model.predict(x, verbose=0), atol=1e-5)
+    assert runtime.count_params() <= model.count_params()
+
+
+def test_predictor_serves_npz_without_tensorflow(tmp_path):
+    pytest.importorskip("tensorflow")
+    from inference_graph import export_npz
+    from model import build_simple_model
+
+    path = export_npz(build_simple_model(), str(tmp_path / "model.npz"))
+    code = (
+        f"import sys; sys.path.insert(0, {ROOT!r})\n"
+        "import numpy as np\n"
+        "from predictor import DigitPredictor\n"
+        f"r = DigitPredictor({path!r}).predict(np.zeros((28, 28), dtype=np.float32))\n"
+        "assert len(r.probabilities) == 10\n"
+        "print('tensorflow' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_inference_model_is_preferred_and_matches(tmp_path):
+    """Training exports an inference-only Keras model that the predictor loads first."""
+    pytest.importorskip("tensorflow")
+    from inference_graph import export_inference_model, inference_model_path
+    from predictor import DigitPredictor
+
+    model = _small_residual_model()
+    _randomize_batchnorm(model)
+    path = str(tmp_path / "model.keras")
+    model.save(path)
+    inference = export_inference_model(model, path)
+
+    classes = {type(l).__name__ for l in inference.layers}
+    assert not classes & {"Sequential", "Dropout", "BatchNormalization"}
+    x = np.random.default_rng(1).random((5, 28, 28, 1), dtype=np.float32)
+    np.testing.assert_allclose(inference.predict(x, verbose=0), model.predict(x, verbose=0), atol=1e-5)
+
+    predictor = DigitPredictor(path)
+    assert predictor.load() and predictor.model_path == inference_model_path(path)
+
+    # Retraining without re-exporting leaves the inference copy stale
+    model.layers[-1].bias.assign(np.ones(10, dtype=np.float32))
+    model.save(path)
+    predictor = DigitPredictor(path)
+    assert predictor.load() and predictor.model_path == path
@@ -0,0 +1,283 @@
+"""
+Tests for prediction persistence in digit_api.
+Database tests run against an in-memory SQLite copy of the schema.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("django")
+pytest.importorskip("rest_framework")
+
+
+@pytest.fixture(scope="module")
+def db():
+    """Configure Django on in-memory SQLite and apply the digit_api migrations."""
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if not settings.configured:
+        settings.configure(
+            DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+            INSTALLED_APPS=["django.contrib.contenttypes", "django.contrib.auth", "rest_framework", "digit_api"],
+            USE_TZ=True,
+            PREDICTION_PROBABILITY_STORAGE="float32",
+        )
+        django.setup()
+    call_command("migrate", verbosity=0)
+    yield
+
+
+def _result(digit, probs):
+    from predictor import PredictionResult
+    return PredictionResult(digit=digit, confidence=max(probs), probabilities=list(probs), label=str(digit))
+
+
+def test_prediction_writer_batches_by_size_and_time():
+    """Records are flushed in batches and everything is written on close()."""
+    from digit_api.persistence import PredictionWriter
+
+    batches = []
+    writer = PredictionWriter(flush_size=4, flush_interval=0.05, flush_fn=lambda b: batches.append(list(b)))
+    for i in range(10):
+        assert writer.submit(i, "canvas")
+
+    deadline = time.monotonic() + 5
+    while sum(map(len, batches)) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [r for b in batches for r, _ in b] == list(range(10))
+    assert max(map(len, batches)) <= 4
+
+    writer.submit(10, "file")
+    writer.close()
+    assert batches[-1] == [(10, "file")]
+    assert writer.stats() == {"enabled": True, "pending": 0, "flushed": 11, "failed": 0}
+    assert not writer.submit(11, "file")
+
+
+def test_prediction_writer_close_loses_no_accepted_record():
+    """Every submit that returns True is written, even when racing close()."""
+    from digit_api.persistence import PredictionWriter
+
+    written = []
+    writer = PredictionWriter(flush_size=8, flush_interval=0.001, flush_fn=written.extend)
+    accepted = []
+    start = threading.Barrier(5)
+
+    def submitter(k):
+        start.wait()
+        for i in range(500):
+            if writer.submit((k, i), "canvas"):
+                accepted.append((k, i))
+
+    threads = [threading.Thread(target=submitter, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    start.wait()
+    writer.close()
+    for t in threads:
+        t.join()
+
+    assert sorted(r for r, _ in written) == sorted(accepted)
+
+
+def test_prediction_writer_backpressure_and_failures():
+    """A full queue rejects submits; failed flushes are counted, not raised."""
+    from digit_api.persistence import PredictionWriter
+
+    release = threading.Event()
+
+    def flush(batch):
+        release.wait(5)
+        raise RuntimeError("db down")
+
+    writer = PredictionWriter(flush_size=1, flush_interval=0.01, max_pending=2, flush_fn=flush)
+    accepted = [writer.submit(i, "canvas") for i in range(5)]
+    assert accepted.count(False) >= 1
+    assert writer.pending() <= 2
+    release.set()
+    writer.close()
+    assert writer.failed == accepted.count(True)
+
+
+@pytest.mark.parametrize("storage", ["float32", "float16", "rows"])
+def test_probability_storage_modes_round_trip(db, storage):
+    """Every storage mode serializes to the same [{digit_class, probability}] shape."""
+    from django.test.utils import override_settings
+    from digit_api.models import Prediction, PredictionProbability
+    from digit_api.persistence import save_predictions
+    from digit_api.serializers import PredictionSerializer
+
+    probs = [0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09, 0.55]
+    with override_settings(PREDICTION_PROBABILITY_STORAGE=storage):
+        obj = save_predictions([(_result(9, probs), "canvas")])[0]
+
+    rows = PredictionProbability.objects.filter(prediction_id=obj.id).count()
+    assert rows == (10 if storage == "rows" else 0)
+    data = PredictionSerializer(Prediction.objects.get(id=obj.id)).data
+    assert [p["digit_class"] for p in data["probabilities"]] == list(range(10))
+    tol = 1e-3 if storage == "float16" else 1e-6
+    assert [p["probability"] for p in data["probabilities"]] == pytest.approx(probs, abs=tol)
+
+
+def test_prediction_history_keyset_pages_and_filters(db):
+    """Cursor pages are disjoint and ordered, filters apply, and queries stay constant."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory
+    from digit_api.models import Prediction
+    from digit_api.persistence import save_predictions
+    from digit_api.views import prediction_list
+
+    Prediction.objects.all().delete()
+    probs = [0.1] * 10
+    save_predictions([(_result(i % 10, probs), "canvas" if i % 2 else "file") for i in range(25)])
+    factory = APIRequestFactory()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        with CaptureQueriesContext(connection) as queries:
+            data = prediction_list(factory.get("/predictions", params)).data
+        assert len(queries) <= 2  # page + cached count; packed rows need no prefetch
+        seen.extend(r["id"] for r in data["results"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(Prediction.objects.values_list("id", flat=True), reverse=True)
+    assert data["count"] == 25
+
+    data = prediction_list(factory.get("/predictions", {"digit": 3, "source": "canvas"})).data
+    assert [(r["digit"], r["source"]) for r in data["results"]] == [(3, "canvas")] * 3
+
+    bad = prediction_list(factory.get("/predictions", {"cursor": "garbage"}))
+    assert bad.status_code == 400
+
+
+def test_prediction_history_prefetches_only_row_probabilities(db):
+    """Row-stored probabilities come in one prefetch query, not one per prediction."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+    from rest_framework.test import APIRequestFactory
+    from digit_api.models import Prediction
+    from digit_api.persistence import save_predictions
+    from digit_api.views import prediction_list
+
+    Prediction.objects.all().delete()
+    probs = [0.1] * 10
+    save_predictions([(_result(1, probs), "canvas") for _ in range(5)])
+    with override_settings(PREDICTION_PROBABILITY_STORAGE="rows"):
+        save_predictions([(_result(2, probs), "canvas") for _ in range(5)])
+
+    request = APIRequestFactory().get("/predictions", {"limit": 20})
+    prediction_list(request)  # warm the cached count
+    with CaptureQueriesContext(connection) as queries:
+        data = prediction_list(request).data
+    assert len(queries) == 2  # page + one probabilities prefetch
+    assert all(len(r["probabilities"]) == 10 for r in data["results"])
+
+
+def test_prediction_rollups_incremental_match_rebuild(db):
+    """Rollups maintained on write equal a rebuild from scratch, and stats add up."""
+    from django.core.management import call_command
+    from rest_framework.test import APIRequestFactory
+    from digit_api.models import Prediction, PredictionRollup
+    from digit_api.persistence import save_predictions
+    from digit_api.views import prediction_stats
+
+    Prediction.objects.all().delete()
+    PredictionRollup.objects.all().delete()
+    records = []
+    for i in range(30):
+        probs = [0.0] * 10
+        probs[i % 10] = 0.35 + (i % 7) * 0.1
+        records.append((_result(i % 10, probs), "canvas" if i % 3 else "file"))
+    save_predictions(records[:10])
+    save_predictions(records[10:])
+
+    def snapshot():
+        return sorted(PredictionRollup.objects.values_list(
+            "bucket", "source", "digit", "confidence_bin", "count"))
+
+    incremental = snapshot()
+    assert sum(row[-1] for row in incremental) == 30
+    call_command("rebuild_prediction_rollups", stdout=open(os.devnull, "w"))
+    assert snapshot() == incremental
+
+    response = prediction_stats(APIRequestFactory().get("/predictions/stats", {"hours": 2}))
+    data = response.data
+    assert data["total"] == 30
+    assert data["by_source"] == {"canvas": 20, "file": 10}
+    assert set(data["digit_distribution"].values()) == {3}
+    assert sum(b["count"] for b in data["confidence_histogram"]) == 30
+    assert sum(h["count"] for h in data["hourly"]) == 30
+    assert data["mean_confidence"] == pytest.approx(
+        sum(r.confidence for r, _ in records) / 30)
+
+    data = prediction_stats(APIRequestFactory().get("/predictions/stats", {"source": "file"})).data
+    assert data["total"] == 10
+    assert prediction_stats(APIRequestFactory().get("/predictions/stats", {"hours": 0})).status_code == 400
+
+
+def test_rebuild_rollups_until_mid_hour_keeps_whole_buckets(db):
+    """A rebuild ending partway through an hour still counts that hour in full."""
+    from datetime import timedelta
+    from digit_api.models import Prediction, PredictionRollup
+    from digit_api.persistence import save_predictions
+    from digit_api.rollups import hour_bucket, rebuild_rollups
+
+    Prediction.objects.all().delete()
+    PredictionRollup.objects.all().delete()
+    saved = save_predictions([(_result(4, [0.1] * 4 + [0.6] + [0.0] * 5), "canvas") for _ in range(6)])
+    bucket = hour_bucket(saved[0].created_at)
+    Prediction.objects.filter(id__in=[p.id for p in saved[:3]]).update(created_at=bucket + timedelta(minutes=5))
+    Prediction.objects.filter(id__in=[p.id for p in saved[3:]]).update(created_at=bucket + timedelta(minutes=50))
+
+    rebuild_rollups(since=bucket, until=bucket + timedelta(minutes=30))
+    assert sum(PredictionRollup.objects.filter(bucket=bucket).values_list("count", flat=True)) == 6
+
+
+def test_api_training_run_records_hyperparameters_and_timing(db, monkeypatch):
+    """Runs finished through the DRF job queue store the same fields as sweep trials.
+    The hook runs on a training worker thread, so it is called from one here too."""
+    import training_jobs
+    from django.db import connections
+    from digit_api.models import TrainingRun
+    from digit_api.views import _record_training_run
+
+    monkeypatch.setattr(training_jobs, "refresh_served_model", lambda job: None)
+    job = training_jobs.TrainingJob(id="j1", params={"model_type": "Simple", "epochs": 10, "batch_size": 64},
+                                    status="done")
+    job.result = {
+        "test_accuracy": 0.98, "test_loss": 0.07, "model_type": "simple", "epochs": 10, "batch_size": 64,
+        "learning_rate": 3e-4, "dropout": 0.3, "epochs_completed": 7, "status": "early_stopped",
+        "duration_seconds": 42.0, "throughput": 9000.0,
+    }
+    # The in-memory database lives on this thread's connection; lend it to the worker
+    shared = connections["default"]
+    shared.inc_thread_sharing()
+    errors = []
+
+    def hook():
+        connections["default"] = shared
+        try:
+            _record_training_run(job)
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=hook)
+    worker.start()
+    worker.join()
+    shared.dec_thread_sharing()
+    assert errors == []
+
+    run = TrainingRun.objects.latest("id")
+    assert (run.model_type, run.epochs, run.epochs_completed, run.batch_size) == ("simple", 10, 7, 64)
+    assert (run.learning_rate, run.dropout, run.status) == (3e-4, 0.3, "early_stopped")
+    assert (run.duration_seconds, run.throughput, run.sweep_id) == (42.0, 9000.0, None)
@@ -0,0 +1,160 @@
+"""
+Tests for batch preprocessing: preprocess_batch() must agree with preprocess().
+"""
+import base64
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+
+def _canvas(rng, h, w, light):
+    """A few random strokes, dark on light or light on dark, like a drawing canvas."""
+    img = Image.new("L", (w, h), 255 if light else 0)
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.integers(1, 4)):
+        points = [(int(rng.integers(0, w)), int(rng.integers(0, h))) for _ in range(4)]
+        draw.line(points, fill=0 if light else 255, width=int(rng.integers(3, 20)))
+    return np.array(img)
+
+
+def _inputs(rng, n=120):
+    images = []
+    for k in range(n):
+        h, w = [(280, 280), (200, 300), (100, 100), (64, 48), (28, 28), (29, 30)][k % 6]
+        arr = _canvas(rng, h, w, light=k % 2 == 0)
+        kind = k % 5
+        if kind == 1:
+            arr = arr.astype(np.float32) / 255.0
+        elif kind == 2:
+            arr = np.stack([arr] * 3, axis=-1)
+        elif kind == 3:
+            noisy = arr.astype(np.float32) + rng.normal(0, 20, arr.shape)
+            arr = noisy.clip(0, 255).astype(np.uint8)
+        images.append(arr)
+    images.append(np.zeros((280, 280), dtype=np.uint8))  # nothing drawn
+    images.append(np.full((280, 280), 255, dtype=np.uint8))
+    return images
+
+
+def test_batch_matches_per_image_path():
+    from preprocessing import BATCH_TOLERANCE, preprocess, preprocess_batch
+
+    images = _inputs(np.random.default_rng(0))
+    expected = np.stack([preprocess(image) for image in images])
+    out = preprocess_batch(images)
+    assert out.shape == (len(images), 28, 28) and out.dtype == np.float32
+    assert np.abs(out - expected).max() <= BATCH_TOLERANCE
+
+
+def test_batch_writes_into_out_and_records_errors():
+    from preprocessing import preprocess, preprocess_batch
+
+    buf = io.BytesIO()
+    Image.fromarray(_canvas(np.random.default_rng(1), 280, 280, light=True), mode="L").save(buf, format="PNG")
+    images = ["not-base64!!", base64.b64encode(buf.getvalue()).decode(), buf.getvalue()]
+    batch = np.ones((3, 28, 28, 1), dtype=np.float32)
+    errors = {}
+    preprocess_batch(images, out=batch[..., 0], errors=errors)
+    assert list(errors) == [0]
+    assert not batch[0].any()
+    assert np.array_equal(batch[1, ..., 0], preprocess(buf.getvalue()))
+    assert np.array_equal(batch[1], batch[2])
+    with pytest.raises(Exception):
+        preprocess_batch(images)
+
+
+def test_large_mixed_batch_is_processed_in_bounded_chunks(monkeypatch):
+    """A big mixed-shape batch never resizes more than chunk_size images at once."""
+    import preprocessing
+    from preprocessing import BATCH_TOLERANCE, preprocess, preprocess_batch
+
+    group_sizes = []
+    kernel = preprocessing._crop_and_center_group
+
+    def recording(stack, out):
+        group_sizes.append(len(stack))
+        return kernel(stack, out)
+
+    monkeypatch.setattr(preprocessing, "_crop_and_center_group", recording)
+    images = _inputs(np.random.default_rng(2), n=300)
+    images[200] = "not-base64!!"
+    errors = {}
+    out = preprocess_batch(images, errors=errors, chunk_size=32)
+
+    assert list(errors) == [200] and not out[200].any()
+    assert group_sizes and max(group_sizes) <= 32
+    expected = np.stack([preprocess(image) for i, image in enumerate(images) if i != 200])
+    assert np.abs(np.delete(out, 200, axis=0) - expected).max() <= BATCH_TOLERANCE
+
+
+def test_fast_path_reuses_scratch_without_leaking_state():
+    from preprocessing import preprocess
+
+    rng = np.random.default_rng(2)
+    light = _canvas(rng, 280, 280, light=True)
+    dark = _canvas(rng, 100, 120, light=False)
+    before = light.copy()
+    first = preprocess(light)
+    preprocess(dark)
+    preprocess(dark.astype(np.float32) / 255.0)
+    assert np.array_equal(preprocess(light), first)
+    assert np.array_equal(light, before)  # inputs are never modified
+
+
+def test_large_inputs_are_reduced_first():
+    from preprocessing import preprocess, preprocess_batch
+
+    canvas = _canvas(np.random.default_rng(3), 280, 280, light=True)
+    large = np.kron(canvas, np.ones((3, 3), dtype=np.uint8))  # 840x840, above PREPROCESS_REDUCE_ABOVE
+    assert np.abs(preprocess(large) - preprocess(canvas)).max() <= 0.1
+    assert np.array_equal(preprocess_batch([large])[0], preprocess(large))
+
+
+def test_raw_pixels_match_png_without_copying():
+    from preprocessing import from_raw_pixels, preprocess
+
+    canvas = _canvas(np.random.default_rng(4), 200, 300, light=False)
+    buf = io.BytesIO()
+    Image.fromarray(canvas, mode="L").save(buf, format="PNG")
+    raw = canvas.tobytes()
+    pixels = from_raw_pixels(raw, 300, 200)
+    assert pixels.shape == (200, 300) and np.shares_memory(pixels, np.frombuffer(raw, dtype=np.uint8))
+    assert np.array_equal(preprocess(pixels), preprocess(buf.getvalue()))
+    with pytest.raises(ValueError):
+        from_raw_pixels(raw, 300, 201)
+    with pytest.raises(ValueError):
+        from_raw_pixels(b"", 0, 0)
+
+
+def test_raw_pixel_size_is_checked_from_headers():
+    from config import PREDICT_RAW_MAX_PIXELS
+    from preprocessing import ImageTooLarge, raw_pixels_length
+
+    assert raw_pixels_length(300, 200, "60000") == 60000
+    assert raw_pixels_length(300, 200) == 60000
+    with pytest.raises(ImageTooLarge):
+        raw_pixels_length(300, 200, "60001")
+    with pytest.raises(ImageTooLarge):
+        raw_pixels_length(PREDICT_RAW_MAX_PIXELS, 2)
+    with pytest.raises(ValueError):
+        raw_pixels_length(0, 200)
+
+
+def test_rasterize_strokes_draws_round_strokes():
+    from preprocessing import preprocess, rasterize_strokes
+
+    canvas = rasterize_strokes([[140, 40, 140, 240], [100, 60]], 280, 280, line_width=20)
+    assert canvas.shape == (280, 280) and canvas.dtype == np.uint8
+    assert canvas[140, 140] == 255 and canvas[60, 100] == 255 and canvas[5, 5] == 0
+    assert canvas[30, 140] == 255 and canvas[20, 140] == 0  # round cap: radius 10 past the end
+    assert preprocess(canvas).max() > 0.5
+    with pytest.raises(ValueError):
+        rasterize_strokes([[1, 2, 3]], 280, 280)
+    with pytest.raises(ValueError):
+        rasterize_strokes([], 100000, 100000)
@@ -0,0 +1,76 @@
+"""
+Tests for post-training quantization and quantized serving.
+A small untrained model and a synthetic dataset stand in for MNIST.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+
+class _FakeDataset:
+    """Just enough of MnistDataset for calibration and evaluation."""
+
+    def __init__(self, n=64, seed=0):
+        rng = np.random.default_rng(seed)
+        self._images = rng.integers(0, 256, (n, 28, 28), dtype=np.uint8)
+        self._labels = rng.integers(0, 10, n).astype(np.uint8)
+
+    def images(self, split="train"):
+        return self._images
+
+    def iter_batches(self, split="test", batch_size=32):
+        for i in range(0, len(self._images), batch_size):
+            yield self._images[i:i + batch_size, ..., None] / np.float32(255), self._labels[i:i + batch_size]
+
+
+@pytest.fixture(scope="module")
+def model_file(tmp_path_factory):
+    pytest.importorskip("tensorflow")
+    from model import build_simple_model
+
+    path = str(tmp_path_factory.mktemp("quant") / "model.keras")
+    build_simple_model().save(path)
+    return path
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_quantized_artifact_is_served_and_close(model_file, precision):
+    from predictor import DigitPredictor
+    from quantization import compare, export_quantized
+
+    dataset = _FakeDataset()
+    meta = export_quantized(model_file, precision, calibration_size=32, dataset=dataset)
+    assert meta["size_bytes"] < os.path.getsize(model_file)
+
+    predictor = DigitPredictor(model_path=model_file, precision=precision)
+    assert predictor.load()
+    assert (predictor.precision, predictor.model_path) == (precision, meta["path"])
+
+    float_model = DigitPredictor(model_path=model_file, precision="float32")
+    x = dataset.images()[:8]
+    for img in x:
+        assert np.allclose(predictor.predict(img).probabilities,
+                           float_model.predict(img).probabilities, atol=0.05)
+
+    report = compare(model_file, meta["path"], dataset=dataset)
+    assert abs(report["accuracy_delta"]) <= 0.1
+
+
+def test_stale_quantized_artifact_falls_back_to_float(model_file, tmp_path):
+    import shutil
+    from model import build_simple_model
+    from predictor import DigitPredictor
+    from quantization import export_quantized
+
+    path = str(tmp_path / "model.keras")
+    shutil.copy(model_file, path)
+    export_quantized(path, "float16")
+    build_simple_model().save(path)  # retrained: the artifact no longer matches
+
+    predictor = DigitPredictor(model_path=path, precision="float16")
+    assert predictor.load()
+    assert (predictor.precision, predictor.model_path) == ("float32", path)
@@ -0,0 +1,36 @@
+"""
+Tests for the hyperparameter sweep helpers (search space, threads, pruning).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sweep import DEFAULT_SPACE, grid, random_search, should_prune, threads_per_trial
+
+
+def test_grid_covers_every_combination():
+    trials = grid({"model_type": ["simple", "advanced"], "batch_size": [64, 128, 256]})
+    assert len(trials) == 6
+    assert {"model_type": "advanced", "batch_size": 256} in trials
+    assert len(grid(DEFAULT_SPACE)) == 16
+
+
+def test_random_search_is_seeded_distinct_and_capped():
+    first = random_search(DEFAULT_SPACE, 5, seed=1)
+    assert first == random_search(DEFAULT_SPACE, 5, seed=1)
+    assert len({tuple(sorted(t.items())) for t in first}) == 5
+    assert len(random_search(DEFAULT_SPACE, 100, seed=1)) == 16
+
+
+def test_threads_per_trial_splits_cores():
+    assert threads_per_trial(2, cpus=8) == 4
+    assert threads_per_trial(3, cpus=8) == 2
+    assert threads_per_trial(16, cpus=8) == 1
+
+
+def test_median_pruning():
+    assert not should_prune(0.5, [0.9])  # too few reports to judge
+    assert should_prune(0.5, [0.9, 0.8])
+    assert not should_prune(0.86, [0.9, 0.8])
+    assert not should_prune(0.95, [0.9, 0.8, 0.7])
@@ -0,0 +1,128 @@
+"""
+Tests for background training jobs.
+A fake training function runs in the child process; no TensorFlow needed.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+def _fake_train(params, emit, should_stop, model_path=None):
+    for epoch in range(1, params["epochs"] + 1):
+        emit({"type": "epoch", "epoch": epoch, "total_epochs": params["epochs"], "loss": 1.0 / epoch})
+    return {"test_accuracy": 0.9, "test_loss": 0.1, "version": "abc"}
+
+
+def _slow_train(params, emit, should_stop, model_path=None):
+    from training_jobs import TrainingCancelled
+
+    emit({"type": "status", "status": "training"})
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if should_stop():
+            raise TrainingCancelled()
+        time.sleep(0.05)
+    return {}
+
+
+def _wait(job, timeout=60):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        job.events_after(0, timeout=0.5)
+    return job
+
+
+def test_job_streams_events_and_calls_finish_hook():
+    from training_jobs import TrainingJobs
+
+    finished = []
+    jobs = TrainingJobs(on_finish=finished.append, target=_fake_train)
+    job = _wait(jobs.submit({"epochs": 3}))
+
+    assert job.status == "done" and job.result["version"] == "abc"
+    kinds = [e["type"] for e in job.events]
+    assert kinds.count("epoch") == 3 and kinds[-1] == "done"
+    assert [e["seq"] for e in job.events] == list(range(1, len(job.events) + 1))
+    assert job.events_after(job.events[-2]["seq"]) == job.events[-1:]
+    for _ in range(50):
+        if finished:
+            break
+        time.sleep(0.05)
+    assert finished == [job]
+
+
+def test_cancel_and_queue_limits():
+    from training_jobs import TooManyJobs, TrainingJobs
+
+    jobs = TrainingJobs(max_concurrent=1, max_queued=1, target=_slow_train)
+    running = jobs.submit({})
+    for _ in range(100):
+        if running.status != "queued":
+            break
+        time.sleep(0.05)
+    queued = jobs.submit({})
+    with pytest.raises(TooManyJobs):
+        jobs.submit({})
+
+    assert jobs.cancel(queued.id).status == "cancelled"
+    jobs.cancel(running.id)
+    assert _wait(running).status == "cancelled"
+
+
+def test_finished_job_is_never_started_or_revived():
+    """A job cancelled before its worker runs stays cancelled and spawns no process."""
+    from training_jobs import TrainingJob, TrainingJobs
+
+    jobs = TrainingJobs(target=_fake_train)
+    job = TrainingJob(id="j1", params={"epochs": 1})
+    job.record({"type": "cancelled"})
+    jobs._run(job)
+
+    assert job.status == "cancelled" and job.started_at is None
+    assert [e["type"] for e in job.events] == ["cancelled"]
+    job.record({"type": "status", "status": "training"})
+    assert job.status == "cancelled" and len(job.events) == 1
+
+
+def test_events_view_streams_asynchronously_under_asgi(monkeypatch):
+    """Under ASGI the SSE view returns an async stream, so events arrive as they happen."""
+    pytest.importorskip("django")
+    pytest.importorskip("rest_framework")
+    import asyncio
+    import io
+
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+            INSTALLED_APPS=["django.contrib.contenttypes", "django.contrib.auth", "rest_framework", "digit_api"],
+            USE_TZ=True,
+            PREDICTION_PROBABILITY_STORAGE="float32",  # same settings as test_persistence
+        )
+        django.setup()
+    from django.core.handlers.asgi import ASGIRequest
+    from digit_api import views
+    from training_jobs import TrainingJobs
+
+    jobs = TrainingJobs(target=_fake_train)
+    monkeypatch.setattr(views, "_training_jobs", jobs)
+    monkeypatch.setattr(views, "SSE_POLL_SECONDS", 0.01)
+    job = jobs.submit({"epochs": 2})
+
+    scope = {"type": "http", "method": "GET", "path": f"/api/train/jobs/{job.id}/events",
+             "headers": [], "query_string": b""}
+    response = views.training_job_events(ASGIRequest(scope, io.BytesIO()), job.id)
+    assert response.is_async
+
+    async def collect():
+        return [chunk async for chunk in response.streaming_content]
+
+    body = b"".join(asyncio.run(asyncio.wait_for(collect(), 60))).decode()
+    assert body.count("event: epoch") == 2
+    assert body.rstrip().splitlines()[-2] == "event: done"
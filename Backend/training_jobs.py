@@ -0,0 +1,370 @@
+"""
+Background training jobs with streamed progress.
+
+POST /train queues a job and returns its id straight away. Each job runs
+in its own process so serving threads keep their CPU, at most
+TRAINING_MAX_CONCURRENT at a time. The child reports stage changes,
+per-batch and per-epoch metrics as events over a queue. Clients replay and
+follow them (Server-Sent Events) or poll the latest progress snapshot. A
+running job can be cancelled: it stops at the next batch, or is terminated
+after TRAINING_CANCEL_GRACE seconds.
+"""
+
+import json
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    MODEL_PATH,
+    TRAINING_CANCEL_GRACE,
+    TRAINING_MAX_CONCURRENT,
+    TRAINING_MAX_QUEUED,
+    TRAINING_PIPELINE,
+    TRAINING_PROGRESS_EVERY,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 50
+MAX_EVENTS_PER_JOB = 5000
+FINISHED = ("done", "error", "cancelled")
+# Kept from run.json when a run is resumed
+_RUN_HYPERPARAMETERS = ("model_type", "batch_size", "learning_rate", "dropout")
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+class TooManyJobs(Exception):
+    """TRAINING_MAX_QUEUED jobs are already waiting (HTTP 429)."""
+
+
+# --- Child process side ---
+
+def _progress_callback(emit: Callable[[dict], None], should_stop: Callable[[], bool],
+                       epochs: int, every: int = TRAINING_PROGRESS_EVERY):
+    from tensorflow import keras
+
+    class Progress(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.epoch = 0
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.epoch = epoch + 1
+
+        def on_train_batch_end(self, batch, logs=None):
+            if should_stop():
+                self.model.stop_training = True
+            if every > 0 and (batch + 1) % every == 0:
+                logs = logs or {}
+                emit({"type": "batch", "epoch": self.epoch, "total_epochs": epochs, "batch": batch + 1,
+                      "loss": float(logs.get("loss", 0)), "acc": float(logs.get("accuracy", 0))})
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            emit({"type": "epoch", "epoch": epoch + 1, "total_epochs": epochs,
+                  "loss": float(logs.get("loss", 0)), "acc": float(logs.get("accuracy", 0)),
+                  "val_loss": float(logs.get("val_loss", 0)),
+                  "val_acc": float(logs.get("val_accuracy", 0))})
+
+    return Progress()
+
+
+def run_training(params: dict, emit: Callable[[dict], None],
+                 should_stop: Callable[[], bool] = lambda: False,
+                 model_path: str = MODEL_PATH) -> dict:
+    """
+    Train, evaluate and publish a model for {"model_type", "epochs", "batch_size",
+    "learning_rate"?, "dropout"?}. Progress is checkpointed under the run's
+    directory. Passing the "run_id" of an earlier run resumes it from its latest
+    checkpoint with the hyperparameters it started with; "epochs" is the total
+    to train to. The result carries the run's hyperparameters and timing in the
+    shape sweep.run_trial reports them.
+    """
+    from checkpoints import load_run_params, new_run_id, run_dir, save_run_params
+    from model import build_cnn_model, build_simple_model, load_mnist_data, train_model
+    from model_registry import publish_model
+
+    run_started = time.perf_counter()
+    run_id = params.get("run_id") or new_run_id()
+    directory = run_dir(run_id)
+    started = load_run_params(directory)
+    if started is not None:
+        params = {**params, **{k: started[k] for k in _RUN_HYPERPARAMETERS if k in started}}
+    epochs = int(params.get("epochs", 15))
+    batch_size = int(params.get("batch_size", 128))
+    model_type = str(params.get("model_type", "advanced")).lower()
+    learning_rate = float(params.get("learning_rate", 1e-3))
+    dropout = float(params.get("dropout", 0.5))
+    save_run_params(directory, {"model_type": model_type, "epochs": epochs, "batch_size": batch_size,
+                                "learning_rate": learning_rate, "dropout": dropout})
+
+    emit({"type": "status", "status": "loading", "message": "Loading MNIST data...", "run_id": run_id})
+    (x_train, y_train), (x_test, y_test) = load_mnist_data()
+
+    emit({"type": "status", "status": "building", "run_id": run_id,
+          "message": "Resuming from checkpoint..." if started is not None else "Building model..."})
+    # With the tf.data pipeline, augmentation runs there instead of inside the model
+    in_pipeline = TRAINING_PIPELINE == "tfdata"
+    if model_type == "simple":
+        model = build_simple_model(dropout=dropout)
+    else:
+        model = build_cnn_model(augment=not in_pipeline, dropout=dropout)
+
+    emit({"type": "status", "status": "training", "message": "Starting training...",
+          "current_epoch": 0, "total_epochs": epochs, "run_id": run_id})
+    fit_started = time.perf_counter()
+    history, test_loss, test_acc = train_model(
+        model, x_train, y_train, x_test, y_test,
+        epochs=epochs,
+        batch_size=batch_size,
+        use_augmentation=model_type != "simple",
+        learning_rate=learning_rate,
+        callbacks=[_progress_callback(emit, should_stop, epochs)],
+        checkpoint_dir=directory,
+    )
+    fit_seconds = time.perf_counter() - fit_started
+    if should_stop():
+        raise TrainingCancelled()
+
+    emit({"type": "status", "status": "publishing", "message": "Publishing model..."})
+    version = publish_model(model, model_path=model_path, test_accuracy=float(test_acc))
+    # history.epoch only lists this session's epochs; a resumed run started past 0
+    epochs_completed = history.epoch[-1] + 1 if history.epoch else epochs
+    trained = int(len(x_train) * 0.9) * len(history.epoch)  # validation_split holds out 10%
+    return {
+        "test_accuracy": float(test_acc),
+        "test_loss": float(test_loss),
+        "version": version.id,
+        "run_id": run_id,
+        "model_type": model_type,
+        "batch_size": batch_size,
+        "learning_rate": learning_rate,
+        "dropout": dropout,
+        "epochs": epochs,
+        "epochs_completed": epochs_completed,
+        "status": "early_stopped" if epochs_completed < epochs else "completed",
+        "duration_seconds": time.perf_counter() - run_started,
+        "throughput": trained / fit_seconds if fit_seconds else 0.0,
+    }
+
+
+def _child_main(target, params: dict, events, cancel, model_path: str):
+    """Process entry point: run `target` and report its outcome as the last event."""
+    try:
+        result = target(params, events.put, cancel.is_set, model_path=model_path)
+        events.put({"type": "done", "result": result})
+    except TrainingCancelled:
+        events.put({"type": "cancelled"})
+    except Exception as e:
+        events.put({"type": "error", "error": str(e)})
+
+
+# --- Parent side ---
+
+@dataclass
+class TrainingJob:
+    id: str
+    params: dict
+    status: str = "queued"  # queued | starting | loading | building | training | publishing | done | error | cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    progress: dict = field(default_factory=dict)
+    events: List[dict] = field(default_factory=list)
+    cancel_requested: Optional[float] = None
+    _changed: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def record(self, event: dict):
+        """Append an event (numbered from 1) and fold it into status/progress.
+
+        Events after a terminal one are dropped, so a late update cannot revive a finished job.
+        """
+        with self._changed:
+            if self.finished:
+                return
+            seq = self.events[-1]["seq"] + 1 if self.events else 1
+            event = {**event, "seq": seq, "time": time.time()}
+            kind = event["type"]
+            if kind == "status":
+                self.status = event["status"]
+                self.progress = {k: v for k, v in event.items() if k not in ("type", "seq", "time")}
+            elif kind in ("batch", "epoch"):
+                self.progress = {"status": self.status, "current_epoch": event["epoch"],
+                                 **{k: event[k] for k in event if k not in ("type", "seq", "time", "epoch")}}
+            elif kind == "done":
+                self.status, self.result = "done", event["result"]
+                self.progress = {"status": "done", **event["result"]}
+            elif kind in ("error", "cancelled"):
+                self.status = kind
+                self.error = event.get("error")
+                self.progress = {"status": kind, **({"error": self.error} if self.error else {})}
+            if kind in FINISHED:
+                self.finished_at = event["time"]
+            # Keep terminal and epoch events; drop the oldest batch updates past the cap
+            if len(self.events) >= MAX_EVENTS_PER_JOB:
+                for i, old in enumerate(self.events):
+                    if old["type"] == "batch":
+                        del self.events[i]
+                        break
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def events_after(self, seq: int, timeout: Optional[float] = None) -> List[dict]:
+        """Events with seq > `seq`; waits up to `timeout` for one if there are none yet."""
+        with self._changed:
+            if timeout and not self.finished and (not self.events or self.events[-1]["seq"] <= seq):
+                self._changed.wait(timeout)
+            return [e for e in self.events if e["seq"] > seq]
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def sse_format(event: dict) -> str:
+    """One Server-Sent Events message; the seq doubles as the event id for Last-Event-ID."""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+class TrainingJobs:
+    """Queues training jobs and runs each in a child process, a few at a time."""
+
+    def __init__(self, on_finish: Optional[Callable[[TrainingJob], None]] = None,
+                 max_concurrent: int = TRAINING_MAX_CONCURRENT, max_queued: int = TRAINING_MAX_QUEUED,
+                 model_path: str = MODEL_PATH, target: Callable = run_training):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self._on_finish = on_finish
+        self._model_path = model_path
+        self._target = target
+        # spawn: a forked child would inherit the parent's TensorFlow and serving threads
+        self._ctx = mp.get_context("spawn")
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="training")
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._processes: Dict[str, mp.Process] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, params: dict) -> TrainingJob:
+        job = TrainingJob(id=uuid.uuid4().hex, params=dict(params))
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == "queued")
+            if queued >= self.max_queued:
+                raise TooManyJobs(f"{queued} training jobs already queued")
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+        """Ask a job to stop. Queued jobs never start; running ones stop at the next batch."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_requested = time.time()
+        # Under the job's lock so _run either sees the cancel or has already left "queued"
+        with job._changed:
+            if job.status == "queued":
+                job.record({"type": "cancelled"})
+        return job
+
+    def _run(self, job: TrainingJob):
+        with job._changed:
+            if job.cancel_requested is not None or job.finished:
+                return
+            job.started_at = time.time()
+            job.record({"type": "status", "status": "starting", "message": "Starting training process..."})
+        events = self._ctx.Queue()
+        cancel = self._ctx.Event()
+        proc = self._ctx.Process(target=_child_main, name=f"training-{job.id[:8]}", daemon=True,
+                                 args=(self._target, job.params, events, cancel, self._model_path))
+        proc.start()
+        with self._lock:
+            self._processes[job.id] = proc
+        try:
+            while True:
+                try:
+                    job.record(events.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+                if job.cancel_requested is not None:
+                    cancel.set()
+                    if proc.is_alive() and time.time() - job.cancel_requested > TRAINING_CANCEL_GRACE:
+                        proc.terminate()
+                if job.finished or not proc.is_alive():
+                    break
+            proc.join(timeout=TRAINING_CANCEL_GRACE)
+            while not job.finished:
+                job.record(events.get(timeout=1))
+        except queue.Empty:
+            if job.cancel_requested is not None:
+                job.record({"type": "cancelled"})
+            else:
+                job.record({"type": "error", "error": f"training process exited with code {proc.exitcode}"})
+        finally:
+            with self._lock:
+                self._processes.pop(job.id, None)
+        if self._on_finish is not None:
+            try:
+                self._on_finish(job)
+            except Exception:
+                logger.exception("Training job %s finish hook failed", job.id)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        """All known jobs, newest first."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def latest(self) -> Optional[TrainingJob]:
+        jobs = self.list()
+        return jobs[0] if jobs else None
+
+    def stats(self) -> dict:
+        jobs = self.list()
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": sum(1 for j in jobs if j.started_at is not None and not j.finished),
+            "queued": sum(1 for j in jobs if j.status == "queued"),
+        }
+
+
+def refresh_served_model(job: TrainingJob):
+    """on_finish hook: serve a newly published model in this process right away."""
+    if job.status == "done":
+        from model_registry import get_registry
+        from predictor import get_predictor
+
+        get_predictor().refresh_from_registry(get_registry())
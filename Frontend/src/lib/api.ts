@@ -19,6 +19,9 @@ export interface PredictResponse {
 }
 
 export interface EvaluateResponse {
+  /** "pending" while the backend scores a newly trained model */
+  status?: "ready" | "pending";
+  model_fingerprint?: string;
   accuracy: number;
   confusion_matrix: number[][];
   classification_report: Record<string, unknown>;
@@ -30,6 +33,15 @@ export interface EvaluateResponse {
 export interface Sample {
   image_base64: string;
   label: number;
+  index?: number;
+}
+
+export interface SamplesResponse {
+  samples: Sample[];
+  seed?: number | null;
+  page?: number;
+  total?: number;
+  has_more?: boolean;
 }
 
 export interface TrainResponse {
@@ -43,10 +55,20 @@ export const predictFromBase64 = async (imageBase64: string): Promise<PredictRes
   return data;
 };
 
-export const getSamples = async (count = 12, digit?: number): Promise<{ samples: Sample[] }> => {
+/** Pass a `seed` for a stable listing the browser can cache; `page` walks through it. */
+export const getSamples = async (
+  count = 12,
+  digit?: number,
+  seed?: number,
+  page = 0,
+): Promise<SamplesResponse> => {
   const params = new URLSearchParams({ count: String(count) });
   if (digit != null) params.set("digit", String(digit));
-  const { data } = await api.get<{ samples: Sample[] }>(`/samples?${params}`);
+  if (seed != null) {
+    params.set("seed", String(seed));
+    params.set("page", String(page));
+  }
+  const { data } = await api.get<SamplesResponse>(`/samples?${params}`);
   return data;
 };
 
@@ -90,7 +112,7 @@ export const getHealth = async (): Promise<{ status: string; model_loaded: boole
   return data;
 };
 
-export const getModelStatus = async (): Promise<{ loaded: boolean; path: string }> => {
+export const getModelStatus = async (): Promise<{ loaded: boolean; path: string; precision?: string }> => {
   const { data } = await api.get("/model/status");
   return data;
 };
@@ -8,6 +8,7 @@ const Evaluation = () => {
     queryKey: ["evaluate"],
     queryFn: getEvaluate,
     retry: false,
+    refetchInterval: (query) => (query.state.data?.status === "pending" ? 3000 : false),
   });
 
   const confusionMatrix = data?.confusion_matrix;